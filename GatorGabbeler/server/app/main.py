@@ -1,19 +1,62 @@
-from fastapi import FastAPI, HTTPException
+# Load .env before anything else: app modules read their settings at import time
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 import os
+import json
+import math
 import base64
-from typing import Optional, Dict
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List
 
 # Import the 'generate_translation' function
-from .services.llm import generate_spanish_reply, generate_translation
+from .services.llm import generate_spanish_reply, stream_spanish_reply, generate_translation, generate_translations_batch
+from .services.translation_cache import get_translation_cache
+from .services.reply_cache import get_reply_cache, REPLY_CACHE_ENABLED
+from .services.sessions import get_session_store
 # RAG: Import RAG utilities
-from .rag import get_spn1130_store
+from .rag.session_docs import get_session_docs, extract_text, file_kind, UnsupportedFileType
+from .rag import get_registry, start_warmup
+from .rag.registry import RAG_WARMUP_CLASSES
+# Shared HTTP client for upstream provider calls
+from .services.providers.http_client import init_http_client, close_http_client, get_pool_stats
+from .services.providers.scheduler import get_scheduler, ProviderError
+from .services.providers.router import get_llm_router
+# Structured logging, request IDs, stage timings and Prometheus metrics
+from .services.telemetry import configure_logging, RequestContextMiddleware, span
+from .services.metrics import render_metrics
+from .services.static_files import FrontendStaticFiles, precompress
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open one pooled HTTP client for the lifetime of the app
+    await init_http_client()
+    # Load or build the warm-up classes' indexes (SPN1130 by default) in the
+    # background so the first chat after a deploy doesn't pay for it; chat
+    # replies without RAG until ready. Other classes load on first use.
+    if os.getenv("RAG_WARMUP", "true").lower() != "false":
+        for class_level in RAG_WARMUP_CLASSES:
+            start_warmup(class_level)
+    # Compress any frontend files the build step didn't; until then they're sent as-is
+    if static_files_dir.exists() and os.getenv("STATIC_PRECOMPRESS", "true").lower() != "false":
+        asyncio.get_running_loop().run_in_executor(None, precompress, static_files_dir)
+    yield
+    await close_http_client()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS for production deployment
 # Add your Vercel/Netlify frontend URL to allowed origins
@@ -35,6 +78,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it wraps everything: request IDs, access log, timings, metrics
+app.add_middleware(RequestContextMiddleware)
+
 # --- Pydantic Models ---
 
 class FileMetadata(BaseModel):
@@ -46,9 +92,11 @@ class ChatRequest(BaseModel):
     classContext: str | None = None
     file: Optional[str] = None  # base64 encoded file content
     fileMetadata: Optional[FileMetadata] = None
+    sessionId: Optional[str] = None  # conversation memory; a new session is created when missing
 
 class ChatResponse(BaseModel):
     response: str
+    sessionId: Optional[str] = None
 
 # Pydantic model for the new translation request
 class TranslateRequest(BaseModel):
@@ -59,39 +107,179 @@ class TranslateRequest(BaseModel):
 class TranslateResponse(BaseModel):
     translation: str
 
+# Batch translation: many texts in, translations out in the same order
+class TranslateBatchRequest(BaseModel):
+    texts: List[str]
+    target_language: str = "English"
+
+class TranslateBatchResponse(BaseModel):
+    translations: List[str]
+
+# Max texts accepted by /api/translate/batch
+TRANSLATE_BATCH_MAX_TEXTS = int(os.getenv("TRANSLATE_BATCH_MAX_TEXTS", "200"))
+
+# Uploads: max file size and read chunk size in bytes
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_READ_CHUNK = 64 * 1024
+# Room for multipart boundaries and the small form fields around the file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
 # --- API Endpoints ---
 
+async def index_uploaded_file(session_id: str, data: bytes, filename: str, content_type: Optional[str]) -> int:
+    """Extract, chunk and index a file for the session (off the event loop). Returns chunk count."""
+    def work():
+        text = extract_text(data, filename, content_type)
+        return get_session_docs().add_text(session_id, text, filename)
+    with span("upload.index"):
+        return await asyncio.to_thread(work)
+
+
+async def prepare_chat(req: ChatRequest):
+    """
+    Resolve the session, index any inline (base64) attachment into it, and
+    return (message_text, class_context, session).
+
+    Attachments no longer get pasted into the context string, so the class
+    prompt and RAG keep working; each turn pulls only the relevant file chunks.
+    """
+    session = get_session_store().get_or_create(req.sessionId, req.classContext)
+    text = (req.text or "").strip()
+
+    if req.file and req.fileMetadata:
+        try:
+            data = base64.b64decode(req.file)
+            if len(data) > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)")
+            await index_uploaded_file(session.id, data, req.fileMetadata.name, req.fileMetadata.type)
+        except HTTPException:
+            raise
+        except UnsupportedFileType as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except Exception as e:
+            logger.warning(f"File processing error: {e}")
+        if not text:
+            text = f"Acabo de subir el archivo '{req.fileMetadata.name}'."
+
+    return text, req.classContext or "default", session
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def llm_http_error(e: Exception, label: str) -> HTTPException:
+    """503 with Retry-After when the provider is rate limiting or saturated, 500 otherwise."""
+    if isinstance(e, ProviderError) and e.status_code in (429, 503):
+        retry_after = str(math.ceil(e.retry_after or 1))
+        return HTTPException(status_code=503, detail=f"{label}: provider busy, try again shortly",
+                             headers={"Retry-After": retry_after})
+    return HTTPException(status_code=500, detail=f"{label}: {e}")
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     text = (req.text or "").strip()
     if not text and not req.file:
         raise HTTPException(status_code=400, detail="Missing both message and file")
 
+    text, context, session = await prepare_chat(req)
     try:
-        # Handle file content if present
-        file_context = None
-        if req.file and req.fileMetadata:
-            try:
-                # Decode base64 content
-                file_content = base64.b64decode(req.file).decode('utf-8')
-                
-                # Create context from file content
-                file_context = f"Content from file '{req.fileMetadata.name}':\n{file_content}"
-            except Exception as e:
-                print(f"File processing error: {e}")
-                file_context = "Error processing file content."
-
-        # Combine message context with file context if present
-        context = req.classContext or "default"
-        if file_context:
-            context = f"{context}\n\nFile Context:\n{file_context}"
-
         # Pass both the message and context to the LLM service
-        reply = await generate_spanish_reply(text, context)
-        return ChatResponse(response=reply)
+        reply = await generate_spanish_reply(text, context, session=session)
+        return ChatResponse(response=reply, sessionId=session.id)
     except Exception as e:
-        print(f"LLM Error: {e}")
-        raise HTTPException(status_code=500, detail=f"LLM failure: {e}")
+        logger.error(f"LLM error: {e}")
+        raise llm_http_error(e, "LLM failure")
+
+# Streaming variant of /api/chat: tokens and complete sentences as Server-Sent Events
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    text = (req.text or "").strip()
+    if not text and not req.file:
+        raise HTTPException(status_code=400, detail="Missing both message and file")
+
+    text, context, session = await prepare_chat(req)
+
+    async def event_stream():
+        try:
+            async for event, value in stream_spanish_reply(text, context, session=session):
+                if event == "done":
+                    yield sse_event("done", {"response": value, "sessionId": session.id})
+                else:
+                    yield sse_event(event, {"text": value})
+        except Exception as e:
+            logger.error(f"LLM stream error: {e}")
+            yield sse_event("error", {"detail": f"LLM failure: {e}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def limit_body(request: Request, max_bytes: int) -> Request:
+    """The same request, but receiving more than `max_bytes` of body raises 413 mid-stream."""
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)")
+        return message
+
+    return Request(request.scope, receive)
+
+# Multipart file upload: the body is capped while it is received, then the
+# file is split and indexed for the session so chat turns retrieve only
+# relevant parts. Text files and PDFs only.
+@app.post("/api/upload")
+async def upload(request: Request):
+    # Reject declared oversized bodies before reading anything
+    max_body = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            declared = -1
+        if declared < 0:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if declared > max_body:
+            raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)")
+
+    # Chunked or understated bodies are cut off as they arrive, not after spooling
+    form = await limit_body(request, max_body).form(max_files=1)
+    upload_file = form.get("file")
+    if upload_file is None or isinstance(upload_file, str):
+        raise HTTPException(status_code=400, detail="Missing file")
+    if file_kind(upload_file.filename or "", upload_file.content_type) is None:
+        await upload_file.close()
+        raise HTTPException(status_code=415, detail="Unsupported file type (text or PDF only)")
+
+    # Read the (spooled) part in chunks, enforcing the file limit as we go
+    buffer = bytearray()
+    while chunk := await upload_file.read(UPLOAD_READ_CHUNK):
+        buffer.extend(chunk)
+        if len(buffer) > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)")
+    await upload_file.close()
+
+    class_context = form.get("classContext") or None
+    session = get_session_store().get_or_create(form.get("sessionId") or None, class_context)
+    filename = upload_file.filename or "upload"
+    try:
+        chunks = await index_uploaded_file(session.id, bytes(buffer), filename, upload_file.content_type)
+    except Exception as e:
+        logger.warning(f"Upload processing error: {e}")
+        raise HTTPException(status_code=422, detail=f"Could not read file: {e}")
+
+    return {"sessionId": session.id, "filename": filename, "bytes": len(buffer), "chunks": chunks}
 
 # New endpoint to handle translation requests
 @app.post("/api/translate", response_model=TranslateResponse)
@@ -100,38 +288,75 @@ async def translate(req: TranslateRequest):
         translation = await generate_translation(req.text, req.target_language)
         return TranslateResponse(translation=translation)
     except Exception as e:
-        print(f"Translation Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Translation failure: {e}")
+        logger.error(f"Translation error: {e}")
+        raise llm_http_error(e, "Translation failure")
+
+# Translate a list of texts with deduplication and packed LLM calls
+@app.post("/api/translate/batch", response_model=TranslateBatchResponse)
+async def translate_batch(req: TranslateBatchRequest):
+    if len(req.texts) > TRANSLATE_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail=f"Too many texts (max {TRANSLATE_BATCH_MAX_TEXTS})")
+    try:
+        translations = await generate_translations_batch(req.texts, req.target_language)
+        return TranslateBatchResponse(translations=translations)
+    except Exception as e:
+        logger.error(f"Batch translation error: {e}")
+        raise llm_http_error(e, "Translation failure")
+
+# Translation cache hit rates and in-flight dedup counters
+@app.get("/api/translate/cache")
+async def translate_cache_status():
+    return get_translation_cache().stats()
+
+# First-turn reply cache hit rates (REPLY_CACHE=true)
+@app.get("/api/chat/cache")
+async def chat_cache_status():
+    return get_reply_cache().stats() if REPLY_CACHE_ENABLED else {"enabled": False}
 
 # RAG: Health check endpoint for RAG system
 @app.get("/api/rag/status")
 async def rag_status():
-    """Check if RAG system is ready and working."""
+    """
+    Report readiness, index metadata and rebuild progress for every class.
+
+    Cheap enough for load-balancer probes: reads metadata cached when each
+    index was loaded and never runs a search (which would call the embeddings API).
+    """
     try:
-        store = get_spn1130_store()
-        
-        # Check if vector store exists
-        has_index = store.vector_store is not None
-        
-        # Count PDF files
-        pdf_count = len(list(store.data_dir.glob("*.pdf"))) if store.data_dir.exists() else 0
-        
-        # Try a test search
-        can_search = False
-        if has_index:
-            try:
-                results = store.similarity_search("test", k=1)
-                can_search = len(results) > 0
-            except:
-                pass
+        registry = get_registry()
+        classes = {}
+        for class_level in registry.classes():
+            # Don't load the index here; report the warm-up state instead
+            store = registry.get(class_level, load=False)
+            
+            # Check if vector store exists
+            has_index = store.status == "ready" and store.vector_store is not None
+            
+            # Count PDF files
+            pdf_count = len(list(store.data_dir.glob("*.pdf"))) if store.data_dir.exists() else 0
+            
+            can_search = has_index and store.index_meta.get("chunks", 0) > 0
+            
+            classes[class_level] = {
+                "status": "ready" if can_search else "not_ready",
+                "index_status": store.status,
+                "index_error": store.error,
+                "has_vector_store": has_index,
+                "pdf_count": pdf_count,
+                "can_search": can_search,
+                "index": store.index_meta,
+                "rebuild": store.rebuild.to_dict(),
+                "memory_bytes": store.memory_bytes(),
+                "cache": store.cache_stats(),
+                "data_directory": str(store.data_dir),
+                "index_path": str(store.index_path)
+            }
         
+        any_ready = any(c["status"] == "ready" for c in classes.values())
         return {
-            "status": "ready" if (has_index and can_search) else "not_ready",
-            "has_vector_store": has_index,
-            "pdf_count": pdf_count,
-            "can_search": can_search,
-            "data_directory": str(store.data_dir),
-            "index_path": str(store.index_path)
+            "status": "ready" if any_ready else "not_ready",
+            "classes": classes,
+            "memory": registry.memory_stats()
         }
     except Exception as e:
         return {
@@ -139,23 +364,79 @@ async def rag_status():
             "error": str(e)
         }
 
+# RAG: Rebuild a class's index in the background and swap it in when done.
+# Disabled unless RAG_ADMIN_TOKEN is set; send it as X-Admin-Token.
+@app.post("/api/rag/rebuild/{class_level}", status_code=202)
+async def rag_rebuild(class_level: str, request: Request, full: bool = True):
+    admin_token = os.getenv("RAG_ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if request.headers.get("x-admin-token") != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    registry = get_registry()
+    store = registry.get(class_level, load=False)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"Unknown class '{class_level}'")
+    registry.start_rebuild(class_level, full=full)
+    return {"class_level": class_level, "rebuild": store.rebuild.to_dict()}
+
+# Conversation session store stats
+@app.get("/api/sessions/status")
+async def sessions_status():
+    return {**get_session_store().stats(), "uploads": get_session_docs().stats()}
+
+# Readiness probe: 'warming' returns 503 so load balancers can hold traffic
+# until the warm-up indexes are loaded; 'degraded' (no index) still serves non-RAG chat
+@app.get("/api/ready")
+async def ready():
+    registry = get_registry()
+    warmup_enabled = os.getenv("RAG_WARMUP", "true").lower() != "false"
+    rag = {}
+    for class_level in RAG_WARMUP_CLASSES:
+        store = registry.get(class_level, load=False)
+        if store is not None:
+            rag[class_level] = store.status
+
+    states = set(rag.values())
+    if warmup_enabled and states & {"cold", "warming"}:
+        status = "warming"
+    elif "degraded" in states:
+        status = "degraded"
+    else:
+        status = "ready"
+    body = {"status": status, "rag": rag}
+    return JSONResponse(body, status_code=503 if status == "warming" else 200)
+
+# Connection pool, scheduler and per-provider stats for upstream LLM calls
+@app.get("/api/provider/status")
+async def provider_status():
+    """Report HTTP pool usage, scheduler queues per lane, and provider latency, hedges and failovers."""
+    return {**get_pool_stats(), "scheduler": get_scheduler().stats(), "llm": get_llm_router().stats()}
+
+# Prometheus scrape endpoint (per worker process)
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # --- Static Files (Vite Frontend) ---
 
 static_files_dir = Path(__file__).parent.parent.parent / "client" / "dist"
+# Precompressed variants, immutable caching for hashed assets, ETags for index.html
+frontend = FrontendStaticFiles(directory=static_files_dir, html=True, check_dir=False)
 
 if static_files_dir.exists():
     app.mount(
         "/",
-        StaticFiles(directory=static_files_dir, html=True),
+        frontend,
         name="static",
     )
 else:
-    print(f"Warning: Static files directory not found at {static_files_dir}")
+    logger.warning(f"Static files directory not found at {static_files_dir}")
 
 # Fallback for client-side routing 
 @app.get("/{full_path:path}")
-async def read_index(full_path: str):
+async def read_index(full_path: str, request: Request):
     index_path = static_files_dir / "index.html"
     if not index_path.exists():
         raise HTTPException(status_code=404, detail="index.html not found")
-    return FileResponse(index_path)
\ No newline at end of file
+    return frontend.file_response(index_path, index_path.stat(), request.scope)
@@ -3,12 +3,33 @@ RAG (Retrieval-Augmented Generation) module for GatorGabber.
 Provides context-aware responses using course materials.
 """
 
-from .retriever import retrieve_context, format_rag_prompt
-from .vector_store import get_spn1130_store, VectorStoreManager
+from .retriever import (
+    retrieve_context,
+    retrieve_context_async,
+    format_rag_prompt,
+    rag_system_prompt,
+    rag_user_message,
+)
+from .vector_store import VectorStoreManager
+from .session_docs import get_session_docs, format_file_context
+from .registry import (
+    get_registry,
+    get_class_store,
+    start_warmup,
+    VectorStoreRegistry,
+)
 
 __all__ = [
     'retrieve_context',
+    'retrieve_context_async',
     'format_rag_prompt',
-    'get_spn1130_store',
-    'VectorStoreManager'
+    'rag_system_prompt',
+    'rag_user_message',
+    'get_registry',
+    'get_class_store',
+    'start_warmup',
+    'VectorStoreManager',
+    'VectorStoreRegistry',
+    'get_session_docs',
+    'format_file_context'
 ]
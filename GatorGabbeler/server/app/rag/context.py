@@ -0,0 +1,130 @@
+"""
+Token-budgeted context assembly for RAG prompts.
+
+Retrieval returns more candidates than the prompt needs. Neighbouring chunks
+share their splitter overlap, so those are stitched back together; near
+duplicates are dropped; and the rest are picked with maximal marginal
+relevance (MMR) until the token budget is spent. Similarity between chunks
+is measured on their content terms, so no extra embedding calls are made
+and lexical-only results are handled the same way.
+"""
+
+import os
+from typing import Callable, List, Optional, Tuple
+from .lexical import content_terms
+from ..services.tokens import count_tokens
+
+# Tokens of course material pasted into each prompt
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+# Candidates retrieved before assembly
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "8"))
+# MMR trade-off: 1.0 is pure relevance, lower values favour diversity
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Term overlap (Jaccard) above which a chunk counts as a near duplicate
+RAG_DUPLICATE_SIMILARITY = float(os.getenv("RAG_DUPLICATE_SIMILARITY", "0.8"))
+# Shortest shared edge (characters) treated as splitter overlap
+MIN_OVERLAP_CHARS = 40
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 if under MIN_OVERLAP_CHARS)."""
+    head = b[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(a) - len(b))
+    while True:
+        pos = a.find(head, start)
+        if pos < 0:
+            return 0
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        start = pos + 1
+
+
+def merge_overlaps(chunks: List[str], max_tokens: Optional[int] = None) -> List[str]:
+    """
+    Stitch chunks that continue each other (the end of one is the start of another).
+
+    The merged chunk takes the better rank of the two; order is otherwise kept.
+    Pairs whose merge would exceed `max_tokens` are left apart.
+    """
+    merged = list(chunks)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(len(merged)):
+                if i == j:
+                    continue
+                shared = _overlap(merged[i], merged[j])
+                if shared:
+                    joined = merged[i] + merged[j][shared:]
+                    if max_tokens is not None and count_tokens(joined) > max_tokens:
+                        continue
+                    keep, drop = min(i, j), max(i, j)
+                    merged[keep] = joined
+                    del merged[drop]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def assemble_context(
+    candidates: List[str],
+    token_count: Callable[[str], int] = count_tokens,
+    budget: int = RAG_CONTEXT_TOKENS,
+    mmr_lambda: float = RAG_MMR_LAMBDA,
+    duplicate_similarity: float = RAG_DUPLICATE_SIMILARITY,
+) -> Tuple[List[str], int]:
+    """
+    Pick chunks for the prompt from ranked candidates.
+
+    Args:
+        candidates: Chunk texts, most relevant first
+        token_count: Token count for a chunk (cached counts from ingestion)
+        budget: Max tokens of context; the top chunk is kept even if it alone
+            exceeds it, unless it is a merge of several chunks
+        mmr_lambda: Relevance vs. diversity weight
+        duplicate_similarity: Drop chunks at least this similar to a picked one
+
+    Returns:
+        Tuple of (chunks in selection order, total tokens)
+    """
+    original = set(candidates)
+    chunks = merge_overlaps(candidates, max_tokens=budget)
+    # Merged chunks aren't in the ingestion cache
+    tokens = [token_count(c) if c in original else count_tokens(c) for c in chunks]
+    terms = [frozenset(content_terms(c)) for c in chunks]
+    # Rank-based relevance: retrieval scores from BM25, vectors and RRF aren't comparable
+    relevance = [1.0 - i / len(chunks) for i in range(len(chunks))]
+
+    selected: List[int] = []
+    used = 0
+    remaining = list(range(len(chunks)))
+    while remaining:
+        best: Optional[int] = None
+        best_score = float("-inf")
+        for i in list(remaining):
+            redundancy = max((_similarity(terms[i], terms[j]) for j in selected), default=0.0)
+            over_budget = used + tokens[i] > budget
+            # Only a single retrieved chunk may overrun the budget, and only as the first pick
+            if redundancy >= duplicate_similarity or (over_budget and (selected or chunks[i] not in original)):
+                remaining.remove(i)
+                continue
+            score = mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+        selected.append(best)
+        used += tokens[best]
+        remaining.remove(best)
+    return [chunks[i] for i in selected], used
@@ -0,0 +1,141 @@
+"""
+Query-embedding cache for the RAG system.
+
+Students send the same short phrases over and over, and each one used to cost
+an embedding API round-trip before the Chroma lookup. CachedEmbeddings wraps
+the real embeddings object and answers repeated queries from an in-memory LRU
+(with TTL), backed by an optional SQLite file that survives restarts.
+"""
+
+import os
+import re
+import logging
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from ..services.cache import TTLCache
+from ..services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+# Set to a file path to keep embeddings across restarts (disabled when unset)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache keys: NFC, casefold, collapse whitespace."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches `embed_query` results.
+
+    Keys are (embedding model, normalized query text). `embed_documents` is
+    passed straight through; ingestion embeds each chunk once anyway.
+    """
+
+    def __init__(self, embeddings, model: str, disk_path: Optional[str] = EMBEDDING_CACHE_PATH):
+        self.embeddings = embeddings
+        self.model = model
+        self.memory = TTLCache(maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL)
+        self.disk_hits = 0
+        self.api_calls = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if disk_path:
+            self._open_disk(Path(disk_path))
+
+    def _open_disk(self, path: Path):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"RAG: Embedding disk cache disabled ({e})")
+            self._db = None
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.model}\n{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_get(self, key: str) -> Optional[List[float]]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return array("f", row[0]).tolist()
+
+    def _disk_set(self, key: str, vector: List[float]):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, vector) VALUES (?, ?, ?)",
+                (key, self.model, array("f", vector).tobytes()),
+            )
+            self._db.commit()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        """Check memory, then disk (promoting disk hits into memory)."""
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+        vector = self._disk_get(key)
+        if vector is not None:
+            self.disk_hits += 1
+            self.memory.set(key, vector)
+        return vector
+
+    def _store(self, key: str, vector: List[float]):
+        self.api_calls += 1
+        self.memory.set(key, vector)
+        self._disk_set(key, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            with span("retrieval.embed"):
+                vector = self.embeddings.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "memory": self.memory.stats(),
+            "disk_enabled": self._db is not None,
+            "disk_hits": self.disk_hits,
+            "api_calls": self.api_calls,
+        }
@@ -0,0 +1,311 @@
+"""
+Incremental PDF ingestion for the RAG vector store.
+
+Keeps a manifest of file hashes and chunk IDs next to the index so only
+added or changed PDFs are re-embedded and chunks from deleted PDFs are
+removed. PDFs are parsed in a process pool and chunks are embedded in sized
+batches with bounded concurrency. A BM25 index over the same chunks is
+rebuilt alongside.
+"""
+
+import os
+import logging
+import json
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from .lexical import BM25Index, LEXICAL_FILE
+from ..services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Chunk size and overlap in tokens (the prompt budget is in tokens too)
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "32"))
+MANIFEST_NAME = "manifest.json"
+# 2: token-sized chunks with a per-chunk token count
+MANIFEST_VERSION = 2
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# progress(phase, done, total) with phase "parse" (files) or "embed" (chunks)
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def close_chroma(store) -> None:
+    """
+    Close the client behind a LangChain Chroma store.
+
+    chromadb keeps one system (SQLite connection, HNSW segments) per persist
+    path until every client on it is closed, so dropping the reference alone
+    frees nothing. No-op for stores without a Chroma client (the mmap index).
+    """
+    client = getattr(store, "_client", None)
+    if client is None:
+        return
+    try:
+        client.close()
+    except Exception as e:
+        logger.warning(f"Chroma: Could not close client: {e}")
+
+
+@dataclass
+class IngestStats:
+    """Counters and timings for one ingestion run."""
+    files_total: int = 0
+    files_added: int = 0
+    files_changed: int = 0
+    files_deleted: int = 0
+    files_unchanged: int = 0
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    total_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        rate = self.chunks_embedded / self.embed_seconds if self.embed_seconds else 0.0
+        return (
+            f"{self.files_total} PDFs ({self.files_added} added, {self.files_changed} changed, "
+            f"{self.files_deleted} deleted, {self.files_unchanged} unchanged); "
+            f"{self.chunks_embedded} chunks embedded, {self.chunks_deleted} removed; "
+            f"parse {self.parse_seconds:.1f}s, embed {self.embed_seconds:.1f}s "
+            f"({rate:.1f} chunks/s), total {self.total_seconds:.1f}s"
+        )
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_pdf(path: str) -> List[Tuple[str, dict]]:
+    """
+    Load one PDF and split it into chunks.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+
+    Returns:
+        List of (chunk_text, metadata) tuples in document order; metadata
+        includes the chunk's token count
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    documents = PyPDFLoader(path).load()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=count_tokens,
+    )
+    splits = splitter.split_documents(documents)
+    return [(doc.page_content, {**doc.metadata, "tokens": count_tokens(doc.page_content)}) for doc in splits]
+
+
+def load_manifest(index_path: Path) -> dict:
+    path = index_path / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ingest: Ignoring unreadable manifest ({e})")
+        return {}
+
+
+def save_manifest(index_path: Path, manifest: dict):
+    # Write then rename so a crash never leaves a half-written manifest
+    index_path.mkdir(parents=True, exist_ok=True)
+    tmp = index_path / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, index_path / MANIFEST_NAME)
+
+
+def _settings(embedding_model: str) -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": embedding_model,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "chunk_unit": "tokens",
+    }
+
+
+async def _embed_batches(embeddings, texts: List[str], batch_size: int, concurrency: int,
+                         progress: Optional[ProgressCallback] = None) -> List[List[float]]:
+    """Embed texts in batches of `batch_size`, at most `concurrency` requests at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    done = 0
+
+    async def run(batch):
+        nonlocal done
+        async with semaphore:
+            vectors = await embeddings.aembed_documents(batch)
+        done += len(batch)
+        if progress:
+            progress("embed", done, len(texts))
+        return vectors
+
+    results = await asyncio.gather(*(run(b) for b in batches))
+    return [vector for batch in results for vector in batch]
+
+
+def ingest_pdfs(
+    data_dir: Path,
+    index_path: Path,
+    embeddings,
+    embedding_model: str,
+    workers: int = INGEST_WORKERS,
+    batch_size: int = EMBED_BATCH_SIZE,
+    concurrency: int = EMBED_CONCURRENCY,
+    full: bool = False,
+    progress: Optional[ProgressCallback] = None,
+) -> IngestStats:
+    """
+    Bring the Chroma index at `index_path` in line with the PDFs in `data_dir`.
+
+    Args:
+        data_dir: Directory containing the course PDFs
+        index_path: Chroma persist directory (the manifest is stored inside it)
+        embeddings: Raw (uncached) embeddings object used for chunk embedding
+        embedding_model: Model name recorded in the manifest
+        workers: Processes used to parse PDFs
+        batch_size: Chunks per embedding request
+        concurrency: Embedding requests in flight at once
+        full: Re-embed every PDF even if unchanged
+        progress: Optional callback for files parsed and chunks embedded so far
+
+    Returns:
+        IngestStats for the run
+    """
+    from langchain_community.vectorstores import Chroma
+
+    started = time.perf_counter()
+    stats = IngestStats()
+
+    manifest = load_manifest(index_path)
+    settings = _settings(embedding_model)
+    if any(manifest.get(k) != v for k, v in settings.items()):
+        # Model or chunking changed: old vectors aren't comparable, start over
+        if manifest:
+            logger.info("Ingest: Embedding model or chunk settings changed, re-embedding everything")
+        full = True
+    known_files: Dict[str, dict] = {} if full else dict(manifest.get("files", {}))
+
+    pdf_files = sorted(data_dir.glob("*.pdf")) if data_dir.exists() else []
+    stats.files_total = len(pdf_files)
+
+    # Work out what changed
+    current_hashes = {p.name: file_sha256(p) for p in pdf_files}
+    to_parse = []
+    for path in pdf_files:
+        entry = known_files.get(path.name)
+        if entry is None:
+            stats.files_added += 1
+            to_parse.append(path)
+        elif entry["sha256"] != current_hashes[path.name]:
+            stats.files_changed += 1
+            to_parse.append(path)
+        else:
+            stats.files_unchanged += 1
+
+    stale_ids = []
+    for name, entry in list(known_files.items()):
+        if name not in current_hashes:
+            stats.files_deleted += 1
+            stale_ids.extend(entry["chunk_ids"])
+            del known_files[name]
+        elif entry["sha256"] != current_hashes[name]:
+            stale_ids.extend(entry["chunk_ids"])
+
+    store = Chroma(persist_directory=str(index_path), embedding_function=embeddings)
+    try:
+        if full:
+            # Drop whatever the collection held before; the manifest no longer describes it
+            existing = store.get(include=[])["ids"]
+            if existing:
+                store.delete(ids=existing)
+                stats.chunks_deleted += len(existing)
+        elif stale_ids:
+            store.delete(ids=stale_ids)
+            stats.chunks_deleted += len(stale_ids)
+
+        # Parse added/changed PDFs in parallel
+        parse_started = time.perf_counter()
+        parsed: Dict[str, List[Tuple[str, dict]]] = {}
+        if to_parse:
+            logger.info(f"Ingest: Parsing {len(to_parse)} PDFs with {workers} workers")
+            with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+                futures = {path.name: pool.submit(parse_pdf, str(path)) for path in to_parse}
+                for done, (name, future) in enumerate(futures.items(), start=1):
+                    try:
+                        parsed[name] = future.result()
+                    except Exception as e:
+                        stats.errors.append(f"{name}: {e}")
+                        logger.warning(f"Ingest: Failed to parse {name}: {e}")
+                    if progress:
+                        progress("parse", done, len(to_parse))
+        for path in to_parse:
+            if path.name not in parsed:
+                # Its old chunks are gone; leave it out so the next run retries it
+                known_files.pop(path.name, None)
+        stats.parse_seconds = time.perf_counter() - parse_started
+
+        # Embed and store new chunks
+        ids, texts, metadatas = [], [], []
+        for name, chunks in parsed.items():
+            file_hash = current_hashes[name]
+            chunk_ids = [f"{file_hash[:16]}-{i}" for i in range(len(chunks))]
+            for chunk_id, (text, metadata) in zip(chunk_ids, chunks):
+                ids.append(chunk_id)
+                texts.append(text)
+                metadatas.append({**metadata, "source_file": name, "file_sha256": file_hash})
+            known_files[name] = {
+                "sha256": file_hash,
+                "chunk_ids": chunk_ids,
+                "chunks": len(chunk_ids),
+                "ingested_at": time.time(),
+            }
+
+        embed_started = time.perf_counter()
+        if texts:
+            logger.info(f"Ingest: Embedding {len(texts)} chunks (batch {batch_size}, concurrency {concurrency})")
+            vectors = asyncio.run(_embed_batches(embeddings, texts, batch_size, concurrency, progress))
+            # Vectors are precomputed, so write straight to the collection
+            for i in range(0, len(ids), batch_size):
+                store._collection.upsert(
+                    ids=ids[i:i + batch_size],
+                    embeddings=vectors[i:i + batch_size],
+                    documents=texts[i:i + batch_size],
+                    metadatas=metadatas[i:i + batch_size],
+                )
+            stats.chunks_embedded = len(texts)
+        stats.embed_seconds = time.perf_counter() - embed_started
+
+        # Rebuild the BM25 index over the same chunks whenever the store changed
+        lexical_path = index_path / LEXICAL_FILE
+        if texts or stats.chunks_deleted or not lexical_path.exists():
+            data = store.get(include=["documents", "metadatas"])
+            token_counts = [
+                (metadata or {}).get("tokens") or count_tokens(text)
+                for text, metadata in zip(data["documents"], data["metadatas"])
+            ]
+            BM25Index.build(data["documents"], token_counts).save(lexical_path)
+    finally:
+        close_chroma(store)
+
+    save_manifest(index_path, {**settings, "updated_at": time.time(), "files": known_files})
+    stats.total_seconds = time.perf_counter() - started
+    logger.info(f"Ingest: {stats.summary()}")
+    return stats
@@ -0,0 +1,155 @@
+"""
+BM25 lexical index and hybrid retrieval gating for the RAG system.
+
+Many useful matches are exact vocabulary words, which a lexical index finds
+without an embedding round-trip. The index is built over the same chunks as
+the vector store at ingestion time and saved next to it as lexical.json.
+"""
+
+import os
+import re
+import json
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LEXICAL_FILE = "lexical.json"
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Use the lexical result alone when the top chunk covers at least this share
+# of the (idf-weighted) query terms and the query is short
+RAG_LEXICAL_STRONG = float(os.getenv("RAG_LEXICAL_STRONG", "0.9"))
+RAG_LEXICAL_MAX_TERMS = int(os.getenv("RAG_LEXICAL_MAX_TERMS", "4"))
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+# Function words that carry no retrieval signal (accents already stripped)
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los", "me", "mi", "por",
+    "para", "que", "se", "su", "te", "tu", "un", "una", "y", "o", "yo", "como", "esta", "estas",
+    "eres", "soy", "muy", "mas", "pero", "the", "is", "are", "and", "or", "to", "of", "in", "you",
+    "i", "it", "what", "how", "do", "does", "my",
+}
+# Small talk that never needs course materials on its own
+TRIVIAL_WORDS = {
+    "hola", "gracias", "adios", "buenos", "buenas", "dias", "tardes", "noches", "si", "no",
+    "vale", "bien", "ok", "okay", "chao", "hasta", "luego", "pronto", "hi", "hello", "thanks",
+    "bye", "yes", "perfecto", "genial", "claro", "bueno",
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents and split into word tokens."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN.findall(text)
+
+
+def content_terms(text: str) -> List[str]:
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+def is_trivial(query: str) -> bool:
+    """True for greetings and small talk that don't need retrieval at all."""
+    terms = content_terms(query)
+    return not terms or all(t in TRIVIAL_WORDS or t.isdigit() for t in terms)
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over chunk texts."""
+
+    def __init__(self, texts: List[str], postings: Dict[str, List[Tuple[int, int]]], doc_lengths: List[int],
+                 token_counts: Optional[List[int]] = None):
+        self.texts = texts
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        # LLM tokens per chunk, counted at ingestion (None for older indexes)
+        self.token_counts = token_counts
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        n = len(texts)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, texts: List[str], token_counts: Optional[List[int]] = None) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+        for i, text in enumerate(texts):
+            counts = Counter(content_terms(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((i, tf))
+        return cls(texts, dict(postings), doc_lengths, token_counts)
+
+    def save(self, path: Path):
+        data = {"texts": self.texts, "postings": self.postings, "doc_lengths": self.doc_lengths}
+        if self.token_counts is not None:
+            data["token_counts"] = self.token_counts
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        postings = {term: [tuple(p) for p in docs] for term, docs in data["postings"].items()}
+        return cls(data["texts"], postings, data["doc_lengths"], data.get("token_counts"))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, query: str, k: int = 3) -> Tuple[List[Tuple[str, float]], float]:
+        """
+        Score chunks against the query.
+
+        Returns:
+            Tuple of ([(chunk_text, score), ...] best first, coverage), where
+            coverage is the idf-weighted share of query terms found in the top chunk
+        """
+        terms = list(dict.fromkeys(content_terms(query)))
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, set] = defaultdict(set)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self.postings[term]:
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc] / (self.avg_length or 1)
+                scores[doc] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+                matched[doc].add(term)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        if not ranked:
+            return [], 0.0
+
+        # Unknown query terms count against coverage with the highest idf seen
+        max_idf = max(self.idf.values(), default=1.0)
+        total_weight = sum(self.idf.get(t, max_idf) for t in terms)
+        top_doc = ranked[0][0]
+        coverage = sum(self.idf[t] for t in matched[top_doc]) / total_weight if total_weight else 0.0
+        return [(self.texts[doc], score) for doc, score in ranked], coverage
+
+
+def should_use_lexical_only(query: str, coverage: float) -> bool:
+    """Strong, short lexical match: skip the embedding call."""
+    return coverage >= RAG_LEXICAL_STRONG and len(content_terms(query)) <= RAG_LEXICAL_MAX_TERMS
+
+
+def reciprocal_rank_fusion(*rankings: List[str], k: int = 3) -> List[str]:
+    """Fuse ranked lists of chunk texts with reciprocal rank fusion."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, text in enumerate(ranking):
+            scores[text] += 1.0 / (RRF_K + rank + 1)
+    return [text for text, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]]
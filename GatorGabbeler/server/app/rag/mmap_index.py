@@ -0,0 +1,173 @@
+"""
+Memory-mapped NumPy vector index.
+
+An alternative to querying Chroma in every uvicorn worker: normalized float32
+embeddings live in one flat file that each worker maps read-only, so all
+workers share the same pages through the OS page cache. Chunk texts sit in a
+second file addressed by an offset table. A query is one vectorized dot
+product plus a top-k partition.
+
+Files (in <data>/<class>/mmap_index/<version>/):
+    embeddings.f32  - N x D float32, rows L2-normalized
+    chunks.bin      - UTF-8 chunk texts, concatenated
+    offsets.npy     - int64 array of N+1 byte offsets into chunks.bin
+    meta.json       - count, dim, embedding model, build time
+
+mmap_index/CURRENT names the live version. Each export writes a complete new
+version directory and then renames CURRENT over the old pointer, so a worker
+loading mid-export sees either the old set of files or the new one, never a
+mix. The previous version is kept for workers that still have it mapped.
+"""
+
+import os
+import json
+import time
+import shutil
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from langchain_core.documents import Document
+
+EMBEDDINGS_FILE = "embeddings.f32"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+# Versions kept on disk: the live one and the one before it
+KEEP_VERSIONS = 2
+
+
+def live_version_dir(path: Path) -> Path:
+    """Directory holding the live index files under `path` (the path itself for the old flat layout)."""
+    path = Path(path)
+    try:
+        version = (path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return path
+    return path / version if version else path
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def write_mmap_index(path: Path, texts: List[str], vectors, embedding_model: str) -> dict:
+    """
+    Write a memory-mapped index to `path` as a new version and make it live.
+
+    The files go to a fresh version directory; one rename of the CURRENT
+    pointer then switches every new reader over at once. Workers that
+    already mapped the old version keep reading it safely.
+
+    Returns:
+        The index metadata
+    """
+    matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    if matrix.ndim != 2 or len(matrix) != len(texts):
+        raise ValueError("Need one embedding row per chunk text")
+
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    meta = {
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "embedding_model": embedding_model,
+        "built_at": time.time(),
+    }
+
+    # Time-ordered names, unique across workers exporting at the same moment
+    version = f"{time.time_ns()}-{os.getpid()}"
+    target = path / version
+    target.mkdir(parents=True)
+    matrix.tofile(target / EMBEDDINGS_FILE)
+    (target / CHUNKS_FILE).write_bytes(b"".join(encoded))
+    np.save(target / OFFSETS_FILE, offsets)
+    (target / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+
+    pointer = path / (CURRENT_FILE + f".{os.getpid()}.tmp")
+    pointer.write_text(version, encoding="utf-8")
+    os.replace(pointer, path / CURRENT_FILE)
+    _prune(path, version)
+    return meta
+
+
+def _prune(path: Path, live: str):
+    """Drop versions older than the newest KEEP_VERSIONS up to `live`, and old flat-layout files."""
+    for name in (EMBEDDINGS_FILE, CHUNKS_FILE, OFFSETS_FILE, META_FILE):
+        (path / name).unlink(missing_ok=True)
+    # Newer names may be another worker's export in progress; leave those alone
+    versions = sorted((p for p in path.iterdir() if p.is_dir() and p.name <= live), key=lambda p: p.name, reverse=True)
+    for old in versions[KEEP_VERSIONS:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def export_chroma_to_mmap(chroma_store, path: Path, embedding_model: str) -> dict:
+    """Copy every chunk and embedding out of a Chroma store into a mmap index."""
+    data = chroma_store._collection.get(include=["embeddings", "documents"])
+    return write_mmap_index(path, data["documents"], data["embeddings"], embedding_model)
+
+
+class MmapVectorIndex:
+    """
+    Read-only vector index over memory-mapped files.
+
+    Exposes the same `similarity_search(query, k)` shape as the Chroma store
+    (returning Documents) so VectorStoreManager can use either backend.
+    """
+
+    def __init__(self, path: Path, embedding_function):
+        # The live version's directory, resolved once: later swaps don't affect this instance
+        self.path = live_version_dir(path)
+        self.embedding_function = embedding_function
+        self.meta = json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = np.memmap(self.path / EMBEDDINGS_FILE, dtype=np.float32, mode="r", shape=(count, dim))
+        self.chunks = np.memmap(self.path / CHUNKS_FILE, dtype=np.uint8, mode="r")
+        self.offsets = np.load(self.path / OFFSETS_FILE, mmap_mode="r")
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (live_version_dir(path) / META_FILE).exists()
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def _text(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.chunks[start:end]).decode("utf-8")
+
+    def search_by_vector(self, vector, k: int = 3) -> List[tuple[int, float]]:
+        """Return (row, cosine score) pairs for the top-k rows, best first."""
+        count = len(self)
+        if count == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self.vectors @ query
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding, k: int = 3) -> List[Document]:
+        return [
+            Document(page_content=self._text(i), metadata={"row": i, "score": score})
+            for i, score in self.search_by_vector(embedding, k)
+        ]
+
+    def similarity_search(self, query: str, k: int = 3) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+
+def load_mmap_index(path: Path, embedding_function) -> Optional[MmapVectorIndex]:
+    """Open the mmap index at `path`, or return None if it hasn't been built."""
+    if not MmapVectorIndex.exists(path):
+        return None
+    return MmapVectorIndex(path, embedding_function)
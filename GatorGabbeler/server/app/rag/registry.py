@@ -0,0 +1,185 @@
+"""
+Per-class vector store registry.
+
+Maps class keys (spanish_1130, spanish_1131, ...) to their data directories,
+loads each class's index on first use in the background, and keeps the total
+resident index memory under RAG_MEMORY_BUDGET_MB by unloading the least
+recently used stores.
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+from .vector_store import VectorStoreManager, DATA_ROOT, has_materials, make_embeddings
+from ..config.system_prompt import CLASS_PROMPTS
+
+# Total index memory to keep loaded across all classes (0 = unlimited)
+RAG_MEMORY_BUDGET_MB = float(os.getenv("RAG_MEMORY_BUDGET_MB", "0"))
+# Classes loaded at startup; others load on first chat
+RAG_WARMUP_CLASSES = [c.strip() for c in os.getenv("RAG_WARMUP_CLASSES", "spanish_1130").split(",") if c.strip()]
+
+
+def _class_dirs() -> Dict[str, Path]:
+    """
+    Class key -> data directory.
+
+    Every class prompt except 'default' gets data/<class>. RAG_CLASS_DIRS
+    overrides or adds entries: "spanish_1131=/mnt/materials/1131,..."
+    """
+    dirs = {key: DATA_ROOT / key for key in CLASS_PROMPTS if key != "default"}
+    for entry in os.getenv("RAG_CLASS_DIRS", "").split(","):
+        if "=" in entry:
+            key, path = entry.split("=", 1)
+            dirs[key.strip()] = Path(path.strip())
+    return dirs
+
+
+class VectorStoreRegistry:
+    """Lazily loaded, memory-bounded set of per-class VectorStoreManagers."""
+
+    def __init__(self, class_dirs: Dict[str, Path], memory_budget_mb: float = RAG_MEMORY_BUDGET_MB):
+        self.class_dirs = class_dirs
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.evictions = 0
+        self._stores: Dict[str, VectorStoreManager] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._embeddings = None
+        # Class -> has PDFs or a built index; checked once, refreshed on warm-up and rebuild
+        self._materials: Dict[str, bool] = {}
+
+    @property
+    def embeddings(self):
+        """One embeddings object (and query cache) shared by every class."""
+        if self._embeddings is None:
+            self._embeddings = make_embeddings()
+        return self._embeddings
+
+    def has_class(self, class_level: Optional[str]) -> bool:
+        """Whether the class has course materials: PDFs to index or a built index."""
+        data_dir = self.class_dirs.get(class_level)
+        if data_dir is None:
+            return False
+        store = self._stores.get(class_level)
+        if store is not None and store.status == "ready":
+            return True
+        found = self._materials.get(class_level)
+        if found is None:
+            found = self._materials[class_level] = has_materials(data_dir)
+        return found
+
+    def refresh_materials(self, class_level: str):
+        """Re-check a class's data directory on the next has_class call."""
+        self._materials.pop(class_level, None)
+
+    def classes(self) -> List[str]:
+        return list(self.class_dirs)
+
+    def get(self, class_level: str, load: bool = True) -> Optional[VectorStoreManager]:
+        """
+        Get the store for a class, or None if the class has no materials configured.
+
+        With load=False the index isn't loaded, so request handlers never pay
+        for a cold load; check `store.status` instead.
+        """
+        if class_level not in self.class_dirs:
+            return None
+        with self._lock:
+            store = self._stores.get(class_level)
+            if store is None:
+                store = VectorStoreManager(class_level, self.class_dirs[class_level], self.embeddings)
+                self._stores[class_level] = store
+        if load and store.status == "cold":
+            self._warm(store)
+        return store
+
+    def start_warmup(self, class_level: str) -> Optional[threading.Thread]:
+        """
+        Load or build a class's index on a background thread.
+
+        Safe to call repeatedly: only starts a thread while the store is cold.
+        """
+        store = self.get(class_level, load=False)
+        if store is None:
+            return None
+        with self._lock:
+            if store.status != "cold":
+                return self._threads.get(class_level)
+            store.status = "warming"
+            thread = threading.Thread(target=self._warm, args=(store,), name=f"rag-warmup-{class_level}", daemon=True)
+            self._threads[class_level] = thread
+            thread.start()
+        return thread
+
+    def start_rebuild(self, class_level: str, full: bool = True) -> Optional[threading.Thread]:
+        """Rebuild a class's index in the background; its materials are re-checked when done."""
+        store = self.get(class_level, load=False)
+        if store is None:
+            return None
+        return store.start_rebuild(full, on_done=lambda: self.refresh_materials(class_level))
+
+    def _warm(self, store: VectorStoreManager):
+        store.warm_up()
+        self.refresh_materials(store.class_level)
+        store.last_used = time.monotonic()
+        self._enforce_budget(keep=store.class_level)
+
+    def _enforce_budget(self, keep: str):
+        """Unload least recently used stores until the loaded total fits the budget."""
+        if not self.memory_budget:
+            return
+        with self._lock:
+            loaded = [s for s in self._stores.values() if s.status == "ready"]
+            total = sum(s.memory_bytes() for s in loaded)
+            for store in sorted(loaded, key=lambda s: s.last_used):
+                if total <= self.memory_budget:
+                    break
+                if store.class_level == keep:
+                    continue
+                total -= store.memory_bytes()
+                store.unload()
+                self.evictions += 1
+
+    def stores(self) -> List[VectorStoreManager]:
+        """Stores created so far (loaded or not)."""
+        return list(self._stores.values())
+
+    def status(self) -> dict:
+        """Per-class state without loading anything."""
+        report = {}
+        for class_level, data_dir in self.class_dirs.items():
+            store = self._stores.get(class_level)
+            report[class_level] = {
+                "status": store.status if store else "cold",
+                "data_directory": str(data_dir),
+                "memory_bytes": store.memory_bytes() if store else 0,
+            }
+        return report
+
+    def memory_stats(self) -> dict:
+        return {
+            "budget_bytes": self.memory_budget,
+            "loaded_bytes": sum(s.memory_bytes() for s in self._stores.values()),
+            "evictions": self.evictions,
+        }
+
+
+_registry = None
+
+def get_registry() -> VectorStoreRegistry:
+    """Get or create the vector store registry singleton."""
+    global _registry
+    if _registry is None:
+        _registry = VectorStoreRegistry(_class_dirs())
+    return _registry
+
+
+def get_class_store(class_level: str, load: bool = True) -> Optional[VectorStoreManager]:
+    return get_registry().get(class_level, load=load)
+
+
+def start_warmup(class_level: str) -> Optional[threading.Thread]:
+    return get_registry().start_warmup(class_level)
+
@@ -2,8 +2,26 @@
 RAG retrieval logic for augmenting prompts with relevant context.
 """
 
+import os
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
-from .vector_store import get_spn1130_store
+from .registry import get_registry
+from .context import assemble_context, RAG_CANDIDATES, RAG_CONTEXT_TOKENS
+from ..services.telemetry import span
+from ..services.metrics import RETRIEVAL_CHUNKS, RETRIEVAL_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Retrieval makes a blocking embedding HTTP call and a Chroma query, so async
+# callers run it on a small dedicated thread pool instead of the event loop.
+RAG_MAX_WORKERS = int(os.getenv("RAG_MAX_WORKERS", "4"))
+# Seconds to wait for retrieval before replying without RAG context
+RAG_TIMEOUT = float(os.getenv("RAG_TIMEOUT", "3"))
+
+_rag_executor = ThreadPoolExecutor(max_workers=RAG_MAX_WORKERS, thread_name_prefix="rag")
 
 
 def retrieve_context(query: str, class_level: str) -> Optional[str]:
@@ -17,23 +35,31 @@ def retrieve_context(query: str, class_level: str) -> Optional[str]:
     Returns:
         Formatted context string to add to the prompt, or None if RAG not available
     """
-    # Only support SPN1130 for now
-    if class_level != "spanish_1130":
+    registry = get_registry()
+    if not registry.has_class(class_level):
         return None
     
     try:
-        # Get the vector store
-        store = get_spn1130_store()
-        
-        if not store or not store.vector_store:
-            print("RAG: Vector store not available")
+        # Get the class's store without loading it inline; until the index is
+        # warm, reply without RAG rather than stalling the request
+        store = registry.get(class_level, load=False)
+        if store.status == "cold":
+            registry.start_warmup(class_level)
+
+        if store.status != "ready" or not store.vector_store:
+            logger.info(f"RAG: Vector store not available ({store.status})")
             return None
         
-        # Retrieve relevant chunks
-        relevant_docs = store.similarity_search(query, k=3)
+        # Retrieve candidates, then fit the best non-redundant ones into the token budget
+        with span("retrieval.search"):
+            candidates = store.similarity_search(query, k=RAG_CANDIDATES)
+        with span("retrieval.assemble"):
+            relevant_docs, tokens = assemble_context(candidates, store.token_count, RAG_CONTEXT_TOKENS)
+        RETRIEVAL_CHUNKS.observe(len(relevant_docs))
+        RETRIEVAL_TOKENS.observe(tokens)
         
         if not relevant_docs:
-            print("RAG: No relevant documents found")
+            logger.debug("RAG: No relevant documents found")
             return None
         
         # Format the context
@@ -42,14 +68,63 @@ def retrieve_context(query: str, class_level: str) -> Optional[str]:
             for i, doc in enumerate(relevant_docs)
         ])
         
-        print(f"RAG: Retrieved {len(relevant_docs)} relevant chunks")
+        logger.debug(f"RAG: Using {len(relevant_docs)} of {len(candidates)} chunks ({tokens} tokens)")
         
         return context
         
     except Exception as e:
-        print(f"RAG Error: {e}")
+        logger.error(f"RAG error: {e}")
+        return None
+
+
+async def retrieve_context_async(query: str, class_level: str, timeout: Optional[float] = None) -> Optional[str]:
+    """
+    Non-blocking version of retrieve_context for use inside async handlers.
+
+    Runs retrieval on the bounded RAG thread pool so the event loop keeps
+    serving other requests. If retrieval takes longer than `timeout` seconds
+    (default RAG_TIMEOUT) the reply continues without RAG and None is returned.
+    The worker thread finishes in the background; its result is discarded.
+    """
+    if not get_registry().has_class(class_level):
         return None
 
+    timeout = RAG_TIMEOUT if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    # Carry the request context (request ID, stage timings) into the worker thread
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(_rag_executor, context.run, retrieve_context, query, class_level)
+
+    try:
+        return await asyncio.wait_for(future, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"RAG: Retrieval timed out after {timeout}s, continuing without RAG")
+        return None
+
+
+def rag_system_prompt(base_prompt: str) -> str:
+    """Add the knowledge-base instruction to a system prompt."""
+    return f"""{base_prompt}
+
+6. KNOWLEDGE BASE: You have access to course materials and resources. When relevant information is provided below in the CONTEXT section, use it to inform your responses. Integrate this knowledge naturally into your Spanish replies without explicitly mentioning "the document says" or "according to the materials"."""
+
+
+def rag_user_message(user_message: str, context: Optional[str], file_context: Optional[str] = None) -> str:
+    """Put retrieved course context and/or uploaded-file excerpts in front of the user's message."""
+    sections = []
+    if context:
+        sections.append(f"CONTEXT (Course Materials):\n{context}")
+    if file_context:
+        sections.append(f"FILE CONTEXT (Excerpts from files the student uploaded):\n{file_context}")
+    if not sections:
+        return user_message
+    return "\n\n".join(sections) + f"""
+
+---
+
+USER MESSAGE:
+{user_message}"""
+
 
 def format_rag_prompt(base_prompt: str, user_message: str, context: Optional[str]) -> tuple[str, str]:
     """
@@ -66,18 +141,5 @@ def format_rag_prompt(base_prompt: str, user_message: str, context: Optional[str
     if not context:
         return base_prompt, user_message
     
-    # Add RAG instruction to system prompt
-    enhanced_system_prompt = f"""{base_prompt}
-
-6. KNOWLEDGE BASE: You have access to course materials and resources. When relevant information is provided below in the CONTEXT section, use it to inform your responses. Integrate this knowledge naturally into your Spanish replies without explicitly mentioning "the document says" or "according to the materials"."""
-    
-    # Add context to user message
-    enhanced_user_message = f"""CONTEXT (Course Materials):
-{context}
-
----
-
-USER MESSAGE:
-{user_message}"""
-    
-    return enhanced_system_prompt, enhanced_user_message
+    # Add RAG instruction to system prompt and context to user message
+    return rag_system_prompt(base_prompt), rag_user_message(user_message, context)
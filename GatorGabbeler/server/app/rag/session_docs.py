@@ -0,0 +1,199 @@
+"""
+Short-lived, per-session index of files a student uploads.
+
+Instead of pasting a whole attachment into the prompt, uploaded files are
+split into chunks and indexed for the session; each turn pulls only the top
+few chunks that match the message. Entries expire with UPLOAD_TTL. Only
+text files and PDFs are accepted.
+"""
+
+import io
+import os
+import mimetypes
+import logging
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+from .lexical import BM25Index, is_trivial, reciprocal_rank_fusion
+from .registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", "800"))
+UPLOAD_CHUNK_OVERLAP = int(os.getenv("UPLOAD_CHUNK_OVERLAP", "100"))
+UPLOAD_TOP_K = int(os.getenv("UPLOAD_TOP_K", "3"))
+UPLOAD_MAX_CHUNKS = int(os.getenv("UPLOAD_MAX_CHUNKS", "500"))
+UPLOAD_TTL = float(os.getenv("UPLOAD_TTL", os.getenv("SESSION_IDLE_TTL", "3600")))
+
+
+class UnsupportedFileType(ValueError):
+    """An upload that is neither a text file nor a PDF."""
+
+
+def file_kind(filename: str, content_type: Optional[str] = None) -> Optional[str]:
+    """
+    "pdf" or "text" for accepted uploads, None for anything else.
+
+    A missing or generic (octet-stream) content type is guessed from the filename.
+    """
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    if media_type in ("", "application/octet-stream"):
+        media_type = mimetypes.guess_type(filename)[0] or ""
+    if media_type == "application/pdf":
+        return "pdf"
+    if media_type.startswith("text/"):
+        return "text"
+    return None
+
+
+def extract_text(data: bytes, filename: str, content_type: Optional[str] = None) -> str:
+    """Pull plain text out of an uploaded PDF or text file; raises UnsupportedFileType otherwise."""
+    kind = file_kind(filename, content_type)
+    if kind is None:
+        raise UnsupportedFileType(f"Unsupported file type '{content_type or filename}' (text or PDF only)")
+    if kind == "pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(data))
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    return data.decode("utf-8", errors="replace")
+
+
+def split_text(text: str) -> List[str]:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        chunk_overlap=UPLOAD_CHUNK_OVERLAP,
+        length_function=len,
+    )
+    return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+
+
+@dataclass
+class SessionDocs:
+    chunks: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
+    lexical: Optional[BM25Index] = None
+    expires_at: float = 0.0
+
+
+class SessionDocumentStore:
+    """Chunks and embeddings of uploaded files, keyed by session id."""
+
+    def __init__(self, embeddings=None, ttl: float = UPLOAD_TTL):
+        self.embeddings = embeddings
+        self.ttl = ttl
+        self._docs: Dict[str, SessionDocs] = {}
+        self._lock = threading.Lock()
+
+    def _sweep(self):
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, d in self._docs.items() if d.expires_at < now]:
+                del self._docs[sid]
+
+    def add_text(self, session_id: str, text: str, source: str) -> int:
+        """
+        Chunk, embed and index text for a session. Blocking; call from a thread.
+
+        Returns:
+            Number of chunks added
+        """
+        self._sweep()
+        new_chunks = split_text(text)
+        with self._lock:
+            docs = self._docs.setdefault(session_id, SessionDocs())
+            room = UPLOAD_MAX_CHUNKS - len(docs.chunks)
+        new_chunks = new_chunks[:max(0, room)]
+        if not new_chunks:
+            return 0
+
+        new_vectors = None
+        if self.embeddings is not None:
+            try:
+                new_vectors = np.asarray(self.embeddings.embed_documents(new_chunks), dtype=np.float32)
+                new_vectors /= np.linalg.norm(new_vectors, axis=1, keepdims=True).clip(min=1e-12)
+            except Exception as e:
+                logger.warning(f"Uploads: Embedding failed, using lexical search only: {e}")
+
+        with self._lock:
+            docs.chunks.extend(new_chunks)
+            docs.sources.extend([source] * len(new_chunks))
+            if new_vectors is not None and (docs.vectors is not None or len(docs.chunks) == len(new_chunks)):
+                docs.vectors = new_vectors if docs.vectors is None else np.vstack([docs.vectors, new_vectors])
+            else:
+                # Vectors must cover every chunk; otherwise fall back to lexical only
+                docs.vectors = None
+            docs.lexical = BM25Index.build(docs.chunks)
+            docs.expires_at = time.time() + self.ttl
+        return len(new_chunks)
+
+    def has_docs(self, session_id: Optional[str]) -> bool:
+        docs = self._docs.get(session_id) if session_id else None
+        return bool(docs and docs.chunks and docs.expires_at >= time.time())
+
+    def search(self, session_id: str, query: str, k: int = UPLOAD_TOP_K) -> List[tuple[str, str]]:
+        """
+        Top-k (source, chunk) pairs for the query. Blocking; call from a thread.
+
+        Fuses vector and BM25 rankings when embeddings are available.
+        """
+        if not self.has_docs(session_id):
+            return []
+        docs = self._docs[session_id]
+        docs.expires_at = time.time() + self.ttl
+        chunks, vectors, lexical = docs.chunks, docs.vectors, docs.lexical
+
+        lexical_ranking = [text for text, _ in lexical.search(query, k=k * 2)[0]] if lexical else []
+        vector_ranking = []
+        if vectors is not None and not is_trivial(query):
+            try:
+                q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+                q /= max(float(np.linalg.norm(q)), 1e-12)
+                scores = vectors @ q
+                top = np.argsort(-scores)[:k * 2]
+                vector_ranking = [chunks[i] for i in top]
+            except Exception as e:
+                logger.warning(f"Uploads: Query embedding failed, using lexical search only: {e}")
+
+        ranked = reciprocal_rank_fusion(vector_ranking, lexical_ranking, k=k)
+        if not ranked:
+            # Nothing matched: for a short file the opening chunks are the best guess
+            ranked = chunks[:k]
+        source_of = dict(zip(chunks, docs.sources))
+        return [(source_of[text], text) for text in ranked]
+
+    async def search_async(self, session_id: str, query: str, k: int = UPLOAD_TOP_K) -> List[tuple[str, str]]:
+        return await asyncio.to_thread(self.search, session_id, query, k)
+
+    def stats(self) -> dict:
+        return {
+            "sessions_with_uploads": len(self._docs),
+            "chunks": sum(len(d.chunks) for d in self._docs.values()),
+            "ttl": self.ttl,
+        }
+
+
+def format_file_context(results: List[tuple[str, str]]) -> Optional[str]:
+    """Format retrieved upload chunks for the prompt."""
+    if not results:
+        return None
+    return "\n\n".join(f"[From '{source}']:\n{text}" for source, text in results)
+
+
+_session_docs = None
+
+def get_session_docs() -> SessionDocumentStore:
+    """Get or create the uploaded-documents store singleton (shares the registry's embeddings)."""
+    global _session_docs
+    if _session_docs is None:
+        try:
+            embeddings = get_registry().embeddings
+        except Exception as e:
+            logger.warning(f"Uploads: Embeddings unavailable, using lexical search only: {e}")
+            embeddings = None
+        _session_docs = SessionDocumentStore(embeddings)
+    return _session_docs
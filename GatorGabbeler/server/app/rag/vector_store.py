@@ -5,86 +5,272 @@ Uses ChromaDB for easy Windows compatibility.
 """
 
 import os
+import time
+import shutil
+import logging
+import threading
+from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import Callable, List, Optional
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
+from .embedding_cache import CachedEmbeddings, normalize_query
+from .ingest import ingest_pdfs, load_manifest, close_chroma
+from .mmap_index import export_chroma_to_mmap, load_mmap_index
+from .lexical import (
+    BM25Index,
+    LEXICAL_FILE,
+    is_trivial,
+    should_use_lexical_only,
+    reciprocal_rank_fusion,
+)
+from ..services.cache import TTLCache
+from ..services.tokens import count_tokens
+from ..services.telemetry import span
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+# Any OpenAI-compatible embeddings endpoint (default: api.openai.com)
+EMBEDDING_BASE_URL = os.getenv("OPENAI_EMBEDDING_BASE_URL") or None
+# Cache of retrieval results per (normalized query, k, index version)
+RAG_RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", "2000"))
+RAG_RESULT_CACHE_TTL = float(os.getenv("RAG_RESULT_CACHE_TTL", "3600"))
+# Query backend: "chroma" (default) or "mmap" (memory-mapped NumPy index shared
+# by all workers through the page cache; Chroma is still used for ingestion)
+RAG_INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "chroma").lower()
+
+# "hybrid" fuses BM25 and vector results and can skip the embedding call;
+# "vector" is plain similarity search
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").lower()
+
+# Rebuilds write to data/<class>/index_versions/<version>/ and CURRENT_INDEX
+# names the live one; without it the live index is data/<class>/chroma_db
+INDEX_VERSIONS_DIR = "index_versions"
+CURRENT_INDEX_FILE = "CURRENT_INDEX"
+# Versions kept on disk after a swap (the live one plus the previous, which
+# in-flight queries may still be reading)
+RAG_INDEX_KEEP_VERSIONS = max(2, int(os.getenv("RAG_INDEX_KEEP_VERSIONS", "2")))
+# How often (seconds) a worker checks whether another process swapped the index
+RAG_INDEX_POLL_SECONDS = float(os.getenv("RAG_INDEX_POLL_SECONDS", "5"))
+# Seconds an unloaded or swapped-out Chroma store stays open for queries still using it
+RAG_RELEASE_GRACE = float(os.getenv("RAG_RELEASE_GRACE", "30"))
+
+DATA_ROOT = Path(__file__).parent.parent.parent / "data"
+
+
+def live_index_root(data_dir: Path) -> Path:
+    """Directory holding the live chroma_db (and mmap_index) for a class."""
+    try:
+        version = (data_dir / CURRENT_INDEX_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        version = ""
+    if version and (data_dir / INDEX_VERSIONS_DIR / version).is_dir():
+        return data_dir / INDEX_VERSIONS_DIR / version
+    return data_dir
+
+
+def has_materials(data_dir: Path) -> bool:
+    """Whether a class directory has PDFs to index or an index already built."""
+    if not data_dir.is_dir():
+        return False
+    root = live_index_root(data_dir)
+    return (root / "chroma_db").is_dir() or (root / "mmap_index").is_dir() or any(data_dir.glob("*.pdf"))
+
+
+def release_later(store, delay: Optional[float] = None) -> None:
+    """Close a store's Chroma client after `delay` (default RAG_RELEASE_GRACE), once in-flight queries are done."""
+    if getattr(store, "_client", None) is None:
+        return
+    timer = threading.Timer(RAG_RELEASE_GRACE if delay is None else delay, close_chroma, args=(store,))
+    timer.daemon = True
+    timer.start()
+
+
+def set_live_index(data_dir: Path, version: str):
+    """Point CURRENT_INDEX at a version; the rename makes the switch atomic."""
+    tmp = data_dir / (CURRENT_INDEX_FILE + ".tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, data_dir / CURRENT_INDEX_FILE)
+
+
+@dataclass
+class RebuildProgress:
+    """State of the latest background rebuild for one class."""
+    state: str = "idle"          # idle | running | done | failed
+    version: Optional[str] = None
+    full: bool = True
+    phase: Optional[str] = None  # copy | parse | embed | export | swap
+    done: int = 0
+    total: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    summary: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def make_embeddings() -> CachedEmbeddings:
+    """Create the cached OpenAI embeddings object used for queries."""
+    return CachedEmbeddings(
+        OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=os.getenv("OPENAI_API_KEY"),
+                         openai_api_base=EMBEDDING_BASE_URL),
+        model=EMBEDDING_MODEL,
+    )
+
 
 class VectorStoreManager:
     """Manages vector store creation and retrieval for Spanish class resources."""
     
-    def __init__(self, class_level: str = "spanish_1130"):
+    def __init__(self, class_level: str = "spanish_1130", data_dir: Path | None = None,
+                 embeddings: CachedEmbeddings | None = None):
         self.class_level = class_level
-        self.embeddings = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
+        # Query embeddings are cached so repeated phrases skip the API call
+        self.embeddings = embeddings or make_embeddings()
+        self.result_cache = TTLCache(maxsize=RAG_RESULT_CACHE_SIZE, ttl=RAG_RESULT_CACHE_TTL)
+        # Changes whenever the index is (re)loaded so cached results never outlive it
+        self.index_version = None
         self.vector_store = None
-        self.data_dir = Path(__file__).parent.parent.parent / "data" / class_level
-        self.index_path = self.data_dir / "chroma_db"
-        
+        self.lexical = None
+        # Chunk text -> token count, from the lexical index
+        self._chunk_tokens = {}
+        # How each query was answered: skipped / lexical / hybrid / vector
+        self.retrieval_counts = {"skipped": 0, "lexical": 0, "hybrid": 0, "vector": 0}
+        self.data_dir = Path(data_dir) if data_dir else DATA_ROOT / class_level
+        self.backend = RAG_INDEX_BACKEND
+        self._use_root(live_index_root(self.data_dir))
+        # Metadata for the loaded index, read once at load time for cheap status probes
+        self.index_meta = {}
+        self.rebuild = RebuildProgress()
+        self._rebuild_thread = None
+        self._rebuild_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._next_poll = 0.0
+        # Readiness: cold -> warming -> ready | degraded
+        self.status = "cold"
+        self.error = None
+        # For the registry's LRU eviction
+        self.last_used = 0.0
+
+    def warm_up(self):
+        """
+        Load (or build) the vector store and record readiness.
+
+        Sets status to 'ready' when the store is usable, or 'degraded' when it
+        could not be loaded (no PDFs, missing API key, Chroma error) so callers
+        can reply without RAG instead of waiting.
+        """
+        self.status = "warming"
+        self.error = None
+        try:
+            self.load_or_create_vector_store()
+        except Exception as e:
+            logger.error(f"RAG: Warm-up failed for {self.class_level}: {e}")
+            self.error = str(e)
+            self.vector_store = None
+
+        self.status = "ready" if self.vector_store is not None else "degraded"
+        logger.info(f"RAG: {self.class_level} index {self.status}")
+        return self.status
+
+    def _use_root(self, root: Path):
+        self.index_root = root
+        self.index_path = root / "chroma_db"
+        self.mmap_path = root / "mmap_index"
+
     def load_or_create_vector_store(self):
         """Load existing vector store or create new one from PDFs."""
+        # Another process may have swapped in a new version since we last looked
+        self._use_root(live_index_root(self.data_dir))
+        if self.backend == "mmap":
+            return self._load_or_create_mmap()
+        return self._load_or_create_chroma()
+
+    def _load_or_create_mmap(self):
+        """Open the mmap index, (re)exporting it from Chroma when missing or stale."""
+        index = load_mmap_index(self.mmap_path, self.embeddings)
+        manifest = load_manifest(self.index_path)
+        if index is None or index.meta["built_at"] < manifest.get("updated_at", 0):
+            chroma_store = self._load_or_create_chroma()
+            if chroma_store is None:
+                return None
+            try:
+                self.export_mmap(chroma_store)
+            finally:
+                close_chroma(chroma_store)
+            index = load_mmap_index(self.mmap_path, self.embeddings)
+
+        logger.info(f"Loaded mmap index from {self.mmap_path} ({len(index)} chunks)")
+        self.vector_store = index
+        self._set_index_version()
+        return self.vector_store
+
+    def export_mmap(self, chroma_store=None) -> dict:
+        """Write the memory-mapped copy of the Chroma index."""
+        if chroma_store is None:
+            store = Chroma(persist_directory=str(self.index_path), embedding_function=self.embeddings)
+            try:
+                return self.export_mmap(store)
+            finally:
+                close_chroma(store)
+        meta = export_chroma_to_mmap(chroma_store, self.mmap_path, EMBEDDING_MODEL)
+        logger.info(f"Exported {meta['count']} chunks to mmap index at {self.mmap_path}")
+        return meta
+
+    def _load_or_create_chroma(self):
         # Try to load existing index
         if self.index_path.exists() and any(self.index_path.iterdir()):
-            print(f"Loading existing vector store from {self.index_path}")
+            logger.info(f"Loading existing vector store from {self.index_path}")
             try:
                 self.vector_store = Chroma(
                     persist_directory=str(self.index_path),
                     embedding_function=self.embeddings
                 )
+                self._set_index_version()
                 return self.vector_store
             except Exception as e:
-                print(f"Error loading existing store: {e}")
-                print("Creating new vector store...")
+                logger.error(f"Error loading existing store: {e}")
+                logger.info("Creating new vector store...")
         
         # Create new index from PDFs
-        print(f"Creating new vector store from PDFs in {self.data_dir}")
+        logger.info(f"Creating new vector store from PDFs in {self.data_dir}")
         return self.create_vector_store_from_pdfs()
     
     def create_vector_store_from_pdfs(self):
-        """Load PDFs, split into chunks, and create vector store."""
+        """Load PDFs, split into chunks, and create vector store (incrementally)."""
         if not self.data_dir.exists():
-            print(f"Warning: Data directory {self.data_dir} does not exist")
+            logger.warning(f"Data directory {self.data_dir} does not exist")
             return None
         
         # Find all PDF files
         pdf_files = list(self.data_dir.glob("*.pdf"))
         
         if not pdf_files:
-            print(f"Warning: No PDF files found in {self.data_dir}")
+            logger.warning(f"No PDF files found in {self.data_dir}")
             return None
         
-        print(f"Found {len(pdf_files)} PDF files to process")
-        
-        # Load and split PDFs
-        all_documents = []
-        for pdf_path in pdf_files:
-            print(f"Processing: {pdf_path.name}")
-            loader = PyPDFLoader(str(pdf_path))
-            documents = loader.load()
-            all_documents.extend(documents)
+        logger.info(f"Found {len(pdf_files)} PDF files to process")
         
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
+        # Parse, split and embed only what the manifest says is new or changed
+        ingest_pdfs(
+            self.data_dir,
+            self.index_path,
+            self.embeddings.embeddings,
+            EMBEDDING_MODEL,
         )
-        splits = text_splitter.split_documents(all_documents)
-        print(f"Created {len(splits)} text chunks")
         
-        # Create vector store
-        self.vector_store = Chroma.from_documents(
-            documents=splits,
-            embedding=self.embeddings,
-            persist_directory=str(self.index_path)
+        self.vector_store = Chroma(
+            persist_directory=str(self.index_path),
+            embedding_function=self.embeddings
         )
         
-        print(f"Vector store saved to {self.index_path}")
+        logger.info(f"Vector store saved to {self.index_path}")
+        self._set_index_version()
         
         return self.vector_store
     
@@ -101,34 +287,280 @@ class VectorStoreManager:
         """
         if not self.vector_store:
             self.load_or_create_vector_store()
+        else:
+            self._follow_swap()
         
-        if not self.vector_store:
+        # Hold a local reference: the registry may unload the store mid-query
+        vector_store = self.vector_store
+        if not vector_store:
             return []
         
-        # Perform similarity search
-        docs = self.vector_store.similarity_search(query, k=k)
-        
-        # Extract text content
-        return [doc.page_content for doc in docs]
+        self.last_used = time.monotonic()
+        cache_key = (normalize_query(query), k, self.index_version)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        lexical = self.lexical
+        if RAG_RETRIEVAL_MODE == "hybrid" and lexical is not None:
+            results = self._hybrid_search(query, k, vector_store, lexical)
+        else:
+            # Perform similarity search
+            with span("retrieval.vector"):
+                docs = vector_store.similarity_search(query, k=k)
+            
+            # Extract text content
+            results = [doc.page_content for doc in docs]
+            self.retrieval_counts["vector"] += 1
+        self.result_cache.set(cache_key, tuple(results))
+        return results
+
+    def _hybrid_search(self, query: str, k: int, vector_store, lexical: BM25Index) -> List[str]:
+        """
+        BM25 first; only embed when the lexical match isn't strong enough.
+
+        Trivial queries ("hola", "gracias") skip retrieval entirely. Short
+        queries whose top BM25 chunk covers the query terms use the lexical
+        result alone. Everything else fuses BM25 and vector rankings (RRF).
+        """
+        if is_trivial(query):
+            self.retrieval_counts["skipped"] += 1
+            return []
+
+        with span("retrieval.lexical"):
+            lexical_hits, coverage = lexical.search(query, k=k * 2)
+        if lexical_hits and should_use_lexical_only(query, coverage):
+            self.retrieval_counts["lexical"] += 1
+            return [text for text, _ in lexical_hits[:k]]
+
+        with span("retrieval.vector"):
+            docs = vector_store.similarity_search(query, k=k * 2)
+        self.retrieval_counts["hybrid"] += 1
+        return reciprocal_rank_fusion(
+            [doc.page_content for doc in docs],
+            [text for text, _ in lexical_hits],
+            k=k,
+        )
+
+    def _load_lexical(self):
+        """Load the BM25 index, building it from the loaded store if it's missing."""
+        path = self.index_path / LEXICAL_FILE
+        try:
+            self.lexical = BM25Index.load(path)
+            if self.lexical is None and self.vector_store is not None:
+                if self.backend == "mmap":
+                    texts = [self.vector_store._text(i) for i in range(len(self.vector_store))]
+                else:
+                    texts = self.vector_store.get(include=["documents"])["documents"]
+                self.lexical = BM25Index.build(texts, [count_tokens(t) for t in texts])
+                self.index_path.mkdir(parents=True, exist_ok=True)
+                self.lexical.save(path)
+        except Exception as e:
+            logger.warning(f"RAG: Lexical index unavailable, using vector search only: {e}")
+            self.lexical = None
+        lexical = self.lexical
+        if lexical is not None and lexical.token_counts:
+            self._chunk_tokens = dict(zip(lexical.texts, lexical.token_counts))
+        else:
+            self._chunk_tokens = {}
+
+    def token_count(self, text: str) -> int:
+        """Tokens in a retrieved chunk, from the counts cached at ingestion."""
+        tokens = self._chunk_tokens.get(text)
+        return tokens if tokens is not None else count_tokens(text)
+
+    def _set_index_version(self):
+        """Stamp a new index version, reload the lexical index and drop cached results."""
+        self._load_lexical()
+        self.index_version = f"{int(time.time())}-{id(self.vector_store)}"
+        self.index_meta = self._read_index_meta()
+        self.result_cache.clear()
+
+    def _read_index_meta(self) -> dict:
+        """Version, chunk count and build time of the loaded index, from its manifest."""
+        manifest = load_manifest(self.index_path)
+        files = manifest.get("files", {})
+        return {
+            "version": self.index_root.name if self.index_root != self.data_dir else "chroma_db",
+            "chunks": sum(entry.get("chunks", 0) for entry in files.values()),
+            "files": len(files),
+            "built_at": manifest.get("updated_at"),
+            "embedding_model": manifest.get("embedding_model"),
+            "backend": self.backend,
+            "path": str(self.index_root),
+        }
+
+    def _follow_swap(self):
+        """
+        Pick up a version another worker swapped in (checked every RAG_INDEX_POLL_SECONDS).
+
+        Only one thread reloads; the others keep querying the store they have.
+        """
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + RAG_INDEX_POLL_SECONDS
+        root = live_index_root(self.data_dir)
+        if root == self.index_root or not self._swap_lock.acquire(blocking=False):
+            return
+        try:
+            logger.info(f"RAG: {self.class_level} index swapped to {root.name}, reloading")
+            self._activate(root, self._open(root))
+        except Exception as e:
+            logger.error(f"RAG: Could not load swapped index {root}: {e}")
+        finally:
+            self._swap_lock.release()
+
+    def _open(self, root: Path):
+        """Open the index under `root` with the configured backend, without touching live state."""
+        if self.backend == "mmap":
+            return load_mmap_index(root / "mmap_index", self.embeddings)
+        return Chroma(persist_directory=str(root / "chroma_db"), embedding_function=self.embeddings)
+
+    def _activate(self, root: Path, vector_store):
+        """
+        Make `vector_store` (opened from `root`) the live index.
+
+        Queries already running keep the reference they took and finish on the
+        old store; new queries see the new one. The old store is closed after
+        RAG_RELEASE_GRACE.
+        """
+        previous = self.vector_store
+        self._use_root(root)
+        self.vector_store = vector_store
+        if previous is not None and previous is not vector_store:
+            release_later(previous)
+        self._set_index_version()
+        self.status = "ready"
+
+    def memory_bytes(self) -> int:
+        """
+        Estimate resident memory for the loaded index from its on-disk size.
+
+        Chroma keeps its HNSW index and SQLite pages in memory; the mmap backend
+        is mostly page cache. Either way the file size is a fair upper bound.
+        """
+        if self.vector_store is None:
+            return 0
+        # The mmap index keeps older versions beside the live one; count only the loaded one
+        path = getattr(self.vector_store, "path", self.mmap_path) if self.backend == "mmap" else self.index_path
+        if not path.exists():
+            return 0
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+    def unload(self):
+        """Drop the loaded index so its memory can be reclaimed; next use reloads it."""
+        if self.vector_store is not None:
+            # Chroma only frees the index once its client is closed
+            release_later(self.vector_store)
+        self.vector_store = None
+        self.lexical = None
+        self._chunk_tokens = {}
+        self.index_version = None
+        self.result_cache.clear()
+        self.status = "cold"
+        logger.info(f"RAG: Unloaded {self.class_level} index")
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for the embedding and result caches."""
+        return {
+            "index_version": self.index_version,
+            "embeddings": self.embeddings.stats(),
+            "results": self.result_cache.stats(),
+            "retrieval": dict(self.retrieval_counts),
+            "lexical_chunks": len(self.lexical) if self.lexical else 0,
+        }
     
-    def rebuild_index(self):
-        """Force rebuild of the vector store from PDFs."""
-        # Remove existing index
-        if self.index_path.exists():
-            import shutil
-            shutil.rmtree(self.index_path)
-        
-        # Recreate
-        return self.create_vector_store_from_pdfs()
+    def start_rebuild(self, full: bool = True, on_done: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """
+        Rebuild the index on a background thread; progress is in `self.rebuild`.
 
+        `on_done` runs after the rebuild, whether or not it succeeded.
+        Returns the running thread if a rebuild is already in progress.
+        """
+        with self._rebuild_lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return self._rebuild_thread
+            self.rebuild = RebuildProgress(state="running", full=full, started_at=time.time())
+            def run():
+                try:
+                    self.rebuild_index(full)
+                finally:
+                    if on_done is not None:
+                        on_done()
+
+            self._rebuild_thread = threading.Thread(target=run, name=f"rag-rebuild-{self.class_level}", daemon=True)
+            self._rebuild_thread.start()
+            return self._rebuild_thread
 
-# Singleton instance for SPN1130
-_spn1130_store = None
+    def rebuild_index(self, full: bool = True):
+        """
+        Build a new index version beside the live one, then swap it in.
+
+        The live index keeps serving queries throughout. With full=False the
+        live version is copied and only changed PDFs are re-embedded. The swap
+        only happens if every PDF was ingested; on failure the live index is
+        left untouched.
+        """
+        progress = self.rebuild
+        if progress.state != "running":
+            progress = self.rebuild = RebuildProgress(state="running", full=full, started_at=time.time())
+        version = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        progress.version = version
+        root = self.data_dir / INDEX_VERSIONS_DIR / version
+
+        def report(phase: str, done: int, total: int):
+            progress.phase, progress.done, progress.total = phase, done, total
+
+        try:
+            if not self.data_dir.exists() or not any(self.data_dir.glob("*.pdf")):
+                raise RuntimeError(f"No PDF files found in {self.data_dir}")
+            live_chroma = live_index_root(self.data_dir) / "chroma_db"
+            if not full and live_chroma.exists():
+                report("copy", 0, 1)
+                shutil.copytree(live_chroma, root / "chroma_db")
+            logger.info(f"RAG: Rebuilding {self.class_level} index into {root}")
+            stats = ingest_pdfs(
+                self.data_dir,
+                root / "chroma_db",
+                self.embeddings.embeddings,
+                EMBEDDING_MODEL,
+                full=full,
+                progress=report,
+            )
+            progress.summary = stats.summary()
+            if stats.errors:
+                raise RuntimeError(f"{len(stats.errors)} PDFs failed to ingest: {'; '.join(stats.errors)}")
+            if self.backend == "mmap":
+                report("export", 0, 1)
+                chroma_store = Chroma(persist_directory=str(root / "chroma_db"), embedding_function=self.embeddings)
+                try:
+                    export_chroma_to_mmap(chroma_store, root / "mmap_index", EMBEDDING_MODEL)
+                finally:
+                    close_chroma(chroma_store)
+
+            report("swap", 0, 1)
+            vector_store = self._open(root)
+            with self._swap_lock:
+                set_live_index(self.data_dir, version)
+                self._activate(root, vector_store)
+            logger.info(f"RAG: {self.class_level} now serving index {version} ({self.index_meta['chunks']} chunks)")
+            self._prune_versions()
+            progress.state = "done"
+        except Exception as e:
+            logger.error(f"RAG: Rebuild of {self.class_level} failed, keeping the live index: {e}")
+            progress.state = "failed"
+            progress.error = str(e)
+            shutil.rmtree(root, ignore_errors=True)
+        finally:
+            progress.finished_at = time.time()
+        return self.vector_store
 
-def get_spn1130_store() -> VectorStoreManager:
-    """Get or create the SPN1130 vector store singleton."""
-    global _spn1130_store
-    if _spn1130_store is None:
-        _spn1130_store = VectorStoreManager("spanish_1130")
-        _spn1130_store.load_or_create_vector_store()
-    return _spn1130_store
+    def _prune_versions(self):
+        """Delete all but the newest RAG_INDEX_KEEP_VERSIONS version directories."""
+        versions_dir = self.data_dir / INDEX_VERSIONS_DIR
+        versions = sorted((p for p in versions_dir.iterdir() if p.is_dir()), key=lambda p: p.name, reverse=True)
+        for old in versions[RAG_INDEX_KEEP_VERSIONS:]:
+            if old != self.index_root:
+                shutil.rmtree(old, ignore_errors=True)
+                logger.info(f"RAG: Removed old index version {old.name}")
@@ -1,50 +1,365 @@
 import os
+import re
+import json
+import time
+import asyncio
+import logging
 from dotenv import load_dotenv
-from .providers.openai_provider import call_openai
+from .providers.router import get_llm_router
+from .telemetry import span, record_span
+from .translation_cache import get_translation_cache
 from ..config.system_prompt import get_system_prompt
-from ..rag import retrieve_context, format_rag_prompt
+from .sessions import Session, get_session_store
+from .reply_cache import ReplyCache, ReplyLookup, get_reply_cache, REPLY_CACHE_ENABLED
+from ..rag import (
+    retrieve_context_async,
+    rag_system_prompt,
+    rag_user_message,
+    get_registry,
+    get_session_docs,
+    format_file_context,
+)
 load_dotenv()
 
-async def generate_spanish_reply(user_message: str, context: str | None = None) -> str:
+logger = logging.getLogger(__name__)
+
+# A sentence ends at . ! ? or … (optionally followed by closing quotes/brackets)
+# and is followed by whitespace. Used to cut the token stream into speakable pieces.
+_SENTENCE_END = re.compile(r'[.!?…]+["\'»”)\]]*\s+')
+
+# Batch translation: how many segments / characters to pack into one LLM call,
+# and how many packed calls may run at once
+TRANSLATE_PACK_MAX_SEGMENTS = int(os.getenv("TRANSLATE_PACK_MAX_SEGMENTS", "20"))
+TRANSLATE_PACK_MAX_CHARS = int(os.getenv("TRANSLATE_PACK_MAX_CHARS", "3000"))
+TRANSLATE_BATCH_CONCURRENCY = int(os.getenv("TRANSLATE_BATCH_CONCURRENCY", "4"))
+
+
+async def build_reply_prompt(user_message: str, context: str | None = None,
+                             session_id: str | None = None) -> tuple[str, str]:
     """
-    Generates a Spanish reply using the "Alberto" persona and class context.
-    Now with RAG support for SPN1130.
+    Build the system prompt and user message for an Alberto reply.
+    Adds RAG context for classes with course materials without blocking the event loop,
+    plus the most relevant chunks of any files uploaded in this session.
+
+    For classes with course materials the knowledge-base instruction is always
+    part of the system prompt, even when retrieval finds nothing (or is skipped
+    for small talk), so the prompt prefix stays byte-stable across turns and
+    provider-side prompt caching keeps hitting.
+
+    Returns:
+        Tuple of (system_prompt, augmented_message)
     """
-    
     system_prompt = get_system_prompt(context)
-    augmented_message = user_message
-    
-    # --- RAG Enhancement (only for SPN1130) ---
-    if context == "spanish_1130":
+    rag_context = None
+    file_context = None
+
+    async def course_context():
         try:
-            rag_context = retrieve_context(user_message, context)
-            if rag_context:
-                system_prompt, augmented_message = format_rag_prompt(
-                    system_prompt, 
-                    user_message, 
-                    rag_context
-                )
-                print("RAG: Enhanced prompt with course materials")
+            with span("retrieval"):
+                return await retrieve_context_async(user_message, context)
         except Exception as e:
-            print(f"RAG: Failed to retrieve context, continuing without RAG: {e}")
+            logger.warning(f"RAG: Failed to retrieve context, continuing without RAG: {e}")
+            return None
+
+    async def uploaded_context():
+        try:
+            with span("file_retrieval"):
+                return format_file_context(await get_session_docs().search_async(session_id, user_message))
+        except Exception as e:
+            logger.warning(f"Uploads: Failed to retrieve file context: {e}")
+            return None
+
+    # --- RAG Enhancement (classes with course materials) ---
+    has_rag = get_registry().has_class(context)
+    has_files = get_session_docs().has_docs(session_id)
+    if has_rag:
+        system_prompt = rag_system_prompt(system_prompt)
+
+    if has_rag and has_files:
+        rag_context, file_context = await asyncio.gather(course_context(), uploaded_context())
+    elif has_rag:
+        rag_context = await course_context()
+    elif has_files:
+        file_context = await uploaded_context()
+
+    if rag_context:
+        logger.debug("RAG: Enhanced prompt with course materials")
+    augmented_message = rag_user_message(user_message, rag_context, file_context)
+    return system_prompt, augmented_message
+
+
+# Background summary roll-ups; kept referenced so they aren't garbage collected
+_background_tasks: set = set()
+
+
+async def summarize_in_background(system_prompt: str, transcript: str) -> str:
+    """Summaries wait behind chat and translation for provider slots."""
+    return await get_llm_router().complete(system_prompt, transcript, lane="background")
 
-    # --- Call LLM Provider ---
-    if os.getenv("OPENAI_API_KEY"):
-        return await call_openai(system_prompt, augmented_message)
 
-    raise RuntimeError("No LLM provider configured. Set OPENAI_API_KEY.")
+async def _finish_turn(session: Session | None, user_message: str, reply: str):
+    """Record the turn in the session and roll old turns into the summary if needed."""
+    if session is None:
+        return
+    store = get_session_store()
+    await store.record_turn(session, user_message, reply)
+    if session.needs_rollup():
+        task = asyncio.create_task(store.roll_up(session, summarize_in_background))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+async def _lookup_opener(user_message: str, context: str | None,
+                         session: Session | None) -> ReplyLookup | None:
+    """
+    Reply-cache lookup for the first message of a conversation.
+
+    Returns None when the cache doesn't apply (disabled, a later turn, files
+    uploaded, or a long message); otherwise a lookup whose `reply` is set on a hit.
+    """
+    if not REPLY_CACHE_ENABLED or not ReplyCache.eligible(user_message):
+        return None
+    if session is not None and (session.messages or session.summary or get_session_docs().has_docs(session.id)):
+        return None
+    with span("reply_cache"):
+        return await get_reply_cache().lookup(user_message, context or "default", get_llm_router().primary_model)
+
+
+async def generate_spanish_reply(user_message: str, context: str | None = None,
+                                 session: Session | None = None) -> str:
+    """
+    Generates a Spanish reply using the "Alberto" persona and class context.
+    Now with RAG support for each class's course materials, and conversation
+    memory when a session is given. Common openers may be answered from the
+    reply cache.
+    """
+    opener = await _lookup_opener(user_message, context, session)
+    if opener is not None and opener.reply is not None:
+        await _finish_turn(session, user_message, opener.reply)
+        return opener.reply
+
+    with span("prompt"):
+        system_prompt, augmented_message = await build_reply_prompt(
+            user_message, context, session.id if session else None
+        )
+        history = session.history() if session else None
+
+    # --- Call LLM Provider (hedged, with failover across configured providers) ---
+    router = get_llm_router()
+    if not router.configured:
+        raise RuntimeError("No LLM provider configured. Set OPENAI_API_KEY or LLM_PROVIDERS.")
+    with span("llm"):
+        reply = await router.complete(system_prompt, augmented_message, history=history)
+    if opener is not None:
+        get_reply_cache().store(opener, reply)
+    await _finish_turn(session, user_message, reply)
+    return reply
+
+
+def split_sentences(buffer: str) -> tuple[list[str], str]:
+    """
+    Split complete sentences off the front of a text buffer.
+
+    Returns:
+        Tuple of (complete_sentences, remaining_buffer)
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(buffer):
+        sentence = buffer[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, buffer[start:]
+
+
+async def stream_spanish_reply(user_message: str, context: str | None = None,
+                               session: Session | None = None):
+    """
+    Streams a Spanish reply as events so TTS can start on the first sentence.
+
+    Yields (event, text) tuples:
+        ("token", delta)       - each piece of text from the provider
+        ("sentence", sentence) - each complete sentence, as soon as it ends
+        ("done", full_reply)   - once, after the stream finishes
+
+    A cached opener reply is sent as one token followed by its sentences.
+    """
+    opener = await _lookup_opener(user_message, context, session)
+    if opener is not None and opener.reply is not None:
+        yield "token", opener.reply
+        sentences, rest = split_sentences(opener.reply)
+        for sentence in sentences + ([rest.strip()] if rest.strip() else []):
+            yield "sentence", sentence
+        await _finish_turn(session, user_message, opener.reply)
+        yield "done", opener.reply
+        return
+
+    with span("prompt"):
+        system_prompt, augmented_message = await build_reply_prompt(
+            user_message, context, session.id if session else None
+        )
+        history = session.history() if session else None
+
+    router = get_llm_router()
+    if not router.configured:
+        raise RuntimeError("No LLM provider configured. Set OPENAI_API_KEY or LLM_PROVIDERS.")
+
+    full_reply = ""
+    buffer = ""
+    # Recorded only when the stream completes; a span would also time abandoned streams
+    llm_started = time.perf_counter()
+    async for delta in router.stream(system_prompt, augmented_message, history=history):
+        full_reply += delta
+        buffer += delta
+        yield "token", delta
+
+        sentences, buffer = split_sentences(buffer)
+        for sentence in sentences:
+            yield "sentence", sentence
+
+    record_span("llm", time.perf_counter() - llm_started)
+
+    # Whatever is left is the final sentence (it may lack trailing whitespace)
+    if buffer.strip():
+        yield "sentence", buffer.strip()
+
+    if opener is not None:
+        get_reply_cache().store(opener, full_reply)
+    await _finish_turn(session, user_message, full_reply)
+    yield "done", full_reply
 
 
 async def generate_translation(text: str, target_language: str) -> str:
     """
     Translates text into the target language using a generic prompt.
+    Results are cached per (normalized text, target language, model).
     """
-    
+
+    router = get_llm_router()
+    if not router.configured:
+        raise RuntimeError("No LLM provider configured for translation. Set OPENAI_API_KEY or LLM_PROVIDERS.")
+
+    # Keyed by the primary model; a failover reply is cached under the same key
+    model = router.primary_model
+    cache = get_translation_cache()
+    key = cache.make_key(text, target_language, model)
+    with span("translation"):
+        return await cache.get_or_create(key, lambda: _translate_uncached(text, target_language))
+
+
+async def _translate_uncached(text: str, target_language: str) -> str:
     system_prompt = f"You are a helpful translation assistant. Translate the following text into {target_language}. Respond with ONLY the translation and nothing else."
     user_message = text
 
     # --- Call LLM Provider ---
-    if os.getenv("OPENAI_API_KEY"):
-        return await call_openai(system_prompt, user_message)
+    with span("translation.llm"):
+        return await get_llm_router().complete(system_prompt, user_message, lane="translate")
+
+
+async def generate_translations_batch(texts: list[str], target_language: str) -> list[str]:
+    """
+    Translates many texts with as few LLM calls as possible.
+
+    Texts are deduplicated by cache key and cached ones are answered directly.
+    The rest are packed several per LLM request using a JSON format keyed by
+    segment id, and packs run under a concurrency limit. Results come back in
+    input order. A segment missing from a packed reply (unparseable, or fewer
+    entries than segments) is retried on its own under the same limit; a pack
+    that fails outright raises, so provider errors reach the caller.
+    """
+    router = get_llm_router()
+    if not router.configured:
+        raise RuntimeError("No LLM provider configured for translation. Set OPENAI_API_KEY or LLM_PROVIDERS.")
+
+    model = router.primary_model
+    cache = get_translation_cache()
+    keys = [cache.make_key(text, target_language, model) for text in texts]
+
+    # Deduplicate, keeping the first text seen for each key
+    unique: dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        unique.setdefault(key, text)
+
+    results: dict[str, str] = {}
+    for key in unique:
+        cached = await cache.lookup(key)
+        if cached is not None:
+            results[key] = cached
+    misses = [key for key in unique if key not in results]
+
+    # Pack misses into groups bounded by segment count and characters
+    packs: list[list[str]] = []
+    current: list[str] = []
+    current_chars = 0
+    for key in misses:
+        length = len(unique[key])
+        if current and (len(current) >= TRANSLATE_PACK_MAX_SEGMENTS or current_chars + length > TRANSLATE_PACK_MAX_CHARS):
+            packs.append(current)
+            current, current_chars = [], 0
+        current.append(key)
+        current_chars += length
+    if current:
+        packs.append(current)
+
+    semaphore = asyncio.Semaphore(TRANSLATE_BATCH_CONCURRENCY)
+
+    async def run_pack(pack: list[str]) -> dict[str, str]:
+        async with semaphore:
+            return await _translate_pack([unique[key] for key in pack], pack, target_language)
 
-    raise RuntimeError("No LLM provider configured for translation. Set OPENAI_API_KEY.")
\ No newline at end of file
+    pack_tasks = {}
+    for pack in packs:
+        task = asyncio.ensure_future(run_pack(pack))
+        for key in pack:
+            pack_tasks[key] = task
+
+    async def from_pack(key: str) -> str:
+        packed = await pack_tasks[key]
+        if key in packed:
+            return packed[key]
+        async with semaphore:
+            return await _translate_uncached(unique[key], target_language)
+
+    # Go through the cache so identical in-flight single requests are shared
+    translated = await asyncio.gather(*(
+        cache.get_or_create(key, lambda key=key: from_pack(key)) for key in misses
+    ))
+    results.update(zip(misses, translated))
+
+    return [results[key] for key in keys]
+
+
+async def _translate_pack(segments: list[str], ids: list[str], target_language: str) -> dict[str, str]:
+    """Translate several segments in one call; returns {id: translation} for the ids it got back."""
+    if len(segments) == 1:
+        return {ids[0]: await _translate_uncached(segments[0], target_language)}
+
+    system_prompt = (
+        f"You are a helpful translation assistant. Translate each segment into {target_language}. "
+        'Reply with ONLY a JSON object of the form {"translations": [{"id": <number>, "text": "<translation>"}]} '
+        "with exactly one entry per input segment, using the same ids."
+    )
+    user_message = json.dumps(
+        {"segments": [{"id": i, "text": text} for i, text in enumerate(segments)]},
+        ensure_ascii=False,
+    )
+
+    with span("translation.llm"):
+        reply = await get_llm_router().complete(system_prompt, user_message, response_format={"type": "json_object"},
+                                                lane="translate")
+    try:
+        items = json.loads(reply).get("translations", [])
+    except (json.JSONDecodeError, AttributeError):
+        logger.warning("Batch translation: unparseable packed reply, falling back to single calls")
+        return {}
+
+    packed = {}
+    for item in items:
+        try:
+            index = int(item["id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < len(ids) and isinstance(item.get("text"), str):
+            packed[ids[index]] = item["text"]
+    return packed
@@ -0,0 +1,239 @@
+"""
+Minimal in-process Prometheus metrics.
+
+Counters and histograms are plain Python objects guarded by a lock, cheap
+enough to leave on in production. Existing stats (caches, scheduler,
+providers, retrieval) are read by collectors at scrape time rather than
+duplicated. `render_metrics()` produces the text exposition format served
+at /metrics. Each uvicorn worker has its own registry.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM replies
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(values: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in values.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Iterable[tuple]]):
+        """
+        Register a scrape-time collector.
+
+        It yields (name, type, help, [(labels_dict, value), ...]) tuples; a
+        failing collector is skipped so one broken source can't break /metrics.
+        """
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                continue
+            for name, kind, help, samples in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_format_labels(_labels(labels))} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter("gg_http_requests_total", "HTTP requests by route, method and status.")
+HTTP_LATENCY = REGISTRY.histogram("gg_http_request_duration_seconds", "HTTP request latency by route (full body for streams).")
+STAGE_LATENCY = REGISTRY.histogram("gg_stage_duration_seconds", "Duration of request stages (prompt build, retrieval, LLM, ...).")
+LLM_FIRST_TOKEN = REGISTRY.histogram("gg_llm_first_token_seconds", "Time to first token of streamed replies per provider.")
+LLM_TOKENS = REGISTRY.counter("gg_llm_tokens_total", "LLM tokens by model and kind (prompt/completion).")
+LLM_UPSTREAM = REGISTRY.counter("gg_llm_upstream_responses_total", "Upstream LLM responses by model and status class.")
+RETRIEVAL_CHUNKS = REGISTRY.histogram(
+    "gg_retrieval_chunks", "Chunks put in the prompt per course retrieval.", buckets=(0, 1, 2, 3, 5, 8, 13, 21)
+)
+RETRIEVAL_TOKENS = REGISTRY.histogram(
+    "gg_retrieval_context_tokens", "Course-material tokens put in the prompt per retrieval.",
+    buckets=(0, 100, 200, 300, 400, 600, 800, 1200, 1600, 2400),
+)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# --- Scrape-time collectors over existing stats ---
+
+@REGISTRY.collector
+def _cache_metrics():
+    from .translation_cache import get_translation_cache
+    from .reply_cache import get_reply_cache, REPLY_CACHE_ENABLED
+    from ..rag.registry import get_registry
+
+    hits, misses, ratio = [], [], []
+
+    def add(cache: str, memory: dict, **layers):
+        hits.append(({"cache": cache, "layer": "memory"}, memory["hits"]))
+        for layer, value in layers.items():
+            hits.append(({"cache": cache, "layer": layer}, value))
+        misses.append(({"cache": cache}, memory["misses"]))
+        ratio.append(({"cache": cache}, memory["hit_rate"]))
+
+    translation = get_translation_cache().stats()
+    add("translation", translation["memory"], disk=translation["disk_hits"])
+    stores = get_registry().stores()
+    if stores:
+        # One embeddings cache is shared by every class
+        embeddings = stores[0].embeddings.stats()
+        add("query_embeddings", embeddings["memory"], disk=embeddings["disk_hits"])
+    for store in stores:
+        add(f"rag_results_{store.class_level}", store.result_cache.stats())
+    if REPLY_CACHE_ENABLED:
+        replies = get_reply_cache().stats()
+        hits.append(({"cache": "reply", "layer": "exact"}, replies["exact_hits"]))
+        hits.append(({"cache": "reply", "layer": "semantic"}, replies["semantic_hits"]))
+        # Fills matched an entry still collecting reply variants, so they called the LLM
+        misses.append(({"cache": "reply"}, replies["misses"] + replies["fills"]))
+        ratio.append(({"cache": "reply"}, replies["hit_rate"]))
+
+    yield "gg_cache_hits_total", "counter", "Cache hits by cache and layer.", hits
+    yield "gg_cache_misses_total", "counter", "In-memory cache misses.", misses
+    yield "gg_cache_hit_ratio", "gauge", "In-memory cache hit rate.", ratio
+
+
+@REGISTRY.collector
+def _retrieval_metrics():
+    from ..rag.registry import get_registry
+
+    counts, ready = [], []
+    for store in get_registry().stores():
+        for path, value in store.retrieval_counts.items():
+            counts.append(({"class_level": store.class_level, "path": path}, value))
+        ready.append(({"class_level": store.class_level}, 1 if store.status == "ready" else 0))
+    yield "gg_retrieval_total", "counter", "Course retrievals by how they were answered.", counts
+    yield "gg_rag_index_ready", "gauge", "1 when the class index is loaded and ready.", ready
+
+
+@REGISTRY.collector
+def _provider_metrics():
+    from .providers.scheduler import get_scheduler
+    from .providers.router import get_llm_router
+
+    scheduler = get_scheduler().stats()
+    yield "gg_provider_active", "gauge", "Upstream requests holding a scheduler slot.", [({}, scheduler["active"])]
+    yield "gg_provider_queue_depth", "gauge", "Requests waiting for a scheduler slot.", [({}, scheduler["queue_depth"])]
+    lanes = scheduler["lanes"]
+    for key, name, help in (
+        ("requests", "gg_provider_requests_total", "Scheduler slots granted by lane."),
+        ("retries", "gg_provider_retries_total", "Upstream retries by lane."),
+        ("rate_limited", "gg_provider_rate_limited_total", "Upstream 429 responses by lane."),
+        ("server_errors", "gg_provider_server_errors_total", "Upstream 5xx responses by lane."),
+        ("failures", "gg_provider_failures_total", "Upstream calls that failed after retries, by lane."),
+    ):
+        yield name, "counter", help, [({"lane": lane}, stats[key]) for lane, stats in lanes.items()]
+    yield ("gg_provider_wait_max_seconds", "gauge", "Longest scheduler wait by lane.",
+           [({"lane": lane}, stats["wait_max_ms"] / 1000) for lane, stats in lanes.items()])
+
+    router = get_llm_router().stats()
+    yield "gg_llm_hedges_total", "counter", "Hedged requests started.", [({}, router["hedges"])]
+    yield "gg_llm_failovers_total", "counter", "Failovers after a provider error.", [({}, router["failovers"])]
+    for key, name, help in (
+        ("requests", "gg_llm_provider_requests_total", "Attempts sent to each provider."),
+        ("errors", "gg_llm_provider_errors_total", "Attempts that failed, by provider."),
+        ("wins", "gg_llm_provider_wins_total", "Attempts that produced the reply, by provider."),
+    ):
+        yield name, "counter", help, [({"provider": p}, stats[key]) for p, stats in router["providers"].items()]
+
+
+@REGISTRY.collector
+def _session_metrics():
+    from .sessions import get_session_store
+    from ..rag.session_docs import get_session_docs
+
+    sessions = get_session_store().stats()
+    uploads = get_session_docs().stats()
+    yield "gg_sessions_active", "gauge", "Conversation sessions in memory.", [({}, sessions["active_sessions"])]
+    yield "gg_session_rollups_total", "counter", "Summary roll-ups completed.", [({}, sessions["rollups"])]
+    yield "gg_upload_chunks", "gauge", "Uploaded-file chunks indexed across sessions.", [({}, uploads["chunks"])]
@@ -0,0 +1,126 @@
+"""
+Shared async HTTP client for upstream provider calls.
+
+One httpx.AsyncClient lives for the lifetime of the app so chat and translate
+requests reuse keep-alive connections instead of paying for a new TCP/TLS
+handshake on every call. The client is opened and closed from the FastAPI
+lifespan in main.py.
+"""
+
+import os
+import logging
+import importlib.util
+from typing import Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pool and timeout settings (all optional, see .env.example)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+
+# HTTP/2 needs the optional 'h2' package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("HTTP_HTTP2", "true").lower() != "false"
+
+_client: Optional[httpx.AsyncClient] = None
+_stats = {
+    "requests_total": 0,
+    "requests_in_flight": 0,
+    "clients_created": 0,
+}
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        HTTP_READ_TIMEOUT,
+        connect=HTTP_CONNECT_TIMEOUT,
+        pool=HTTP_POOL_TIMEOUT,
+    )
+    _stats["clients_created"] += 1
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=HTTP2_ENABLED)
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared client. Called once from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        logger.info(f"HTTP: Shared client ready (http2={HTTP2_ENABLED}, max_connections={HTTP_MAX_CONNECTIONS})")
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client and drop all pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("HTTP: Shared client closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client.
+
+    Falls back to creating one lazily so provider calls still work outside the
+    FastAPI lifespan (scripts, the Python shell).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+class track_request:
+    """Async context manager that counts in-flight and total upstream requests."""
+
+    async def __aenter__(self):
+        _stats["requests_total"] += 1
+        _stats["requests_in_flight"] += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        _stats["requests_in_flight"] -= 1
+        return False
+
+
+def get_pool_stats() -> dict:
+    """
+    Report pool configuration and current connection usage.
+
+    Connection counts come from the underlying httpcore pool and are best-effort.
+    """
+    stats = {
+        "http2": HTTP2_ENABLED,
+        "http2_available": HTTP2_AVAILABLE,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+        "connect_timeout": HTTP_CONNECT_TIMEOUT,
+        "read_timeout": HTTP_READ_TIMEOUT,
+        "client_open": _client is not None and not _client.is_closed,
+        **_stats,
+    }
+
+    connections = None
+    try:
+        pool = _client._transport._pool if _client is not None else None
+        connections = list(pool.connections) if pool is not None else None
+    except AttributeError:
+        pass
+
+    if connections is not None:
+        stats["connections_open"] = len(connections)
+        stats["connections_idle"] = sum(1 for c in connections if c.is_idle())
+        stats["connections_active"] = stats["connections_open"] - stats["connections_idle"]
+
+    return stats
@@ -1,45 +1,195 @@
 import os
+import json
 import httpx
+from .http_client import get_http_client, track_request
+from .scheduler import get_scheduler, parse_retry_after, RETRYABLE_ERRORS
+from ..tokens import count_tokens, count_message_tokens
+from ..metrics import LLM_TOKENS, LLM_UPSTREAM
+
+# Completion tokens assumed when charging the tokens-per-minute budget up front
+PROVIDER_EST_COMPLETION_TOKENS = int(os.getenv("PROVIDER_EST_COMPLETION_TOKENS", "400"))
+# Ask for token usage in the last stream chunk (stream_options.include_usage).
+# Turn off for OpenAI-compatible servers that reject the option.
+OPENAI_STREAM_USAGE = os.getenv("OPENAI_STREAM_USAGE", "true").lower() != "false"
 # FUNCTION TO CALL OPENAI API
 # Hola, ¿puedes presentarte?"
 
-async def call_openai(system_prompt:str, user_message:str) -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
+def build_messages(system_prompt: str, user_message: str, history: list[dict] | None = None) -> list[dict]:
+    """System prompt first, then any prior turns (or summaries), then the new user message."""
+    return [
+        {"role": "system", "content": system_prompt},
+        *(history or []),
+        {"role": "user", "content": user_message}
+    ]
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    return count_message_tokens(messages) + PROVIDER_EST_COMPLETION_TOKENS
+
+
+def record_upstream(model: str, status_code: int | None):
+    LLM_UPSTREAM.inc(model=model, status=f"{status_code // 100}xx" if status_code else "error")
+
+
+def record_usage(model: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+
+async def call_openai(system_prompt:str, user_message:str, response_format: dict | None = None,
+                      history: list[dict] | None = None, lane: str = "interactive",
+                      model: str | None = None, base_url: str | None = None, api_key: str | None = None) -> str:
+    # model / base_url / api_key override the env defaults for other OpenAI-compatible endpoints
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OpenAI_API_KEY not set")
-    model = os.getenv("openai_model", "gpt-5-mini")
-    base_url = os.getenv("openai_base_url", "https://api.openai.com/v1")
+    model = model or os.getenv("openai_model", "gpt-5-mini")
+    base_url = base_url or os.getenv("openai_base_url", "https://api.openai.com/v1")
     url = f"{base_url}/chat/completions"
+    messages = build_messages(system_prompt, user_message, history)
     payload = {
         "model": model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ],
+        "messages": messages,
     }
+    # e.g. {"type": "json_object"} for structured replies
+    if response_format:
+        payload["response_format"] = response_format
 
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
 
-    # Use an asynchronous HTTP client to call the OpenAI Chat Completions endpoint.
+    # Use the shared app-lifetime AsyncClient to call the OpenAI Chat Completions endpoint.
     # Steps:
-    # 1. Create an AsyncClient with a 60-second timeout to avoid blocking forever.
+    # 1. Reuse the pooled client from http_client.py so keep-alive connections (and
+    #    HTTP/2 when available) skip the TCP/TLS handshake on every call.
     # 2. Send a POST request to `url` with the authorization header and the JSON `payload`.
-    # 3. Call `response.raise_for_status()` to raise an exception for any non-2xx HTTP
-    #    status codes so error handling can be performed by the caller.
+    # 3. Go through the provider scheduler, which limits concurrency by priority
+    #    `lane`, retries 429/5xx with backoff and raises ProviderError when it gives up.
     # 4. Parse the response body as JSON with `response.json()` and extract the
     #    assistant's reply from the OpenAI chat response structure at
     #    `choices[0]['message']['content']`.
-    async with httpx.AsyncClient(timeout=60) as client:
-        response = await client.post(
-            url,
-            headers=headers,
-            json=payload
-        )
-        if response.status_code >= 400:
-            raise RuntimeError(f"OpenAI {response.status_code}: {response.text}")
-        response.raise_for_status()
-        data = response.json()
-        return data['choices'][0]['message']['content']
\ No newline at end of file
+    client = get_http_client()
+    scheduler = get_scheduler()
+    est_tokens = estimate_tokens(messages)
+
+    async def send():
+        async with track_request():
+            try:
+                response = await client.post(
+                    url,
+                    headers=headers,
+                    json=payload
+                )
+            except RETRYABLE_ERRORS:
+                record_upstream(model, None)
+                raise
+        record_upstream(model, response.status_code)
+        return response
+
+    response = await scheduler.run(send, lane=lane, est_tokens=est_tokens)
+    data = response.json()
+    content = data['choices'][0]['message']['content']
+    usage = data.get("usage") or {}
+    record_usage(
+        model,
+        usage.get("prompt_tokens", count_message_tokens(messages)),
+        usage.get("completion_tokens", count_tokens(content or "")),
+    )
+    used = usage.get("total_tokens")
+    if scheduler.bucket and used:
+        scheduler.bucket.adjust(used - est_tokens)
+    return content
+
+
+async def stream_openai(system_prompt: str, user_message: str, history: list[dict] | None = None,
+                        lane: str = "interactive", model: str | None = None,
+                        base_url: str | None = None, api_key: str | None = None,
+                        stream_usage: bool | None = None):
+    """
+    Stream a chat completion from OpenAI, yielding text deltas as they arrive.
+
+    Uses `stream=True` so the provider sends Server-Sent Events; each
+    `data:` line carries a chunk whose `choices[0].delta.content` holds the
+    next piece of the reply. The stream ends with `data: [DONE]`.
+
+    The scheduler slot is held for the whole stream. Failures are retried
+    only before the first delta, so a reply is never restarted midway.
+    With `stream_usage` (default OPENAI_STREAM_USAGE) the final chunk carries
+    token usage, which settles the tokens-per-minute charge; without it the
+    charge is settled from local token counts.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OpenAI_API_KEY not set")
+    model = model or os.getenv("openai_model", "gpt-5-mini")
+    base_url = base_url or os.getenv("openai_base_url", "https://api.openai.com/v1")
+    url = f"{base_url}/chat/completions"
+    messages = build_messages(system_prompt, user_message, history)
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": True,
+    }
+    if stream_usage is None:
+        stream_usage = OPENAI_STREAM_USAGE
+    if stream_usage:
+        # Final chunk carries token usage
+        payload["stream_options"] = {"include_usage": True}
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    client = get_http_client()
+    scheduler = get_scheduler()
+    est_tokens = estimate_tokens(messages)
+    started = False
+    parts = []
+    usage = {}
+    for attempt in range(scheduler.max_retries + 1):
+        error = None
+        try:
+            async with scheduler.slot(lane, est_tokens if attempt == 0 else 0):
+                async with track_request():
+                    async with client.stream("POST", url, headers=headers, json=payload) as response:
+                        record_upstream(model, response.status_code)
+                        if response.status_code < 400:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    break
+                                chunk = json.loads(data)
+                                usage = chunk.get("usage") or usage
+                                choices = chunk.get("choices") or []
+                                if not choices:
+                                    continue
+                                delta = choices[0].get("delta", {}).get("content")
+                                if delta:
+                                    started = True
+                                    parts.append(delta)
+                                    yield delta
+                            prompt_tokens = usage.get("prompt_tokens", count_message_tokens(messages))
+                            completion_tokens = usage.get("completion_tokens", count_tokens("".join(parts)))
+                            record_usage(model, prompt_tokens, completion_tokens)
+                            used = usage.get("total_tokens") or prompt_tokens + completion_tokens
+                            if scheduler.bucket and used:
+                                scheduler.bucket.adjust(used - est_tokens)
+                            return
+                        body = (await response.aread()).decode(errors="replace")
+        except RETRYABLE_ERRORS as e:
+            record_upstream(model, None)
+            if started:
+                raise
+            error = e
+        if error is not None:
+            await scheduler.retry_or_raise(lane, attempt, error=error)
+        else:
+            await scheduler.retry_or_raise(
+                lane, attempt, response.status_code, body,
+                parse_retry_after(response.headers.get("retry-after")),
+            )
@@ -0,0 +1,331 @@
+"""
+LLM provider registry with hedged requests and failover.
+
+Providers are configured from the environment (see .env.example) and tried
+in order. On an error before the first token the next provider takes over.
+For interactive chat, if the current provider hasn't produced its first token
+within a deadline derived from its recent p95, the next one is started too;
+whichever answers first wins and the other is cancelled.
+"""
+
+import os
+import logging
+import time
+import asyncio
+from collections import defaultdict, deque
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from .openai_provider import call_openai, stream_openai
+from .stub_provider import StubLLM
+from ..metrics import LLM_FIRST_TOKEN
+from ..telemetry import record_span
+
+logger = logging.getLogger(__name__)
+
+# Hedge interactive requests. The deadline is the p95 latency x multiplier, taken
+# from first-token times for streams and from full-reply times (per lane) for completions
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() != "false"
+LLM_HEDGE_MULTIPLIER = float(os.getenv("LLM_HEDGE_MULTIPLIER", "1.0"))
+# Deadline used until enough samples exist, and its bounds (seconds)
+LLM_HEDGE_DEFAULT = float(os.getenv("LLM_HEDGE_DEFAULT", "3.0"))
+LLM_HEDGE_MIN = float(os.getenv("LLM_HEDGE_MIN", "0.5"))
+LLM_HEDGE_MAX = float(os.getenv("LLM_HEDGE_MAX", "10.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+
+class LatencyWindow:
+    """Recent latencies for percentile estimates."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class LLMProvider:
+    """One configured upstream (or the local stub)."""
+
+    kind = "base"
+
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        # Streams: time to first token. Completions: time to the full reply, per lane
+        self.first_token = LatencyWindow()
+        self.complete_latency: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.cancelled = 0
+
+    async def complete(self, system_prompt: str, user_message: str, response_format: dict | None = None,
+                       history: list[dict] | None = None, lane: str = "interactive") -> str:
+        raise NotImplementedError
+
+    def stream(self, system_prompt: str, user_message: str, history: list[dict] | None = None,
+               lane: str = "interactive") -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def latency(self, streaming: bool, lane: str) -> LatencyWindow:
+        """The latency window for a call type; streams and completions don't share one."""
+        return self.first_token if streaming else self.complete_latency[lane]
+
+    def stats(self) -> dict:
+        p50, p95 = self.first_token.percentile(50), self.first_token.percentile(95)
+        complete_p95 = {lane: window.percentile(95) for lane, window in self.complete_latency.items()}
+        return {
+            "kind": self.kind,
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "wins": self.wins,
+            "cancelled": self.cancelled,
+            "first_token_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "first_token_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "complete_p95_ms": {lane: round(v * 1000, 1) for lane, v in complete_p95.items() if v is not None},
+        }
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    kind = "openai"
+
+    def __init__(self, name: str, model: str, base_url: str, api_key: str, stream_usage: bool | None = None):
+        super().__init__(name, model)
+        self.base_url = base_url
+        self.api_key = api_key
+        # None follows OPENAI_STREAM_USAGE
+        self.stream_usage = stream_usage
+
+    async def complete(self, system_prompt, user_message, response_format=None, history=None, lane="interactive"):
+        return await call_openai(system_prompt, user_message, response_format=response_format, history=history,
+                                 lane=lane, model=self.model, base_url=self.base_url, api_key=self.api_key)
+
+    def stream(self, system_prompt, user_message, history=None, lane="interactive"):
+        return stream_openai(system_prompt, user_message, history=history, lane=lane, model=self.model,
+                             base_url=self.base_url, api_key=self.api_key, stream_usage=self.stream_usage)
+
+
+class StubProvider(LLMProvider):
+    kind = "stub"
+
+    def __init__(self, name: str = "stub"):
+        super().__init__(name, "stub")
+        self.llm = StubLLM()
+
+    async def complete(self, system_prompt, user_message, response_format=None, history=None, lane="interactive"):
+        return await self.llm.complete(system_prompt, user_message, response_format, history)
+
+    def stream(self, system_prompt, user_message, history=None, lane="interactive"):
+        return self.llm.stream(system_prompt, user_message, history)
+
+
+def providers_from_env() -> List[LLMProvider]:
+    """
+    Build the ordered provider list.
+
+    LLM_PROVIDERS is a comma-separated list of names. Each name reads
+    LLM_PROVIDER_<NAME>_TYPE (openai|stub), _BASE_URL, _API_KEY, _MODEL and
+    _STREAM_USAGE (true|false, defaults to OPENAI_STREAM_USAGE).
+    The name "openai" defaults to OPENAI_API_KEY / openai_model /
+    openai_base_url, and "stub" defaults to the local stub. Without
+    LLM_PROVIDERS: "openai" when OPENAI_API_KEY is set, plus
+    "openai_secondary" when OPENAI_SECONDARY_MODEL is set.
+    """
+    names = [n.strip() for n in os.getenv("LLM_PROVIDERS", "").split(",") if n.strip()]
+    if not names:
+        if os.getenv("OPENAI_API_KEY"):
+            names.append("openai")
+            if os.getenv("OPENAI_SECONDARY_MODEL"):
+                names.append("openai_secondary")
+
+    default_base_url = os.getenv("openai_base_url", "https://api.openai.com/v1")
+    defaults = {
+        "openai": {"model": os.getenv("openai_model", "gpt-5-mini")},
+        "openai_secondary": {"model": os.getenv("OPENAI_SECONDARY_MODEL", "")},
+    }
+
+    providers = []
+    for name in names:
+        prefix = f"LLM_PROVIDER_{name.upper()}_"
+        kind = os.getenv(prefix + "TYPE", "stub" if name == "stub" else "openai").lower()
+        if kind == "stub":
+            providers.append(StubProvider(name))
+            continue
+        model = os.getenv(prefix + "MODEL") or defaults.get(name, {}).get("model") or os.getenv("openai_model", "gpt-5-mini")
+        base_url = os.getenv(prefix + "BASE_URL", default_base_url).rstrip("/")
+        api_key = os.getenv(prefix + "API_KEY") or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            logger.warning(f"LLM: Skipping provider '{name}' (no API key)")
+            continue
+        stream_usage = os.getenv(prefix + "STREAM_USAGE")
+        stream_usage = None if stream_usage is None else stream_usage.lower() != "false"
+        providers.append(OpenAICompatibleProvider(name, model, base_url, api_key, stream_usage))
+    return providers
+
+
+class LLMRouter:
+    """Sends completions to the configured providers with hedging and failover."""
+
+    def __init__(self, providers: List[LLMProvider], hedge: bool = LLM_HEDGE):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedges = 0
+        self.failovers = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.providers)
+
+    @property
+    def primary_model(self) -> str:
+        return self.providers[0].model if self.providers else ""
+
+    def hedge_delay(self, provider: LLMProvider, streaming: bool = True, lane: str = "interactive") -> float:
+        """
+        Seconds to wait for `provider` before starting the next provider.
+
+        Streams wait on the first token, completions on the whole reply, so
+        each uses the latency window of its own call type.
+        """
+        window = provider.latency(streaming, lane)
+        if len(window.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT
+        delay = window.percentile(95) * LLM_HEDGE_MULTIPLIER
+        return min(LLM_HEDGE_MAX, max(LLM_HEDGE_MIN, delay))
+
+    async def _race(self, start: Callable[[LLMProvider], tuple], hedge: bool, streaming: bool, lane: str):
+        """
+        Run attempts across providers until one produces a first result.
+
+        `start(provider)` returns (awaitable, stream): the awaitable gives the
+        first result, and `stream` is the async generator it came from (None
+        for plain completions). Returns (provider, result, stream) for the
+        winner; losers are cancelled and their streams closed. Latency goes to
+        the provider's window for this call type (`streaming`, `lane`).
+        """
+        if not self.providers:
+            raise RuntimeError("No LLM provider configured. Set OPENAI_API_KEY or LLM_PROVIDERS.")
+        remaining = list(self.providers)
+        pending = {}
+        last_error = None
+        race_started = time.monotonic()
+
+        def launch():
+            provider = remaining.pop(0)
+            provider.requests += 1
+            awaitable, stream = start(provider)
+            pending[asyncio.ensure_future(awaitable)] = (provider, stream, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if hedge and remaining and len(pending) == 1:
+                    provider, _, started = next(iter(pending.values()))
+                    timeout = max(0.0, self.hedge_delay(provider, streaming, lane) - (time.monotonic() - started))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    provider, stream, started = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except StopAsyncIteration:
+                        result = ""
+                    except Exception as e:
+                        provider.errors += 1
+                        last_error = e
+                        logger.warning(f"LLM: Provider '{provider.name}' failed: {e}")
+                        if stream is not None:
+                            await stream.aclose()
+                        continue
+                    elapsed = time.monotonic() - started
+                    provider.latency(streaming, lane).add(elapsed)
+                    provider.wins += 1
+                    if streaming:
+                        LLM_FIRST_TOKEN.observe(elapsed, provider=provider.name)
+                        record_span("llm.first_token", time.monotonic() - race_started)
+                    return provider, result, stream
+                if not pending and remaining:
+                    self.failovers += 1
+                    launch()
+        finally:
+            await self._cancel(pending, streaming, lane)
+        raise last_error
+
+    async def _cancel(self, pending: dict, streaming: bool, lane: str):
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for provider, stream, started in pending.values():
+            provider.cancelled += 1
+            # A lower bound, but leaving slow losers out would drag the p95 down
+            provider.latency(streaming, lane).add(time.monotonic() - started)
+            if stream is not None:
+                await stream.aclose()
+
+    async def complete(self, system_prompt: str, user_message: str, response_format: dict | None = None,
+                       history: list[dict] | None = None, lane: str = "interactive") -> str:
+        """One full completion; hedged on the interactive lane, failover on every lane."""
+        def start(provider):
+            return provider.complete(system_prompt, user_message, response_format, history, lane), None
+
+        _, result, _ = await self._race(start, hedge=self.hedge and lane == "interactive", streaming=False, lane=lane)
+        return result
+
+    async def stream(self, system_prompt: str, user_message: str, history: list[dict] | None = None,
+                     lane: str = "interactive"):
+        """
+        Stream deltas from whichever provider produces a first token first.
+
+        Hedging and failover only apply before the first token; after that the
+        winning stream is followed to the end.
+        """
+        def start(provider):
+            stream = provider.stream(system_prompt, user_message, history, lane)
+            return stream.__anext__(), stream
+
+        _, first, stream = await self._race(start, hedge=self.hedge and lane == "interactive", streaming=True, lane=lane)
+        try:
+            if first:
+                yield first
+                async for delta in stream:
+                    yield delta
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "providers": {
+                p.name: {
+                    **p.stats(),
+                    "hedge_delay_ms": round(self.hedge_delay(p) * 1000, 1),
+                    "complete_hedge_delay_ms": round(self.hedge_delay(p, streaming=False) * 1000, 1),
+                }
+                for p in self.providers
+            },
+        }
+
+
+_router = None
+
+def get_llm_router() -> LLMRouter:
+    """Get or create the LLM router singleton."""
+    global _router
+    if _router is None:
+        _router = LLMRouter(providers_from_env())
+        logger.info(f"LLM: Providers {[p.name for p in _router.providers]} (hedging={_router.hedge})")
+    return _router
@@ -0,0 +1,300 @@
+"""
+Provider-side request scheduler.
+
+Caps concurrent upstream requests, optionally keeps to a tokens-per-minute
+budget, and hands out free slots by priority lane so interactive chat goes
+ahead of translations and background work (session summaries). Retryable
+failures (429, 5xx, connection errors) are retried with jittered exponential
+backoff, honoring Retry-After. Queue depth and wait times are kept per lane.
+"""
+
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+import httpx
+
+PROVIDER_MAX_CONCURRENT = int(os.getenv("PROVIDER_MAX_CONCURRENT", "16"))
+# Tokens per minute across all lanes (0 = no budget)
+PROVIDER_TPM = int(os.getenv("PROVIDER_TPM", "0"))
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "3"))
+PROVIDER_BACKOFF_BASE = float(os.getenv("PROVIDER_BACKOFF_BASE", "0.5"))
+PROVIDER_BACKOFF_MAX = float(os.getenv("PROVIDER_BACKOFF_MAX", "20"))
+# Give up on a request that has waited this long for a slot
+PROVIDER_QUEUE_TIMEOUT = float(os.getenv("PROVIDER_QUEUE_TIMEOUT", "30"))
+
+# Lower number = served first
+LANES = {"interactive": 0, "translate": 1, "background": 2}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Connection-level failures worth resending (read timeouts are not: the model may still be billing)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+
+class ProviderError(RuntimeError):
+    """An upstream call that failed for good (after retries)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (accepts delta-seconds or an HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute budget, refilled continuously.
+
+    Callers that have to wait queue by priority (lower first): only the head
+    of the queue takes tokens, so a waiting chat turn isn't starved by
+    background calls grabbing the refill ahead of it.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._queue: list = []
+        self._seq = itertools.count()
+        # Set (and replaced) whenever the head of the queue leaves
+        self._turn = asyncio.Event()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: int, priority: int = 0):
+        amount = min(amount, self.capacity)
+        self._refill()
+        if not self._queue and self.tokens >= amount:
+            self.tokens -= amount
+            return
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._queue, entry)
+        try:
+            while True:
+                if self._queue[0] != entry:
+                    await self._turn.wait()
+                    continue
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+        finally:
+            was_head = self._queue[0] == entry
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            if was_head:
+                self._turn.set()
+                self._turn = asyncio.Event()
+
+    def adjust(self, delta: int):
+        """Charge (positive) or refund (negative) the difference once actual usage is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class LaneStats:
+    def __init__(self):
+        self.queued = 0
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.failures = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "requests": self.requests,
+            "wait_avg_ms": round(self.wait_total / self.requests * 1000, 1) if self.requests else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "failures": self.failures,
+        }
+
+
+class ProviderScheduler:
+    """Priority-laned concurrency limiter with retries for upstream calls."""
+
+    def __init__(self, max_concurrent: int = PROVIDER_MAX_CONCURRENT, tpm: int = PROVIDER_TPM,
+                 max_retries: int = PROVIDER_MAX_RETRIES):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(tpm) if tpm else None
+        self.active = 0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self.lanes = {lane: LaneStats() for lane in LANES}
+
+    # --- Slots ---
+
+    async def _acquire(self, lane: str):
+        stats = self.lanes[lane]
+        started = time.monotonic()
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (LANES[lane], next(self._seq), future))
+            stats.queued += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=PROVIDER_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    future.cancel()
+                raise ProviderError(f"Provider queue wait exceeded {PROVIDER_QUEUE_TIMEOUT}s", status_code=503)
+            except asyncio.CancelledError:
+                # Granted just as we were cancelled: pass the slot on
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    future.cancel()
+                raise
+            finally:
+                stats.queued -= 1
+
+        waited = time.monotonic() - started
+        stats.requests += 1
+        stats.wait_total += waited
+        stats.wait_max = max(stats.wait_max, waited)
+
+    def _release(self):
+        # Hand the slot straight to the highest-priority live waiter
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, lane: str = "interactive", est_tokens: int = 0):
+        """
+        Hold one upstream slot (and charge the token budget) for the duration of the block.
+
+        Tokens are taken before the slot, so calls waiting on the budget don't
+        hold slots that higher-priority lanes could use.
+        """
+        charged = bool(self.bucket and est_tokens)
+        if charged:
+            await self.bucket.take(est_tokens, LANES[lane])
+        try:
+            await self._acquire(lane)
+        except BaseException:
+            if charged:
+                self.bucket.adjust(-est_tokens)  # never sent
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    # --- Retries ---
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry `attempt` (0-based): Retry-After, else full-jitter exponential."""
+        if retry_after is not None:
+            return min(retry_after, PROVIDER_BACKOFF_MAX)
+        return random.uniform(0, min(PROVIDER_BACKOFF_MAX, PROVIDER_BACKOFF_BASE * (2 ** attempt)))
+
+    def record_status(self, lane: str, status_code: int):
+        if status_code == 429:
+            self.lanes[lane].rate_limited += 1
+        elif status_code >= 500:
+            self.lanes[lane].server_errors += 1
+
+    async def retry_or_raise(self, lane: str, attempt: int, status_code: Optional[int] = None,
+                             body: str = "", retry_after: Optional[float] = None,
+                             error: Optional[Exception] = None):
+        """
+        Handle a failed attempt: sleep before the next one, or raise ProviderError.
+
+        Call with the status code and body of an error response, or with the
+        connection `error` that ended the attempt. Must be called outside the slot.
+        """
+        stats = self.lanes[lane]
+        if status_code is not None:
+            self.record_status(lane, status_code)
+            retryable = status_code in RETRYABLE_STATUS
+            message = f"OpenAI {status_code}: {body}"
+        else:
+            retryable = isinstance(error, RETRYABLE_ERRORS)
+            message = f"Upstream connection failed: {error}"
+        if not retryable or attempt >= self.max_retries:
+            stats.failures += 1
+            raise ProviderError(message, status_code=status_code, retry_after=retry_after) from error
+        stats.retries += 1
+        await asyncio.sleep(self.backoff(attempt, retry_after))
+
+    async def run(self, send: Callable[[], Awaitable[httpx.Response]], lane: str = "interactive",
+                  est_tokens: int = 0) -> httpx.Response:
+        """
+        Send a request through the scheduler, retrying retryable failures.
+
+        `send` performs one attempt and returns the response. The slot is
+        released while sleeping between attempts. Raises ProviderError once
+        retries are exhausted or the failure isn't retryable.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.slot(lane, est_tokens if attempt == 0 else 0):
+                    response = await send()
+            except RETRYABLE_ERRORS as e:
+                await self.retry_or_raise(lane, attempt, error=e)
+                continue
+            if response.status_code < 400:
+                return response
+            await self.retry_or_raise(
+                lane, attempt, response.status_code, response.text,
+                parse_retry_after(response.headers.get("retry-after")),
+            )
+        raise ProviderError("Retries exhausted")
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "queue_depth": sum(1 for _, _, f in self._waiters if not f.done()),
+            "tpm_budget": self.bucket.capacity if self.bucket else None,
+            "tokens_available": int(self.bucket.tokens) if self.bucket else None,
+            "max_retries": self.max_retries,
+            "lanes": {lane: s.as_dict() for lane, s in self.lanes.items()},
+        }
+
+
+_scheduler = None
+
+def get_scheduler() -> ProviderScheduler:
+    """Get or create the provider scheduler singleton."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ProviderScheduler()
+    return _scheduler
@@ -0,0 +1,75 @@
+"""
+Deterministic local LLM stand-in.
+
+Answers without any network call so chat, streaming, translation, hedging and
+failover can be exercised offline. The same input always gives the same
+reply; latency and periodic failures are configurable.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+
+# Seconds before the first token, and between streamed words
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0.05"))
+LLM_STUB_TOKEN_DELAY = float(os.getenv("LLM_STUB_TOKEN_DELAY", "0.01"))
+# Fail every Nth call (0 = never), to exercise failover
+LLM_STUB_FAIL_EVERY = int(os.getenv("LLM_STUB_FAIL_EVERY", "0"))
+
+_REPLIES = [
+    "¡Hola! Soy Alberto. Qué bien que practiques español conmigo. ¿Qué hiciste hoy?",
+    "¡Muy bien! Tu frase tiene sentido. ¿Puedes decirme algo más sobre eso?",
+    "Interesante. Recuerda usar el verbo en la forma correcta. ¿Lo intentamos otra vez?",
+    "¡Excelente pregunta! Vamos a practicar con un ejemplo. ¿Qué te gusta hacer los fines de semana?",
+]
+
+
+class StubFailure(RuntimeError):
+    pass
+
+
+class StubLLM:
+    def __init__(self, latency: float = LLM_STUB_LATENCY, token_delay: float = LLM_STUB_TOKEN_DELAY,
+                 fail_every: int = LLM_STUB_FAIL_EVERY):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def _check_failure(self):
+        self.calls += 1
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise StubFailure(f"Stub failure (call {self.calls})")
+
+    def reply(self, system_prompt: str, user_message: str, response_format: dict | None = None) -> str:
+        """The reply text for a prompt (no latency, no failures)."""
+        if response_format and response_format.get("type") == "json_object":
+            # Packed translation request: echo each segment back, marked
+            try:
+                segments = json.loads(user_message).get("segments", [])
+            except (json.JSONDecodeError, AttributeError):
+                segments = []
+            return json.dumps(
+                {"translations": [{"id": s.get("id"), "text": f"[stub] {s.get('text', '')}"} for s in segments]},
+                ensure_ascii=False,
+            )
+        if "translat" in system_prompt.lower():
+            return f"[stub] {user_message}"
+        digest = hashlib.sha256(f"{system_prompt}\n{user_message}".encode("utf-8")).digest()
+        return _REPLIES[digest[0] % len(_REPLIES)]
+
+    async def complete(self, system_prompt: str, user_message: str, response_format: dict | None = None,
+                       history: list[dict] | None = None) -> str:
+        await asyncio.sleep(self.latency)
+        self._check_failure()
+        return self.reply(system_prompt, user_message, response_format)
+
+    async def stream(self, system_prompt: str, user_message: str, history: list[dict] | None = None):
+        await asyncio.sleep(self.latency)
+        self._check_failure()
+        words = self.reply(system_prompt, user_message).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
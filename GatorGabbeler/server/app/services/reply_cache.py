@@ -0,0 +1,238 @@
+"""
+Semantic cache of first-turn replies (opt-in with REPLY_CACHE=true).
+
+Conversations often open with the same few messages ("Hola, ¿puedes
+presentarte?", "¿Cómo estás?"). A new conversation's first message is matched
+against earlier openers for the same class context and model: first by
+normalized text (case, accents and punctuation ignored), then, for short
+greeting-like openers only, by cosine similarity of query embeddings. Longer
+messages are questions whose wording matters ("¿Qué es el pretérito?" vs
+"¿Qué es el imperfecto?"), so they only match exactly.
+
+The raw message is embedded through RAG's cached query embeddings, so a
+repeated opener costs no API call and a miss leaves its vector cached for
+retrieval. The embedding gets REPLY_CACHE_EMBED_TIMEOUT seconds; past that the
+lookup goes on with exact matching and the call finishes in the background.
+
+Each entry collects up to REPLY_CACHE_VARIANTS replies from real LLM calls
+before it starts answering, then picks one at random so students don't all
+get the identical greeting. Entries expire after REPLY_CACHE_TTL seconds and
+the least recently used are dropped beyond REPLY_CACHE_SIZE per scope.
+"""
+
+import os
+import time
+import asyncio
+import random
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..rag.lexical import tokenize
+
+logger = logging.getLogger(__name__)
+
+REPLY_CACHE_ENABLED = os.getenv("REPLY_CACHE", "false").lower() == "true"
+# Cosine similarity needed for a semantic match
+REPLY_CACHE_THRESHOLD = float(os.getenv("REPLY_CACHE_THRESHOLD", "0.97"))
+# Openers with more words than this match on exact (normalized) text only
+REPLY_CACHE_SEMANTIC_MAX_TOKENS = int(os.getenv("REPLY_CACHE_SEMANTIC_MAX_TOKENS", "6"))
+# Replies gathered per entry before it is served from
+REPLY_CACHE_VARIANTS = max(1, int(os.getenv("REPLY_CACHE_VARIANTS", "3")))
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "500"))
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL", "86400"))
+# Longer first messages are real questions, not openers; skip the cache
+REPLY_CACHE_MAX_CHARS = int(os.getenv("REPLY_CACHE_MAX_CHARS", "120"))
+# "false" matches on normalized text only (no embedding calls)
+REPLY_CACHE_SEMANTIC = os.getenv("REPLY_CACHE_SEMANTIC", "true").lower() != "false"
+# Seconds to wait for the opener's embedding before matching on text only
+REPLY_CACHE_EMBED_TIMEOUT = float(os.getenv("REPLY_CACHE_EMBED_TIMEOUT", "0.3"))
+
+
+def normalize_opener(text: str) -> str:
+    """Casefold, strip accents and punctuation: '¡Hola!' and 'hola' match."""
+    return " ".join(tokenize(text))
+
+
+@dataclass
+class ReplyEntry:
+    text: str
+    vector: Optional[np.ndarray]
+    replies: List[str] = field(default_factory=list)
+    expires_at: float = 0.0
+    served: int = 0
+
+
+@dataclass
+class ReplyLookup:
+    """Result of a lookup; pass it back to `store` after generating a reply on a miss."""
+    scope: Tuple[str, str]
+    key: str
+    reply: Optional[str] = None
+    vector: Optional[np.ndarray] = None
+    match: Optional[str] = None  # key of the matched entry still collecting variants
+
+
+class ReplyCache:
+    """Per-scope LRU of opener entries with TTL, exact and embedding matching."""
+
+    def __init__(self, embeddings=None, threshold: float = REPLY_CACHE_THRESHOLD,
+                 variants: int = REPLY_CACHE_VARIANTS, maxsize: int = REPLY_CACHE_SIZE,
+                 ttl: float = REPLY_CACHE_TTL, semantic_max_tokens: int = REPLY_CACHE_SEMANTIC_MAX_TOKENS,
+                 embed_timeout: float = REPLY_CACHE_EMBED_TIMEOUT):
+        # Object with async `aembed_query`; None disables semantic matching
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.semantic_max_tokens = semantic_max_tokens
+        self.embed_timeout = embed_timeout
+        self.variants = variants
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._scopes: Dict[Tuple[str, str], OrderedDict] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.evictions = 0
+        self.embed_errors = 0
+        self.embed_timeouts = 0
+
+    @staticmethod
+    def eligible(text: str) -> bool:
+        return 0 < len(text) <= REPLY_CACHE_MAX_CHARS and bool(normalize_opener(text))
+
+    def semantic_eligible(self, key: str) -> bool:
+        """Short, greeting-like openers may match by embedding; anything longer needs the same words."""
+        return self.embeddings is not None and len(key.split()) <= self.semantic_max_tokens
+
+    async def lookup(self, text: str, context: str, model: str) -> ReplyLookup:
+        """Find a cached reply for an opener; `result.reply` is None on a miss."""
+        result = ReplyLookup(scope=(context, model), key=normalize_opener(text))
+        with self._lock:
+            entry = self._get(result.scope, result.key)
+            if entry is not None:
+                if len(entry.replies) >= self.variants:
+                    self.exact_hits += 1
+                    return self._serve(entry, result)
+                result.match = entry.text
+
+        if result.match is None and self.semantic_eligible(result.key):
+            # Same text retrieval embeds, so the shared query cache serves both
+            embedding = asyncio.ensure_future(self.embeddings.aembed_query(text))
+            try:
+                vector = await asyncio.wait_for(asyncio.shield(embedding), timeout=self.embed_timeout)
+                vector = np.asarray(vector, dtype=np.float32)
+                result.vector = vector / (np.linalg.norm(vector) or 1.0)
+            except asyncio.TimeoutError:
+                # Let it finish and land in the cache; this lookup goes on without it
+                embedding.add_done_callback(lambda f: f.cancelled() or f.exception())
+                self.embed_timeouts += 1
+            except Exception as e:
+                self.embed_errors += 1
+                logger.warning(f"Reply cache: Embedding failed, matching on text only: {e}")
+            if result.vector is not None:
+                with self._lock:
+                    entry = self._nearest(result.scope, result.vector)
+                    if entry is not None:
+                        if len(entry.replies) >= self.variants:
+                            self.semantic_hits += 1
+                            return self._serve(entry, result)
+                        result.match = entry.text
+
+        with self._lock:
+            if result.match is not None:
+                self.fills += 1
+            else:
+                self.misses += 1
+        return result
+
+    def store(self, lookup: ReplyLookup, reply: str):
+        """Add a freshly generated reply to the matched entry, or start a new one."""
+        if not reply.strip():
+            return
+        with self._lock:
+            entries = self._scopes.setdefault(lookup.scope, OrderedDict())
+            key = lookup.match or lookup.key
+            entry = self._get(lookup.scope, key)
+            if entry is None:
+                entry = entries[key] = ReplyEntry(text=key, vector=lookup.vector)
+            if len(entry.replies) < self.variants and reply not in entry.replies:
+                entry.replies.append(reply)
+            entry.expires_at = time.monotonic() + self.ttl
+            entries.move_to_end(key)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get(self, scope, key: str) -> Optional[ReplyEntry]:
+        entries = self._scopes.get(scope)
+        entry = entries.get(key) if entries else None
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, scope, vector: np.ndarray) -> Optional[ReplyEntry]:
+        entries = self._scopes.get(scope)
+        if not entries:
+            return None
+        now = time.monotonic()
+        for key in [k for k, e in entries.items() if e.expires_at <= now]:
+            del entries[key]
+        candidates = [e for e in entries.values() if e.vector is not None]
+        if not candidates:
+            return None
+        scores = np.stack([e.vector for e in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        entries.move_to_end(candidates[best].text)
+        return candidates[best]
+
+    def _serve(self, entry: ReplyEntry, result: ReplyLookup) -> ReplyLookup:
+        entry.served += 1
+        result.reply = random.choice(entry.replies)
+        return result
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses + self.fills
+        return {
+            "enabled": REPLY_CACHE_ENABLED,
+            "entries": sum(len(entries) for entries in self._scopes.values()),
+            "scopes": len(self._scopes),
+            "threshold": self.threshold,
+            "semantic_max_tokens": self.semantic_max_tokens,
+            "variants": self.variants,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "fills": self.fills,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "embed_errors": self.embed_errors,
+            "embed_timeouts": self.embed_timeouts,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+_reply_cache = None
+
+def get_reply_cache() -> ReplyCache:
+    """Get or create the reply cache singleton (query embeddings shared with RAG)."""
+    global _reply_cache
+    if _reply_cache is None:
+        embeddings = None
+        if REPLY_CACHE_SEMANTIC:
+            from ..rag import get_registry
+            try:
+                embeddings = get_registry().embeddings
+            except Exception as e:
+                logger.warning(f"Reply cache: No embeddings available, matching on text only: {e}")
+        _reply_cache = ReplyCache(embeddings)
+    return _reply_cache
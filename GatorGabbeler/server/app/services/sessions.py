@@ -0,0 +1,216 @@
+"""
+Server-side conversation sessions for Alberto.
+
+Each session keeps a compact log of recent turns plus a running summary of
+older ones, in memory with optional JSON file backing and idle eviction.
+Prompt history is assembled to fit SESSION_TOKEN_BUDGET, and the prefix
+(system prompt, then summary, then the unsummarized turns) only changes when
+old turns are rolled into the summary, so provider-side prompt caching keeps
+hitting between turns.
+"""
+
+import os
+import logging
+import re
+import json
+import time
+import asyncio
+import secrets
+import threading
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from .tokens import count_tokens, count_message_tokens, MESSAGE_OVERHEAD_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Tokens of history (summary + turns) sent with each message
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "2000"))
+# Seconds without activity before a session is dropped
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+# Directory for JSON session files (memory only when unset)
+SESSION_STORE_DIR = os.getenv("SESSION_STORE_DIR")
+
+SUMMARY_PREFIX = "Resumen de la conversación anterior con este estudiante:\n"
+SUMMARY_SYSTEM_PROMPT = (
+    "Summarize this Spanish practice conversation between a student and the tutor Alberto "
+    "for the tutor's own memory. Keep names, topics, the student's level and recurring "
+    "mistakes. Write in Spanish, plain text, at most 120 words. If an earlier summary is "
+    "given, merge it into the new one."
+)
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+@dataclass
+class Session:
+    id: str
+    context: Optional[str] = None
+    messages: List[dict] = field(default_factory=list)
+    summary: str = ""
+    created_at: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+
+    def history(self, budget: int = SESSION_TOKEN_BUDGET) -> List[dict]:
+        """
+        Messages to send between the system prompt and the new user message.
+
+        Normally the summary plus every unsummarized turn. If the turns have
+        outgrown the budget before the next roll-up finishes, the oldest ones
+        are left out for this request only.
+        """
+        history = []
+        remaining = budget
+        if self.summary:
+            summary_message = {"role": "system", "content": SUMMARY_PREFIX + self.summary}
+            history.append(summary_message)
+            remaining -= count_tokens(summary_message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+        turns = []
+        for message in reversed(self.messages):
+            cost = count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if cost > remaining:
+                break
+            turns.append(message)
+            remaining -= cost
+        history.extend(reversed(turns))
+        return history
+
+    def needs_rollup(self, budget: int = SESSION_TOKEN_BUDGET) -> bool:
+        return count_message_tokens(self.messages) > budget
+
+
+class SessionStore:
+    """In-memory sessions with optional JSON file backing and idle eviction."""
+
+    def __init__(self, directory: Optional[str] = SESSION_STORE_DIR, idle_ttl: float = SESSION_IDLE_TTL):
+        self.directory = Path(directory) if directory else None
+        self.idle_ttl = idle_ttl
+        self.evictions = 0
+        self.rollups = 0
+        self._sessions: Dict[str, Session] = {}
+        self._rolling: set = set()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.json"
+
+    def _load(self, session_id: str) -> Optional[Session]:
+        if not self.directory:
+            return None
+        path = self._path(session_id)
+        if not path.exists():
+            return None
+        try:
+            return Session(**json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError, TypeError) as e:
+            logger.warning(f"Sessions: Ignoring unreadable session file {path.name}: {e}")
+            return None
+
+    def _write(self, session: Session):
+        if not self.directory:
+            return
+        path = self._path(session.id)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(session), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def get_or_create(self, session_id: Optional[str], context: Optional[str]) -> Session:
+        """
+        Return the session for `session_id`, creating one if it's missing, invalid or idle.
+
+        A session belongs to one class context; switching context starts fresh.
+        """
+        self._maybe_sweep()
+        if not session_id or not _SESSION_ID.match(session_id):
+            session_id = secrets.token_urlsafe(16)
+
+        with self._lock:
+            session = self._sessions.get(session_id) or self._load(session_id)
+            if session is None or time.time() - session.last_active > self.idle_ttl:
+                session = Session(id=session_id, context=context)
+            elif session.context != context:
+                session = Session(id=session_id, context=context)
+            session.last_active = time.time()
+            self._sessions[session_id] = session
+        return session
+
+    async def record_turn(self, session: Session, user_message: str, reply: str):
+        """Append a user/assistant turn and persist the session."""
+        session.messages.append({"role": "user", "content": user_message})
+        session.messages.append({"role": "assistant", "content": reply})
+        session.last_active = time.time()
+        await asyncio.to_thread(self._write, session)
+
+    async def roll_up(self, session: Session, summarize, budget: int = SESSION_TOKEN_BUDGET):
+        """
+        Fold the oldest turns into the running summary once the log passes the budget.
+
+        Rolls enough turns to get back under half the budget, so the summary
+        (and therefore the prompt prefix) changes rarely. `summarize` is an
+        async callable (system_prompt, text) -> summary.
+        """
+        if session.id in self._rolling or not session.needs_rollup(budget):
+            return
+        self._rolling.add(session.id)
+        try:
+            rolled = []
+            while session.messages and count_message_tokens(session.messages[len(rolled):]) > budget // 2:
+                rolled.extend(session.messages[len(rolled):len(rolled) + 2])
+            if not rolled:
+                return
+
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in rolled)
+            if session.summary:
+                transcript = f"Earlier summary:\n{session.summary}\n\nNew turns:\n{transcript}"
+            session.summary = (await summarize(SUMMARY_SYSTEM_PROMPT, transcript)).strip()
+            # Turns may have been appended meanwhile; only drop the ones we rolled
+            del session.messages[:len(rolled)]
+            self.rollups += 1
+            await asyncio.to_thread(self._write, session)
+        except Exception as e:
+            logger.warning(f"Sessions: Summary roll-up failed for {session.id}: {e}")
+        finally:
+            self._rolling.discard(session.id)
+
+    def _maybe_sweep(self, interval: float = 60.0):
+        now = time.monotonic()
+        if now - self._last_sweep < interval:
+            return
+        self._last_sweep = now
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_active < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+                self.evictions += 1
+        if self.directory:
+            for path in self.directory.glob("*.json"):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self._sessions),
+            "file_backed": self.directory is not None,
+            "idle_ttl": self.idle_ttl,
+            "token_budget": SESSION_TOKEN_BUDGET,
+            "evictions": self.evictions,
+            "rollups": self.rollups,
+        }
+
+
+_session_store = None
+
+def get_session_store() -> SessionStore:
+    """Get or create the session store singleton."""
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore()
+    return _session_store
@@ -0,0 +1,154 @@
+"""
+Precompressed, cache-friendly serving of the built frontend.
+
+`precompress()` writes .br and .gz siblings next to compressible files in
+client/dist (run compress_static.py after `vite build`; startup also fills
+in any that are missing). `FrontendStaticFiles` picks the best variant the
+client accepts, marks Vite's content-hashed assets immutable, and makes
+everything else (index.html) revalidate with its ETag. Paths without a file
+extension fall back to index.html for client-side routing.
+
+Brotli variants need the optional `brotli` package; without it only gzip
+is written.
+"""
+
+import os
+import re
+import gzip
+import logging
+import mimetypes
+from pathlib import Path
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Text-like assets worth compressing (images and fonts are already compressed)
+COMPRESSIBLE = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".ico", ".wasm", ".webmanifest"}
+# Smaller files aren't worth a variant
+MIN_COMPRESS_BYTES = 1024
+# Keep a variant only if it saves at least this share of the original
+MIN_SAVING = 0.1
+
+# Encoding -> file suffix, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Vite output names: assets/<name>-<hash>.<ext>
+_HASHED_ASSET = re.compile(r"(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory: Path, force: bool = False) -> dict:
+    """
+    Write .br/.gz variants for compressible files under `directory`.
+
+    Variants newer than their source are left alone unless `force`.
+
+    Returns:
+        Counts of files written, skipped as up to date, and bytes saved
+    """
+    stats = {"written": 0, "up_to_date": 0, "bytes_saved": 0}
+    encodings = [(e, s) for e, s in ENCODINGS if e != "br" or brotli is not None]
+    for path in directory.rglob("*"):
+        if path.suffix not in COMPRESSIBLE or not path.is_file():
+            continue
+        source = path.stat()
+        if source.st_size < MIN_COMPRESS_BYTES:
+            continue
+        data = None
+        for encoding, suffix in encodings:
+            variant = path.with_name(path.name + suffix)
+            if not force and variant.exists() and variant.stat().st_mtime >= source.st_mtime:
+                stats["up_to_date"] += 1
+                continue
+            data = data if data is not None else path.read_bytes()
+            compressed = _compress(data, encoding)
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                variant.unlink(missing_ok=True)
+                continue
+            tmp = variant.with_name(variant.name + ".tmp")
+            tmp.write_bytes(compressed)
+            os.replace(tmp, variant)
+            stats["written"] += 1
+            stats["bytes_saved"] += len(data) - len(compressed)
+    if stats["written"]:
+        logger.info(f"Static: Wrote {stats['written']} compressed variants, saving {stats['bytes_saved'] // 1024} KB")
+    return stats
+
+
+def accepted_encodings(header: str) -> set:
+    """Encodings from an Accept-Encoding header, minus any with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        accepted.add(name)
+    return accepted
+
+
+def cache_control(path: str) -> str:
+    return IMMUTABLE if _HASHED_ASSET.search(path.replace(os.sep, "/")) else REVALIDATE
+
+
+class FrontendStaticFiles(StaticFiles):
+    """StaticFiles with precompressed variants, cache headers and an index.html fallback."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except StarletteHTTPException as e:
+            # Client-side routes (/chat, /settings) have no extension; serve the app shell
+            if e.status_code != 404 or Path(path).suffix or path.split(os.sep, 1)[0] == "api":
+                raise
+            return await super().get_response("index.html", scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+        headers = {"Cache-Control": cache_control(str(full_path)), "Vary": "Accept-Encoding"}
+
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            variant = f"{full_path}{suffix}"
+            try:
+                variant_stat = os.stat(variant)
+            except OSError:
+                continue
+            if variant_stat.st_mtime < stat_result.st_mtime:
+                continue  # stale; serve the original until it is recompressed
+            full_path, stat_result = variant, variant_stat
+            headers["Content-Encoding"] = encoding
+            break
+
+        response = FileResponse(full_path, status_code=status_code, headers=headers,
+                                media_type=media_type, stat_result=stat_result)
+        # ETag/Last-Modified come from the file actually sent, so each encoding validates separately
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
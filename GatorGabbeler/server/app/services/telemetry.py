@@ -0,0 +1,168 @@
+"""
+Structured logging, request IDs and stage timing.
+
+Every HTTP request gets an ID (from X-Request-ID or generated) that is echoed
+in the response and attached to every log record made while handling it,
+including in RAG worker threads. `span("stage")` times a block, records it
+in the stage histogram and in the request's timings, which are logged with
+the access line and returned as a Server-Timing header.
+
+LOG_FORMAT=json writes one JSON object per line; the default is plain text.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from .metrics import HTTP_REQUESTS, HTTP_LATENCY, STAGE_LATENCY
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Probes and status pages: access-logged at DEBUG only
+QUIET_ROUTES = {"/api/ready", "/api/rag/status", "/api/provider/status", "/api/sessions/status", "/api/translate/cache", "/api/chat/cache"}
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+# Per-request list of (stage, seconds); None outside a request
+_timings: ContextVar[Optional[list]] = ContextVar("timings", default=None)
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        # Anything passed via extra={...}
+        entry.update({k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS}
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return line
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Set up the 'app' logger tree once (safe to call repeatedly)."""
+    logger = logging.getLogger("app")
+    if getattr(logger, "_configured", False):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler.addFilter(RequestIdFilter())
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    logger._configured = True
+
+
+def record_span(stage: str, seconds: float):
+    """Record an already measured stage duration."""
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as a request stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started)
+
+
+def stage_totals(timings: list) -> dict:
+    """Stage -> total seconds (a stage can run more than once per request)."""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return totals
+
+
+def server_timing(timings: list) -> str:
+    """Server-Timing header value."""
+    return ", ".join(f"{stage.replace('.', '_')};dur={seconds * 1000:.1f}" for stage, seconds in stage_totals(timings).items())
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware: request ID, access log, HTTP metrics and Server-Timing.
+
+    Plain ASGI (not BaseHTTPMiddleware) so streaming responses pass straight
+    through; their latency is measured to the end of the body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("app.access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        id_token = request_id_var.set(request_id)
+        timings = []
+        timings_token = _timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = [(b"x-request-id", request_id.encode("latin-1"))]
+                if timings:
+                    extra.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or ("unmatched" if scope["path"].startswith("/api") else "static")
+            HTTP_REQUESTS.inc(route=path, method=scope["method"], status=status)
+            HTTP_LATENCY.observe(elapsed, route=path)
+            if path.startswith("/api"):
+                self.logger.log(
+                    logging.DEBUG if path in QUIET_ROUTES else logging.INFO,
+                    f"{scope['method']} {scope['path']} {status}",
+                    extra={
+                        "status": status,
+                        "duration_ms": round(elapsed * 1000, 1),
+                        "stages_ms": {s: round(t * 1000, 1) for s, t in stage_totals(timings).items()},
+                    },
+                )
+            _timings.reset(timings_token)
+            request_id_var.reset(id_token)
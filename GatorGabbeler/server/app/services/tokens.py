@@ -0,0 +1,45 @@
+"""
+Token counting for prompt budgeting.
+
+Uses tiktoken when it is installed and its encoding file can be loaded, and
+falls back to a ~4 characters per token estimate otherwise (e.g. offline
+hosts where tiktoken can't download the encoding).
+"""
+
+import os
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+# Per-message overhead of the chat format (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """The tiktoken encoding, or None to estimate. Cached either way, so a failed load isn't retried."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    for name in dict.fromkeys((TOKEN_ENCODING, "cl100k_base")):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception as e:
+            # Unknown name, or the encoding file couldn't be downloaded/read
+            logger.warning(f"Tokens: Could not load tiktoken encoding '{name}': {e}")
+    logger.warning("Tokens: Falling back to a 4 characters per token estimate")
+    return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
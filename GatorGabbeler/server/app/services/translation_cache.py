@@ -0,0 +1,190 @@
+"""
+Exact-match cache for /api/translate.
+
+Many students translate the same Alberto greetings, so translations are cached
+by (normalized text, target language, model). An in-memory LRU sits in front
+of a local SQLite file that is trimmed by total size, least recently used
+first. Concurrent identical requests share one upstream call.
+"""
+
+import os
+import logging
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "5000"))
+# Max bytes of translation text kept in the SQLite file (default 50 MB)
+TRANSLATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Set to an empty value to keep the cache in memory only
+TRANSLATION_CACHE_PATH = os.getenv(
+    "TRANSLATION_CACHE_PATH",
+    str(Path(__file__).parent.parent.parent / "data" / "cache" / "translations.sqlite"),
+)
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize and collapse whitespace. Case is kept; it can change a translation."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TranslationCache:
+    """LRU memory cache + size-bounded SQLite store + in-flight request dedup."""
+
+    def __init__(self, path: Optional[str] = TRANSLATION_CACHE_PATH,
+                 max_bytes: int = TRANSLATION_CACHE_MAX_BYTES):
+        self.memory = TTLCache(maxsize=TRANSLATION_CACHE_SIZE)
+        self.max_bytes = max_bytes
+        self.disk_hits = 0
+        self.upstream_calls = 0
+        self.deduped = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._total_bytes = 0
+        if path:
+            self._open_disk(Path(path))
+
+    def _open_disk(self, path: Path):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, translation TEXT, size INTEGER, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations(last_used)")
+            self._db.commit()
+            row = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()
+            self._total_bytes = row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache: disk store disabled ({e})")
+            self._db = None
+
+    @staticmethod
+    def make_key(text: str, target_language: str, model: str) -> str:
+        raw = f"{model}\n{target_language.strip().casefold()}\n{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- SQLite helpers (run in a worker thread) ---
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+                self._db.commit()
+        return row[0] if row else None
+
+    def _disk_set(self, key: str, translation: str):
+        if self._db is None:
+            return
+        size = len(translation.encode("utf-8"))
+        with self._db_lock:
+            old = self._db.execute("SELECT size FROM translations WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, translation, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict_locked()
+            self._db.commit()
+
+    def _evict_locked(self):
+        """Drop least recently used rows until the store fits in max_bytes."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM translations ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM translations WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    # --- Public API ---
+
+    async def get_or_create(self, key: str, factory: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the cached translation for `key`, or call `factory` once.
+
+        Identical requests that arrive while the upstream call is running wait
+        on the same future instead of making their own call.
+        """
+        cached = self.memory.get(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.deduped += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(self._fetch(key, factory))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """Return a cached translation (memory, then disk) without calling upstream."""
+        cached = self.memory.get(key)
+        if cached is not None:
+            return cached
+        translation = await asyncio.to_thread(self._disk_get, key)
+        if translation is not None:
+            self.disk_hits += 1
+            self.memory.set(key, translation)
+        return translation
+
+    async def _fetch(self, key: str, factory: Callable[[], Awaitable[str]]) -> str:
+        translation = await asyncio.to_thread(self._disk_get, key)
+        if translation is not None:
+            self.disk_hits += 1
+        else:
+            self.upstream_calls += 1
+            translation = await factory()
+            await asyncio.to_thread(self._disk_set, key, translation)
+        self.memory.set(key, translation)
+        return translation
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk_enabled": self._db is not None,
+            "disk_bytes": self._total_bytes,
+            "disk_max_bytes": self.max_bytes,
+            "disk_hits": self.disk_hits,
+            "upstream_calls": self.upstream_calls,
+            "deduplicated": self.deduped,
+            "in_flight": len(self._inflight),
+        }
+
+
+_translation_cache = None
+
+def get_translation_cache() -> TranslationCache:
+    """Get or create the translation cache singleton."""
+    global _translation_cache
+    if _translation_cache is None:
+        _translation_cache = TranslationCache()
+    return _translation_cache
@@ -0,0 +1,12 @@
+"""
+Benchmarks for the GatorGabber server. Run from the server directory, e.g.
+
+    python -m benchmarks.index_backends --synthetic 5000
+    python -m benchmarks.e2e --profile realistic --concurrency 16
+
+benchmarks.e2e starts the app against benchmarks.mock_openai (chat and
+embeddings with configurable latency and failures) on a corpus generated by
+benchmarks.corpus, and can fail CI on threshold or baseline regressions:
+
+    python -m benchmarks.e2e --thresholds benchmarks/e2e_thresholds.json
+"""
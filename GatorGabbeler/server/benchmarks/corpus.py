@@ -0,0 +1,116 @@
+"""
+Generate a small SPN1130-style PDF corpus for benchmarks.
+
+The PDFs are written directly (one Helvetica font, WinAnsi text), so no PDF
+library is needed to create them; pypdf reads them back during ingestion.
+
+    python -m benchmarks.corpus /tmp/spn1130-bench --documents 6 --pages 4
+"""
+
+import argparse
+import random
+import textwrap
+from pathlib import Path
+
+TOPICS = {
+    "saludos": ["hola", "buenos días", "¿cómo estás?", "mucho gusto", "hasta luego", "me llamo"],
+    "familia": ["la madre", "el padre", "los hermanos", "la abuela", "el primo", "la tía"],
+    "comida": ["la paella", "las frutas", "el desayuno", "la cena", "el pan", "las verduras"],
+    "verbos": ["hablar", "comer", "vivir", "ser", "estar", "tener", "ir", "gustar"],
+    "tiempo": ["hace frío", "hace calor", "llueve", "nieva", "está nublado", "la primavera"],
+    "escuela": ["la clase", "el profesor", "la tarea", "el examen", "la biblioteca", "el cuaderno"],
+}
+
+TEMPLATES = [
+    "En esta lección practicamos {a} y {b}. Los estudiantes repiten las frases en voz alta.",
+    "Vocabulario: {a}, {b} y {c}. Escribe una oración con cada palabra.",
+    "Gramática: el verbo {v}ar en presente. Yo {v}o, tú {v}as, él {v}a (conjugación regular).",
+    "Diálogo: —¿Te gusta {a}? —Sí, me gusta mucho, pero prefiero {b}.",
+    "Nota cultural: en muchos países hispanohablantes {a} es parte de la vida diaria.",
+    "Ejercicio: completa el espacio con {a} o {b} según el contexto de la frase.",
+]
+
+# Regular -ar verbs for the conjugation template
+AR_VERBS = ["habl", "estudi", "practic", "cocin", "escuch", "trabaj"]
+
+LINES_PER_PAGE = 48
+LINE_WIDTH = 88
+
+
+def _pdf_text(line: str) -> bytes:
+    escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("cp1252", errors="replace")
+
+
+def write_pdf(path: Path, pages: list[list[str]]):
+    """Write a minimal text-only PDF with one list of lines per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        stream = b"BT /F1 10 Tf 13 TL 50 790 Td " + b" ".join(b"(" + _pdf_text(l) + b") Tj T*" for l in lines) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def lesson_text(rng: random.Random, topic: str, paragraphs: int) -> list[str]:
+    words = TOPICS[topic]
+    lines = [f"SPN 1130 - Unidad: {topic}", ""]
+    for _ in range(paragraphs):
+        sentences = []
+        for template in rng.sample(TEMPLATES, 4):
+            a, b, c = rng.sample(words, 3)
+            sentences.append(template.format(a=a, b=b, c=c, v=rng.choice(AR_VERBS)))
+        lines += textwrap.wrap(" ".join(sentences), LINE_WIDTH) + [""]
+    return lines
+
+
+def generate_corpus(directory: Path, documents: int = 6, pages: int = 4, seed: int = 1130) -> list[Path]:
+    """Write `documents` PDFs of `pages` pages each into `directory`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    paths = []
+    for i in range(documents):
+        topic = topics[i % len(topics)]
+        lines = lesson_text(rng, topic, paragraphs=pages * 6)
+        page_lines = [lines[j:j + LINES_PER_PAGE] for j in range(0, len(lines), LINES_PER_PAGE)][:pages]
+        path = directory / f"spn1130_{i + 1:02d}_{topic}.pdf"
+        write_pdf(path, page_lines)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a benchmark PDF corpus.")
+    parser.add_argument("directory")
+    parser.add_argument("--documents", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=4)
+    args = parser.parse_args()
+    for path in generate_corpus(Path(args.directory), args.documents, args.pages):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+End-to-end load benchmark against a mock OpenAI server.
+
+Generates a small SPN1130 PDF corpus, starts the mock OpenAI server and the
+FastAPI app (pointed at the mock for chat and embeddings), waits for the
+index to be built, then drives each scenario at the given concurrency:
+
+    chat         POST /api/chat, no class context (LLM only)
+    chat_rag     POST /api/chat with spanish_1130 (retrieval + LLM)
+    chat_stream  POST /api/chat/stream with spanish_1130 (first token / sentence)
+    translate    POST /api/translate, a pool of phrases with repeats
+
+For each scenario it reports throughput, error rate and p50/p95/p99 latency,
+plus per-stage percentiles: client-side stages (ttfb, first_token,
+first_sentence), any Server-Timing metrics the app sends, and upstream
+latencies measured by the mock.
+
+    python -m benchmarks.e2e --profile realistic --concurrency 16 --requests 200
+    python -m benchmarks.e2e --thresholds benchmarks/e2e_thresholds.json --output results.json
+    python -m benchmarks.e2e --baseline previous.json --max-regression 0.2
+
+Exits with status 1 when a threshold or baseline check fails, for CI.
+Use --app-url to benchmark an already running server instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import httpx
+
+from .corpus import generate_corpus
+from .index_backends import percentile
+from .mock_openai import add_profile_arguments, profile_from_args, profile_to_argv
+
+SERVER_DIR = Path(__file__).parent.parent
+QUERIES_PATH = Path(__file__).parent / "spn1130_queries.json"
+
+SCENARIOS = ("chat", "chat_rag", "chat_stream", "translate")
+
+GENERAL_MESSAGES = [
+    "Hola, ¿cómo estás?",
+    "¿Qué tiempo hace hoy en Gainesville?",
+    "Me gusta jugar al fútbol con mis amigos.",
+    "¿Puedes ayudarme a practicar para el examen?",
+    "Ayer comí paella con mi familia.",
+    "No entiendo la diferencia entre ser y estar.",
+]
+
+TRANSLATE_PHRASES = [
+    "Good morning, how are you?",
+    "I like to eat fruit for breakfast.",
+    "Where is the library?",
+    "My brother studies at the university.",
+    "It is very cold today.",
+    "See you later!",
+    "What is your name?",
+    "We have an exam on Friday.",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 1),
+        "p95_ms": round(percentile(values, 95), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+    }
+
+
+def parse_server_timing(header: str | None) -> dict[str, float]:
+    """'retrieval;dur=12.5, llm;dur=800' -> {'retrieval': 12.5, 'llm': 800.0}"""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            if name and param.startswith("dur="):
+                try:
+                    timings[name] = float(param[4:])
+                except ValueError:
+                    pass
+    return timings
+
+
+class ScenarioResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.stages: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.elapsed = 0.0
+
+    def stage(self, name: str, ms: float):
+        self.stages.setdefault(name, []).append(ms)
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, upstream: dict) -> dict:
+        total = len(self.latencies) + sum(self.errors.values())
+        return {
+            "requests": total,
+            "throughput_rps": round(len(self.latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "errors": self.errors,
+            "latency": summarize(self.latencies),
+            "stages": {name: summarize(values) for name, values in sorted(self.stages.items())},
+            "upstream": upstream.get("endpoints", {}),
+            "upstream_injected": upstream.get("injected", {}),
+        }
+
+
+async def run_request(client: httpx.AsyncClient, scenario: str, rng: random.Random, queries: list[str],
+                      result: ScenarioResult):
+    started = time.perf_counter()
+    elapsed = lambda: (time.perf_counter() - started) * 1000
+
+    if scenario == "translate":
+        request = ("/api/translate", {"text": rng.choice(TRANSLATE_PHRASES), "target_language": "Spanish"})
+    elif scenario == "chat":
+        request = ("/api/chat", {"text": rng.choice(GENERAL_MESSAGES)})
+    else:
+        path = "/api/chat/stream" if scenario == "chat_stream" else "/api/chat"
+        request = (path, {"text": rng.choice(queries), "classContext": "spanish_1130"})
+
+    try:
+        if scenario != "chat_stream":
+            response = await client.post(request[0], json=request[1])
+            if response.status_code >= 400:
+                result.error(str(response.status_code))
+                return
+            for name, ms in parse_server_timing(response.headers.get("server-timing")).items():
+                result.stage(f"server.{name}", ms)
+        else:
+            async with client.stream("POST", request[0], json=request[1]) as response:
+                result.stage("ttfb", elapsed())
+                if response.status_code >= 400:
+                    result.error(str(response.status_code))
+                    return
+                event = None
+                seen = set()
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:") and event not in seen:
+                        seen.add(event)
+                        if event == "token":
+                            result.stage("first_token", elapsed())
+                        elif event == "sentence":
+                            result.stage("first_sentence", elapsed())
+                        elif event == "error":
+                            result.error("stream_error")
+                            return
+    except httpx.HTTPError as e:
+        result.error(type(e).__name__)
+        return
+    result.latencies.append(elapsed())
+
+
+async def run_scenario(app_url: str, mock_url: str | None, scenario: str, requests: int,
+                       concurrency: int, queries: list[str], seed: int) -> dict:
+    result = ScenarioResult(scenario)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=120, limits=limits) as client:
+        if mock_url:
+            await client.post(f"{mock_url}/stats/reset")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+        rng = random.Random(seed)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                await run_request(client, scenario, rng, queries, result)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+
+        upstream = (await client.get(f"{mock_url}/stats")).json() if mock_url else {}
+    return result.report(upstream)
+
+
+def check(results: dict, thresholds: dict, baseline: dict | None, max_regression: float) -> list[str]:
+    """
+    Threshold and regression failures.
+
+    thresholds: {"<scenario>" or "*": {"p95_ms": .., "p99_ms": .., "error_rate": .., "min_rps": ..}}
+    baseline: an earlier --output file; p95 may grow by at most max_regression.
+    """
+    failures = []
+    for scenario, report in results.items():
+        limits = {**thresholds.get("*", {}), **thresholds.get(scenario, {})}
+        latency = report["latency"]
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if key in limits and latency.get(key, 0) > limits[key]:
+                failures.append(f"{scenario}: {key} {latency[key]} > {limits[key]}")
+        if "error_rate" in limits and report["error_rate"] > limits["error_rate"]:
+            failures.append(f"{scenario}: error_rate {report['error_rate']} > {limits['error_rate']}")
+        if "min_rps" in limits and report["throughput_rps"] < limits["min_rps"]:
+            failures.append(f"{scenario}: throughput {report['throughput_rps']} rps < {limits['min_rps']}")
+
+        previous = (baseline or {}).get("scenarios", {}).get(scenario)
+        if previous and previous["latency"].get("p95_ms") and latency.get("p95_ms"):
+            allowed = previous["latency"]["p95_ms"] * (1 + max_regression)
+            if latency["p95_ms"] > allowed:
+                failures.append(
+                    f"{scenario}: p95 {latency['p95_ms']} ms regressed past {allowed:.1f} ms "
+                    f"(baseline {previous['latency']['p95_ms']} ms + {max_regression:.0%})"
+                )
+    return failures
+
+
+def wait_ready(app_url: str, processes: list[subprocess.Popen], timeout: float):
+    """Poll /api/ready until the index is built (200) or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for process in processes:
+            if process.poll() is not None:
+                raise SystemExit(f"Process exited early: {' '.join(process.args)}")
+        try:
+            response = httpx.get(f"{app_url}/api/ready", timeout=2)
+            if response.status_code == 200:
+                return response.json()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"App not ready after {timeout:.0f}s")
+
+
+def start_stack(args, workdir: Path) -> tuple[str, str, list[subprocess.Popen]]:
+    """Start the mock and the app on free ports; returns (app_url, mock_url, processes)."""
+    corpus_dir = workdir / "spanish_1130"
+    generate_corpus(corpus_dir, args.documents, args.pages)
+
+    mock_port, app_port = free_port(), free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(mock_port),
+         *profile_to_argv(profile_from_args(args))],
+        cwd=SERVER_DIR,
+    )
+
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "benchmark",
+        "openai_base_url": f"{mock_url}/v1",
+        "openai_model": "mock-chat",
+        "OPENAI_EMBEDDING_BASE_URL": f"{mock_url}/v1",
+        "LLM_PROVIDERS": "openai",
+        "HTTP_HTTP2": "false",
+        "RAG_CLASS_DIRS": f"spanish_1130={corpus_dir}",
+        "RAG_WARMUP": "true",
+        "RAG_WARMUP_CLASSES": "spanish_1130",
+        "EMBEDDING_CACHE_PATH": str(workdir / "embeddings.sqlite"),
+        "TRANSLATION_CACHE_PATH": str(workdir / "translations.sqlite"),
+        "SESSION_STORE_DIR": "",
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+         "--workers", str(args.app_workers), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env,
+    )
+    return app_url, mock_url, [mock, app]
+
+
+def print_table(results: dict):
+    print(f"\n{'scenario':<12} {'reqs':>5} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for scenario, report in results.items():
+        latency = report["latency"]
+        print(f"{scenario:<12} {report['requests']:>5} {report['throughput_rps']:>8} "
+              f"{report['error_rate'] * 100:>6.1f} {latency.get('p50_ms', '-'):>8} "
+              f"{latency.get('p95_ms', '-'):>8} {latency.get('p99_ms', '-'):>8}")
+        for stage, stats in {**report["stages"], **{f"upstream.{k}": v for k, v in report["upstream"].items()}}.items():
+            print(f"  {stage:<30} p50 {stats.get('p50_ms', '-'):>8}  p95 {stats.get('p95_ms', '-'):>8}  "
+                  f"p99 {stats.get('p99_ms', '-'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark with a mock OpenAI server.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=6, help="PDFs in the generated corpus")
+    parser.add_argument("--pages", type=int, default=4, help="Pages per PDF")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn workers for the app")
+    parser.add_argument("--app-url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--mock-url", help="Mock server of a running setup (for upstream stats)")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--thresholds", help="JSON file of per-scenario limits")
+    parser.add_argument("--baseline", help="Earlier --output file to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    queries = [q["query"] for q in json.loads(QUERIES_PATH.read_text(encoding="utf-8"))]
+
+    workdir = tempfile.TemporaryDirectory(prefix="gg-e2e-")
+    processes = []
+    try:
+        if args.app_url:
+            app_url, mock_url = args.app_url.rstrip("/"), args.mock_url
+        else:
+            app_url, mock_url, processes = start_stack(args, Path(workdir.name))
+        started = time.monotonic()
+        readiness = wait_ready(app_url, processes, args.startup_timeout)
+        print(f"App ready in {time.monotonic() - started:.1f}s: {readiness}")
+
+        results = {}
+        for scenario in scenarios:
+            print(f"Running {scenario}: {args.requests} requests at concurrency {args.concurrency}")
+            results[scenario] = asyncio.run(run_scenario(
+                app_url, mock_url, scenario, args.requests, args.concurrency, queries, args.seed
+            ))
+        server = {path: httpx.get(f"{app_url}{path}", timeout=10).json()
+                  for path in ("/api/provider/status", "/api/translate/cache", "/api/rag/status")}
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        workdir.cleanup()
+
+    print_table(results)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "thresholds", "baseline")},
+        "scenarios": results,
+        "server": server,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nWrote {args.output}")
+
+    thresholds = json.loads(Path(args.thresholds).read_text()) if args.thresholds else {}
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    failures = check(results, thresholds, baseline, args.max_regression)
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    if thresholds or baseline:
+        print("\nAll checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compare query latency and per-worker memory for the Chroma and mmap backends.
+
+Starts N worker processes per backend (like N uvicorn workers), each opening
+the index and running the same set of query vectors. No embedding API calls
+are made: queries are perturbed copies of indexed vectors.
+
+    python -m benchmarks.index_backends --class spanish_1130 --workers 4
+    python -m benchmarks.index_backends --synthetic 5000 --dim 1536
+
+RSS is split into anonymous (private) and file-backed memory where /proc is
+available; mmap pages show up as file-backed and are shared between workers.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from pathlib import Path
+import numpy as np
+
+from app.rag.mmap_index import MmapVectorIndex, load_mmap_index, write_mmap_index
+
+
+def read_memory() -> dict:
+    """Current process memory in MB (Linux /proc, falling back to peak RSS)."""
+    status = Path("/proc/self/status")
+    if status.exists():
+        fields = {}
+        for line in status.read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+        return {"rss": fields.get("VmRSS"), "anon": fields.get("RssAnon"), "file": fields.get("RssFile")}
+
+    import resource
+    return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "anon": None, "file": None}
+
+
+def open_backend(backend: str, chroma_path: str, mmap_path: str):
+    if backend == "mmap":
+        index = MmapVectorIndex(Path(mmap_path), embedding_function=None)
+        return lambda vector, k: index.search_by_vector(vector, k)
+
+    from langchain_community.vectorstores import Chroma
+    store = Chroma(persist_directory=chroma_path, embedding_function=None)
+    return lambda vector, k: store.similarity_search_by_vector(vector, k=k)
+
+
+def run_worker(args) -> dict:
+    backend, chroma_path, mmap_path, queries_path, k = args
+    queries = np.load(queries_path)
+
+    started = time.perf_counter()
+    search = open_backend(backend, chroma_path, mmap_path)
+    load_seconds = time.perf_counter() - started
+
+    # One warm-up query so first-touch costs don't skew the percentiles
+    search(queries[0].tolist(), k)
+
+    latencies = []
+    for vector in queries:
+        t0 = time.perf_counter()
+        search(vector.tolist(), k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {"load_seconds": load_seconds, "latencies_ms": latencies, "memory": read_memory()}
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def build_synthetic(root: Path, count: int, dim: int) -> tuple[Path, Path]:
+    """Write a random corpus into both a Chroma store and a mmap index."""
+    from langchain_community.vectorstores import Chroma
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"Fragmento sintético {i}: " + "palabra " * 120 for i in range(count)]
+
+    chroma_path = root / "chroma_db"
+    store = Chroma(persist_directory=str(chroma_path), embedding_function=None)
+    for i in range(0, count, 1000):
+        store._collection.add(
+            ids=[str(j) for j in range(i, min(i + 1000, count))],
+            embeddings=vectors[i:i + 1000].tolist(),
+            documents=texts[i:i + 1000],
+        )
+
+    mmap_path = root / "mmap_index"
+    write_mmap_index(mmap_path, texts, vectors, "synthetic")
+    return chroma_path, mmap_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG index backends.")
+    parser.add_argument("--class", dest="class_level", default="spanish_1130")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Benchmark a random corpus of this many chunks instead of a real index")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding size for --synthetic")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes per backend")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per worker")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--backends", default="chroma,mmap")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix="gg-bench-")
+    if args.synthetic:
+        print(f"Building synthetic corpus: {args.synthetic} chunks x {args.dim} dims")
+        chroma_path, mmap_path = build_synthetic(Path(tmp.name), args.synthetic, args.dim)
+    else:
+        data_dir = Path(__file__).parent.parent / "data" / args.class_level
+        chroma_path, mmap_path = data_dir / "chroma_db", data_dir / "mmap_index"
+        if not MmapVectorIndex.exists(mmap_path):
+            raise SystemExit(f"No mmap index at {mmap_path}; run: python build_rag_index.py --mmap")
+
+    index = load_mmap_index(mmap_path, embedding_function=None)
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, len(index), size=args.queries)
+    queries = np.asarray(index.vectors[rows]) + rng.normal(0, 0.05, size=(args.queries, index.meta["dim"])).astype(np.float32)
+    queries_path = Path(tmp.name) / "queries.npy"
+    np.save(queries_path, queries.astype(np.float32))
+    print(f"Corpus: {len(index)} chunks, {index.meta['dim']} dims; {args.workers} workers x {args.queries} queries")
+    del index
+
+    for backend in args.backends.split(","):
+        job = (backend, str(chroma_path), str(mmap_path), str(queries_path), args.k)
+        with Pool(args.workers) as pool:
+            results = pool.map(run_worker, [job] * args.workers)
+
+        latencies = [ms for r in results for ms in r["latencies_ms"]]
+        rss = [r["memory"]["rss"] for r in results]
+        anon = [r["memory"]["anon"] for r in results if r["memory"]["anon"] is not None]
+        file_backed = [r["memory"]["file"] for r in results if r["memory"]["file"] is not None]
+
+        print(f"\n[{backend}]")
+        print(f"  load   mean {statistics.mean(r['load_seconds'] for r in results) * 1000:.1f} ms")
+        print(f"  query  p50 {percentile(latencies, 50):.2f} ms  p95 {percentile(latencies, 95):.2f} ms  "
+              f"p99 {percentile(latencies, 99):.2f} ms")
+        print(f"  RSS/worker  mean {statistics.mean(rss):.1f} MB", end="")
+        if anon:
+            print(f"  (private {statistics.mean(anon):.1f} MB, file-backed/shared {statistics.mean(file_backed):.1f} MB)")
+        else:
+            print()
+
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Local mock of the OpenAI-compatible chat and embeddings endpoints.
+
+Replies are deterministic; latency, jitter and injected failures (500s and
+429s with Retry-After) come from a named profile plus optional overrides.
+GET /stats reports served latencies per endpoint, POST /stats/reset clears them.
+
+    python -m benchmarks.mock_openai --port 8900 --profile realistic
+    python -m benchmarks.mock_openai --profile flaky --error-rate 0.1
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, asdict, replace
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class Profile:
+    ttft_ms: float = 20.0          # time to first token (non-streamed: plus all tokens)
+    token_ms: float = 2.0          # per streamed token
+    reply_tokens: int = 40         # words in a chat reply
+    embed_ms: float = 15.0         # per embeddings request
+    embed_item_ms: float = 0.2     # extra per embedded input
+    jitter: float = 0.2            # relative standard deviation of every delay
+    error_rate: float = 0.0        # fraction of requests answered with a 500
+    rate_limit_rate: float = 0.0   # fraction answered with a 429
+    retry_after: float = 0.2       # Retry-After seconds sent with 429s
+    dim: int = 256                 # embedding size
+
+
+PROFILES = {
+    "fast": Profile(),
+    "realistic": Profile(ttft_ms=450, token_ms=25, reply_tokens=60, embed_ms=120, embed_item_ms=1.0, jitter=0.35),
+    "flaky": Profile(ttft_ms=450, token_ms=25, reply_tokens=60, embed_ms=120, embed_item_ms=1.0, jitter=0.35,
+                     error_rate=0.05, rate_limit_rate=0.05, retry_after=0.5),
+}
+
+_WORDS = (
+    "¡Hola! Muy bien, vamos a practicar. Hoy hablamos de la familia, la comida y los verbos "
+    "regulares en presente. ¿Qué te gusta comer los fines de semana? Recuerda que el verbo "
+    "gustar funciona de otra manera. Por ejemplo: me gusta la paella y me gustan las frutas."
+).split()
+
+
+def delay(ms: float, jitter: float) -> float:
+    return max(0.0, random.gauss(ms, ms * jitter)) / 1000
+
+
+def reply_text(profile: Profile, seed: str) -> str:
+    start = int(hashlib.sha256(seed.encode("utf-8")).hexdigest(), 16) % len(_WORDS)
+    return " ".join(_WORDS[(start + i) % len(_WORDS)] for i in range(profile.reply_tokens))
+
+
+def embed(item, dim: int) -> np.ndarray:
+    """Deterministic unit vector for a string or token list."""
+    digest = hashlib.sha256(json.dumps(item, ensure_ascii=False).encode("utf-8")).digest()
+    vector = np.random.default_rng(int.from_bytes(digest[:8], "little")).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class Recorder:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latencies = {}
+        self.injected = {"500": 0, "429": 0}
+
+    def add(self, kind: str, started: float):
+        self.latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        report = {}
+        for kind, values in self.latencies.items():
+            ordered = sorted(values)
+            pick = lambda p: round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 1)
+            report[kind] = {"count": len(ordered), "p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99)}
+        return {"endpoints": report, "injected": self.injected}
+
+
+def create_app(profile: Profile) -> FastAPI:
+    app = FastAPI(title="mock-openai")
+    recorder = Recorder()
+
+    def injected_failure():
+        roll = random.random()
+        if roll < profile.rate_limit_rate:
+            recorder.injected["429"] += 1
+            return JSONResponse({"error": {"message": "Rate limit reached (mock)"}}, status_code=429,
+                                headers={"Retry-After": str(profile.retry_after)})
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            recorder.injected["500"] += 1
+            return JSONResponse({"error": {"message": "Internal error (mock)"}}, status_code=500)
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        failure = injected_failure()
+        if failure:
+            return failure
+
+        messages = body.get("messages", [])
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if messages else ""
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            try:
+                segments = json.loads(user).get("segments", [])
+            except (json.JSONDecodeError, AttributeError):
+                segments = []
+            text = json.dumps({"translations": [{"id": s["id"], "text": f"[mock] {s['text']}"} for s in segments]},
+                              ensure_ascii=False)
+        elif "translat" in system.lower():
+            text = f"[mock] {user}"
+        else:
+            text = reply_text(profile, user)
+        words = text.split(" ")
+        usage = {"prompt_tokens": sum(len(m.get("content", "")) // 4 for m in messages), "completion_tokens": len(words)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay(profile.ttft_ms, profile.jitter) + delay(profile.token_ms, profile.jitter) * len(words))
+            recorder.add("chat", started)
+            return {
+                "id": "mock", "object": "chat.completion", "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def events():
+            await asyncio.sleep(delay(profile.ttft_ms, profile.jitter))
+            recorder.add("chat_stream_first_token", started)
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(delay(profile.token_ms, profile.jitter))
+                chunk = {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+            recorder.add("chat_stream", started)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        failure = injected_failure()
+        if failure:
+            return failure
+
+        inputs = body.get("input", [])
+        # A single string, a single token list, or a list of either
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await asyncio.sleep(delay(profile.embed_ms + profile.embed_item_ms * len(inputs), profile.jitter))
+
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, item in enumerate(inputs):
+            vector = embed(item, profile.dim)
+            value = base64.b64encode(vector.tobytes()).decode("ascii") if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": value})
+        recorder.add("embeddings", started)
+        tokens = sum(len(item) if isinstance(item, list) else len(item) // 4 for item in inputs)
+        return {"object": "list", "data": data, "model": body.get("model"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.get("/stats")
+    async def stats():
+        return {"profile": asdict(profile), **recorder.stats()}
+
+    @app.post("/stats/reset")
+    async def reset():
+        recorder.reset()
+        return {"ok": True}
+
+    return app
+
+
+def profile_from_args(args) -> Profile:
+    overrides = {
+        field: getattr(args, field) for field in Profile.__dataclass_fields__
+        if getattr(args, field, None) is not None
+    }
+    return replace(PROFILES[args.profile], **overrides)
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Profile selection plus per-field overrides (shared with the e2e driver)."""
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=os.getenv("MOCK_PROFILE", "fast"))
+    for field, default in asdict(Profile()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, type=type(default), default=None)
+
+
+def profile_to_argv(profile: Profile) -> list[str]:
+    argv = []
+    for field, value in asdict(profile).items():
+        argv += [f"--{field.replace('_', '-')}", str(value)]
+    return argv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(profile_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
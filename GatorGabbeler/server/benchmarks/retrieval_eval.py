@@ -0,0 +1,76 @@
+"""
+Compare retrieval modes on a small labeled query set.
+
+Each labeled query lists keywords that a relevant chunk contains; an empty
+list means the query should need no course material (greetings). For each
+mode the script reports hit@k and MRR over the labeled queries, how many
+embedding API calls were made, and mean retrieval latency.
+
+    python -m benchmarks.retrieval_eval --queries benchmarks/spn1130_queries.json
+
+Requires a built index and OPENAI_API_KEY (the vector path embeds queries).
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from app.rag import vector_store as vs
+from app.rag.lexical import tokenize
+from app.rag.registry import get_class_store
+
+
+def _matches(chunk: str, keywords) -> bool:
+    text = " ".join(tokenize(chunk))
+    return any(" ".join(tokenize(k)) in text for k in keywords)
+
+
+def evaluate(store, labeled, k: int) -> dict:
+    hits, reciprocal_ranks, latencies = 0, [], []
+    graded = [q for q in labeled if q["relevant"]]
+    calls_before = store.embeddings.api_calls
+
+    for item in labeled:
+        started = time.perf_counter()
+        results = store.similarity_search(item["query"], k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if not item["relevant"]:
+            continue
+        rank = next((i + 1 for i, chunk in enumerate(results) if _matches(chunk, item["relevant"])), None)
+        if rank:
+            hits += 1
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    return {
+        f"hit@{k}": round(hits / len(graded), 3) if graded else None,
+        "mrr": round(sum(reciprocal_ranks) / len(graded), 3) if graded else None,
+        "embedding_calls": store.embeddings.api_calls - calls_before,
+        "mean_latency_ms": round(sum(latencies) / len(latencies), 1),
+        "counts": dict(store.retrieval_counts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate vector vs hybrid retrieval.")
+    parser.add_argument("--class", dest="class_level", default="spanish_1130")
+    parser.add_argument("--queries", default=str(Path(__file__).parent / "spn1130_queries.json"))
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    labeled = json.loads(Path(args.queries).read_text(encoding="utf-8"))
+    store = get_class_store(args.class_level)
+    if store is None or store.status != "ready":
+        raise SystemExit(f"No ready index for {args.class_level}; run: python build_rag_index.py")
+
+    for mode in ("vector", "hybrid"):
+        # Start each mode cold so cached embeddings/results don't favor the second run
+        vs.RAG_RETRIEVAL_MODE = mode
+        store.result_cache.clear()
+        store.embeddings.memory.clear()
+        store.retrieval_counts = dict.fromkeys(store.retrieval_counts, 0)
+        print(f"[{mode}] {json.dumps(evaluate(store, labeled, args.k), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
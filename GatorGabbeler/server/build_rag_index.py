@@ -0,0 +1,77 @@
+"""
+Build or update the RAG index for a class from the PDFs in data/<class>.
+
+Only added or changed PDFs are re-embedded; chunks from deleted PDFs are
+removed. Run from the server directory:
+
+    python build_rag_index.py                  # incremental update of spanish_1130
+    python build_rag_index.py --full           # re-embed everything
+    python build_rag_index.py --class spanish_1131 --workers 8
+    python build_rag_index.py --mmap           # also export the memory-mapped index
+    python build_rag_index.py --rebuild        # build a new version and swap it in
+"""
+
+import argparse
+from dotenv import load_dotenv
+load_dotenv()  # before app imports, which read their settings at import time
+from app.rag.ingest import ingest_pdfs, INGEST_WORKERS, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from app.rag.vector_store import VectorStoreManager, EMBEDDING_MODEL
+from app.rag.registry import get_registry
+from app.services.telemetry import configure_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the RAG index from course PDFs.")
+    parser.add_argument("--class", dest="class_level", default="spanish_1130",
+                        help="Class folder under data/ (default: spanish_1130)")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-embed every PDF, ignoring the manifest")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help=f"Processes used to parse PDFs (default: {INGEST_WORKERS})")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help=f"Chunks per embedding request (default: {EMBED_BATCH_SIZE})")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Also export the memory-mapped index (automatic when RAG_INDEX_BACKEND=mmap)")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY,
+                        help=f"Embedding requests in flight at once (default: {EMBED_CONCURRENCY})")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Build into a new index version and swap it in (running servers follow it)")
+    args = parser.parse_args()
+    configure_logging()
+
+    # Use the registry's directory for the class (honors RAG_CLASS_DIRS)
+    manager = get_registry().get(args.class_level, load=False) or VectorStoreManager(args.class_level)
+    if args.rebuild:
+        manager.rebuild_index(full=args.full)
+        print(manager.rebuild.summary or "")
+        if manager.rebuild.state != "done":
+            print(f"Rebuild failed: {manager.rebuild.error}")
+            raise SystemExit(1)
+        print(f"Now serving index {manager.rebuild.version}")
+        return
+
+    print(f"Indexing {manager.data_dir} -> {manager.index_path}")
+
+    stats = ingest_pdfs(
+        manager.data_dir,
+        manager.index_path,
+        manager.embeddings.embeddings,
+        EMBEDDING_MODEL,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        full=args.full,
+    )
+
+    print(stats.summary())
+    if args.mmap or manager.backend == "mmap":
+        manager.export_mmap()
+    if stats.errors:
+        print("Errors:")
+        for error in stats.errors:
+            print(f"  {error}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Write brotli and gzip variants of the built frontend for precompressed serving.
+
+Run after `npm run build` in the client; the server also compresses any
+missing files at startup, but doing it at build time keeps the first
+requests after a deploy compressed. Run from the server directory:
+
+    python compress_static.py                    # ../client/dist
+    python compress_static.py path/to/dist --force
+"""
+
+import argparse
+from pathlib import Path
+from app.services.static_files import precompress, brotli
+
+DEFAULT_DIST = Path(__file__).parent.parent / "client" / "dist"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompress the built frontend (.br and .gz).")
+    parser.add_argument("directory", nargs="?", default=str(DEFAULT_DIST),
+                        help=f"Built frontend directory (default: {DEFAULT_DIST})")
+    parser.add_argument("--force", action="store_true", help="Recompress files whose variants are up to date")
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        raise SystemExit(f"No such directory: {directory}")
+    if brotli is None:
+        print("brotli is not installed; writing gzip variants only (pip install brotli)")
+    stats = precompress(directory, force=args.force)
+    print(f"{stats['written']} variants written, {stats['up_to_date']} up to date, "
+          f"{stats['bytes_saved'] / 1024:.0f} KB saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Shared test setup: run the app offline against the stub LLM provider.
+
+Run from the server directory:
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Settings are read at import time, so set them before anything imports `app`
+os.environ.setdefault("LLM_PROVIDERS", "stub")
+os.environ.setdefault("LLM_STUB_LATENCY", "0")
+os.environ.setdefault("LLM_STUB_TOKEN_DELAY", "0")
+os.environ.setdefault("RAG_WARMUP", "false")
+os.environ.setdefault("TRANSLATION_CACHE_PATH", "")
+os.environ.setdefault("STATIC_PRECOMPRESS", "false")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
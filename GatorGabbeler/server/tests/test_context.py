@@ -0,0 +1,29 @@
+from app.rag.context import assemble_context, merge_overlaps
+from app.services.tokens import count_tokens
+
+
+def _sliding_chunks(count: int, size: int = 800, overlap: int = 100) -> list[str]:
+    """Consecutive splitter chunks of one long text, each sharing `overlap` characters with the next."""
+    words = " ".join(f"palabra{i}" for i in range(count * size // 9))
+    step = size - overlap
+    return [words[i * step:i * step + size] for i in range(count)]
+
+
+def test_merge_respects_the_budget():
+    chunks = _sliding_chunks(8)
+    assert len(merge_overlaps(chunks)) == 1  # unbounded, the whole run collapses into one
+    assert all(count_tokens(c) <= 600 for c in merge_overlaps(chunks, max_tokens=600))
+
+
+def test_merged_top_chunk_does_not_blow_the_budget():
+    selected, used = assemble_context(_sliding_chunks(8), budget=600)
+    assert selected
+    assert used <= 600
+    assert all(count_tokens(c) <= 600 for c in selected)
+
+
+def test_single_oversized_top_chunk_is_still_kept():
+    big = " ".join(f"tema{i}" for i in range(2000))
+    selected, used = assemble_context([big, "el pretérito y el imperfecto"], budget=50)
+    assert selected == [big]
+    assert used > 50
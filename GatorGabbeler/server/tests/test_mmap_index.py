@@ -0,0 +1,44 @@
+import json
+import numpy as np
+from app.rag import mmap_index
+from app.rag.mmap_index import MmapVectorIndex, load_mmap_index, write_mmap_index
+
+
+def _write(path, texts, value):
+    return write_mmap_index(path, texts, np.full((len(texts), 4), value, dtype=np.float32), "test")
+
+
+def test_rewrite_swaps_the_whole_index_at_once(tmp_path):
+    path = tmp_path / "mmap_index"
+    _write(path, ["uno", "dos"], 1.0)
+    old = load_mmap_index(path, None)
+
+    _write(path, ["tres", "cuatro", "cinco"], 2.0)
+    new = load_mmap_index(path, None)
+
+    # Each reader sees one consistent version: meta, offsets, texts and vectors together
+    assert (len(old), old._text(1)) == (2, "dos")
+    assert (len(new), new._text(2)) == (3, "cinco")
+    assert new.path != old.path
+    assert json.loads((new.path / mmap_index.META_FILE).read_text())["count"] == 3
+
+
+def test_old_versions_are_pruned(tmp_path):
+    path = tmp_path / "mmap_index"
+    for i in range(4):
+        _write(path, [f"texto {i}"], float(i + 1))
+    versions = [p for p in path.iterdir() if p.is_dir()]
+    assert len(versions) == mmap_index.KEEP_VERSIONS
+    assert load_mmap_index(path, None)._text(0) == "texto 3"
+
+
+def test_reads_the_flat_layout(tmp_path):
+    path = tmp_path / "mmap_index"
+    _write(path, ["hola"], 1.0)
+    live = mmap_index.live_version_dir(path)
+    for f in live.iterdir():
+        f.rename(path / f.name)
+    (path / mmap_index.CURRENT_FILE).unlink()
+
+    assert MmapVectorIndex.exists(path)
+    assert load_mmap_index(path, None)._text(0) == "hola"
@@ -0,0 +1,53 @@
+import json
+import asyncio
+import httpx
+import pytest
+from app.services.providers import openai_provider
+from app.services.providers.scheduler import ProviderScheduler
+
+
+def _sse(*chunks):
+    return "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake chat endpoint; records request bodies and token bucket adjustments."""
+    seen = {"bodies": [], "adjustments": []}
+
+    def handler(request):
+        body = json.loads(request.content)
+        seen["bodies"].append(body)
+        chunks = [{"choices": [{"delta": {"content": "Hola"}}]}, {"choices": [{"delta": {"content": " amigo"}}]}]
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunks.append({"choices": [], "usage": {"prompt_tokens": 30, "completion_tokens": 2, "total_tokens": 32}})
+        return httpx.Response(200, text=_sse(*chunks), headers={"content-type": "text/event-stream"})
+
+    scheduler = ProviderScheduler(tpm=1_000_000)
+    monkeypatch.setattr(scheduler.bucket, "adjust", seen["adjustments"].append)
+    monkeypatch.setattr(openai_provider, "get_scheduler", lambda: scheduler)
+    monkeypatch.setattr(openai_provider, "get_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return seen
+
+
+def _stream(**kwargs):
+    async def run():
+        return [d async for d in openai_provider.stream_openai("system", "hola", api_key="test",
+                                                                base_url="http://upstream", **kwargs)]
+    return "".join(asyncio.run(run()))
+
+
+def test_stream_usage_settles_the_token_bucket(upstream):
+    assert _stream(stream_usage=True) == "Hola amigo"
+    assert upstream["bodies"][0]["stream_options"] == {"include_usage": True}
+    messages = openai_provider.build_messages("system", "hola")
+    assert upstream["adjustments"] == [32 - openai_provider.estimate_tokens(messages)]
+
+
+def test_stream_without_usage_settles_from_estimate(upstream):
+    assert _stream(stream_usage=False) == "Hola amigo"
+    assert "stream_options" not in upstream["bodies"][0]
+    messages = openai_provider.build_messages("system", "hola")
+    used = openai_provider.count_message_tokens(messages) + openai_provider.count_tokens("Hola amigo")
+    assert upstream["adjustments"] == [used - openai_provider.estimate_tokens(messages)]
@@ -0,0 +1,72 @@
+import asyncio
+from app.rag import VectorStoreRegistry, rag_system_prompt
+from app.services import llm
+from app.config.system_prompt import get_system_prompt
+
+
+def test_has_class_needs_materials(tmp_path):
+    empty = tmp_path / "spanish_1131"
+    empty.mkdir()
+    with_pdfs = tmp_path / "spanish_1130"
+    with_pdfs.mkdir()
+    (with_pdfs / "syllabus.pdf").write_bytes(b"%PDF-1.4")
+    indexed = tmp_path / "spanish_2200"
+    (indexed / "chroma_db").mkdir(parents=True)
+
+    registry = VectorStoreRegistry({
+        "spanish_1130": with_pdfs,
+        "spanish_1131": empty,
+        "spanish_2200": indexed,
+        "spanish_2201": tmp_path / "missing",
+    })
+
+    assert registry.has_class("spanish_1130")
+    assert registry.has_class("spanish_2200")
+    assert not registry.has_class("spanish_1131")
+    assert not registry.has_class("spanish_2201")
+    assert not registry.has_class("default")
+
+
+def test_knowledge_base_prompt_is_stable_for_rag_classes(monkeypatch):
+    monkeypatch.setattr(llm.get_registry(), "has_class", lambda class_level: True)
+
+    async def found(query, class_level):
+        return "[Resource 1]:\nEl pretérito indica acciones terminadas."
+
+    async def nothing(query, class_level):
+        return None
+
+    # Same system prompt whether or not retrieval found anything, so the prefix caches
+    monkeypatch.setattr(llm, "retrieve_context_async", nothing)
+    empty_prompt, message = asyncio.run(llm.build_reply_prompt("Hola", "spanish_1130"))
+    assert empty_prompt == rag_system_prompt(get_system_prompt("spanish_1130"))
+    assert message == "Hola"
+
+    monkeypatch.setattr(llm, "retrieve_context_async", found)
+    system_prompt, message = asyncio.run(llm.build_reply_prompt("Hola", "spanish_1130"))
+    assert system_prompt == empty_prompt
+    assert "pretérito" in message
+
+    # Classes without materials keep the plain prompt
+    monkeypatch.setattr(llm.get_registry(), "has_class", lambda class_level: False)
+    system_prompt, _ = asyncio.run(llm.build_reply_prompt("Hola", "spanish_1131"))
+    assert system_prompt == get_system_prompt("spanish_1131")
+
+
+def test_has_class_caches_the_directory_check(tmp_path, monkeypatch):
+    from app.rag import registry as registry_module
+    checks = []
+    real = registry_module.has_materials
+    monkeypatch.setattr(registry_module, "has_materials", lambda path: checks.append(path) or real(path))
+    data_dir = tmp_path / "spanish_1131"
+    data_dir.mkdir()
+    registry = VectorStoreRegistry({"spanish_1131": data_dir})
+
+    assert not registry.has_class("spanish_1131")
+    (data_dir / "syllabus.pdf").write_bytes(b"%PDF-1.4")
+    assert not registry.has_class("spanish_1131")  # cached until warm-up or rebuild
+    assert len(checks) == 1
+
+    registry.refresh_materials("spanish_1131")
+    assert registry.has_class("spanish_1131")
+    assert len(checks) == 2
@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+from app.services.reply_cache import ReplyCache, normalize_opener
+
+SCOPE = ("spanish_1130", "stub")
+
+
+class FakeEmbeddings:
+    """Fixed vectors per normalized opener; unknown text gets its own direction."""
+
+    def __init__(self, vectors, delay: float = 0.0):
+        self.vectors = vectors
+        self.delay = delay
+        self.calls = []
+
+    async def aembed_query(self, text):
+        self.calls.append(text)
+        await asyncio.sleep(self.delay)
+        return self.vectors.get(normalize_opener(text), [0.0, 0.0, 0.0, 1.0])
+
+
+def _fill(cache, text, reply):
+    lookup = asyncio.run(cache.lookup(text, *SCOPE))
+    cache.store(lookup, reply)
+
+
+def test_different_short_questions_do_not_share_a_reply():
+    # Cosine ~0.95: close enough to fool a loose threshold
+    cache = ReplyCache(FakeEmbeddings({
+        "que es el preterito": [1.0, 0.23, 0.0, 0.0],
+        "que es el imperfecto": [1.0, 0.0, 0.23, 0.0],
+    }), variants=1)
+    _fill(cache, "¿Qué es el pretérito?", "El pretérito indica acciones terminadas.")
+
+    lookup = asyncio.run(cache.lookup("¿Qué es el imperfecto?", *SCOPE))
+
+    assert lookup.reply is None
+    assert lookup.match is None
+
+
+def test_greeting_variants_match_semantically():
+    cache = ReplyCache(FakeEmbeddings({
+        "hola como estas": [1.0, 0.05, 0.0, 0.0],
+        "hola que tal": [1.0, 0.0, 0.05, 0.0],
+    }), variants=1)
+    _fill(cache, "¡Hola! ¿Cómo estás?", "¡Muy bien! ¿Y tú?")
+
+    assert asyncio.run(cache.lookup("Hola, ¿qué tal?", *SCOPE)).reply == "¡Muy bien! ¿Y tú?"
+    assert cache.semantic_hits == 1
+    # The raw message is embedded, as retrieval does, so both share the query cache
+    assert cache.embeddings.calls == ["¡Hola! ¿Cómo estás?", "Hola, ¿qué tal?"]
+
+
+def test_longer_openers_match_exactly_only():
+    embeddings = FakeEmbeddings({})
+    cache = ReplyCache(embeddings, variants=1)
+    text = "Hola, ¿puedes explicarme cuándo se usa el subjuntivo?"
+    _fill(cache, text, "Claro, el subjuntivo expresa deseos y dudas.")
+
+    assert asyncio.run(cache.lookup(text.lower(), *SCOPE)).reply is not None
+    assert embeddings.calls == []
+    assert len(normalize_opener(text).split()) > cache.semantic_max_tokens
+
+
+def test_slow_embedding_falls_back_to_exact_matching():
+    cache = ReplyCache(FakeEmbeddings({}, delay=1.0), variants=1, embed_timeout=0.05)
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        lookup = await cache.lookup("¡Hola!", *SCOPE)
+        return lookup, asyncio.get_running_loop().time() - started
+
+    lookup, elapsed = asyncio.run(run())
+    assert lookup.reply is None and lookup.vector is None
+    assert elapsed < 0.5
+    assert cache.embed_timeouts == 1
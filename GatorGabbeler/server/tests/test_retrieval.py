@@ -0,0 +1,50 @@
+import time
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.rag import retriever, get_registry
+
+
+@pytest.fixture
+def stuck_retrieval(monkeypatch):
+    """Retrieval blocks its worker thread until the test ends."""
+    release = threading.Event()
+    # Course PDFs aren't checked in; act as if spanish_1130 has them
+    monkeypatch.setattr(get_registry(), "has_class", lambda class_level: class_level == "spanish_1130")
+
+    def blocked(query, class_level):
+        release.wait(10)
+        return None
+
+    monkeypatch.setattr(retriever, "retrieve_context", blocked)
+    yield
+    release.set()
+
+
+def test_retrieval_times_out_to_none(stuck_retrieval, monkeypatch):
+    monkeypatch.setattr(retriever, "RAG_TIMEOUT", 0.2)
+    started = time.monotonic()
+    assert asyncio.run(retriever.retrieve_context_async("hola", "spanish_1130")) is None
+    assert time.monotonic() - started < 1.0
+
+
+def test_stuck_retrieval_does_not_block_other_requests(stuck_retrieval, monkeypatch):
+    monkeypatch.setattr(retriever, "RAG_TIMEOUT", 3.0)
+    with TestClient(app) as client:
+        chat = {}
+        thread = threading.Thread(target=lambda: chat.update(response=client.post(
+            "/api/chat", json={"text": "¿Qué es el pretérito?", "classContext": "spanish_1130"})))
+        thread.start()
+        time.sleep(0.2)  # let the chat reach retrieval
+
+        started = time.monotonic()
+        translated = client.post("/api/translate", json={"text": "Hola", "target_language": "English"})
+        elapsed = time.monotonic() - started
+
+        assert translated.status_code == 200
+        assert elapsed < 1.0
+        assert thread.is_alive()  # the chat is still waiting on retrieval
+        thread.join(10)
+    assert chat["response"].status_code == 200
@@ -0,0 +1,32 @@
+import asyncio
+from app.services.providers.router import LLMRouter, StubProvider
+
+
+def _router():
+    provider = StubProvider()
+    provider.llm.latency = provider.llm.token_delay = 0
+    return LLMRouter([provider], hedge=False), provider
+
+
+def test_completions_do_not_count_as_first_tokens():
+    router, provider = _router()
+
+    async def run():
+        await router.complete("system", "hola", lane="translate")
+        await router.complete("system", "hola", lane="background")
+        return [delta async for delta in router.stream("system", "hola")]
+
+    assert asyncio.run(run())
+    assert len(provider.first_token.samples) == 1
+    assert len(provider.complete_latency["translate"].samples) == 1
+    assert len(provider.complete_latency["background"].samples) == 1
+    assert "interactive" not in provider.complete_latency
+
+
+def test_hedge_delay_uses_the_matching_call_type(monkeypatch):
+    monkeypatch.setattr("app.services.providers.router.LLM_HEDGE_MIN_SAMPLES", 1)
+    router, provider = _router()
+    provider.first_token.add(1.0)
+    provider.complete_latency["interactive"].add(4.0)
+    assert router.hedge_delay(provider, streaming=True) == 1.0
+    assert router.hedge_delay(provider, streaming=False, lane="interactive") == 4.0
@@ -0,0 +1,40 @@
+import asyncio
+from app.services.providers.scheduler import ProviderScheduler, TokenBucket
+
+
+def test_token_wait_does_not_hold_a_slot():
+    async def run():
+        scheduler = ProviderScheduler(max_concurrent=1, tpm=600)
+        await scheduler.bucket.take(600)  # empty: the next 100 tokens take ~10s
+
+        async def background():
+            async with scheduler.slot("background", est_tokens=100):
+                pass
+
+        waiting = asyncio.ensure_future(background())
+        await asyncio.sleep(0.05)
+        try:
+            async with scheduler.slot("interactive"):
+                return scheduler.active
+        finally:
+            waiting.cancel()
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=1.0)) == 1
+
+
+def test_bucket_serves_higher_priority_first():
+    async def run():
+        bucket = TokenBucket(6000)  # 100 tokens/s
+        await bucket.take(6000)
+        order = []
+
+        async def take(name, priority):
+            await bucket.take(30, priority)
+            order.append(name)
+
+        background = asyncio.ensure_future(take("background", 2))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(background, take("interactive", 0))
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "background"]
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.services import tokens
+
+
+@pytest.fixture
+def broken_encoding(monkeypatch):
+    """Make tiktoken fail to load its encoding file, as on an offline host."""
+    tiktoken = pytest.importorskip("tiktoken")
+    calls = []
+
+    def get_encoding(name):
+        calls.append(name)
+        raise OSError("network unreachable")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", get_encoding)
+    tokens._encoding.cache_clear()
+    yield calls
+    tokens._encoding.cache_clear()
+
+
+def test_count_tokens_falls_back_when_encoding_fails(broken_encoding):
+    assert tokens.count_tokens("a" * 40) == 10
+    assert tokens.count_tokens("") == 0
+    tokens.count_tokens("otra vez")
+    # The failed load is cached rather than retried on every call
+    assert len(broken_encoding) == 2
+
+
+def test_chat_succeeds_without_encoding(broken_encoding):
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.post("/api/chat", json={"text": "Hola, ¿cómo estás?"})
+        assert response.status_code == 200
+        session_id = response.json()["sessionId"]
+
+        # A second turn goes through history and the roll-up check again
+        response = client.post("/api/chat", json={"text": "Muy bien, gracias.", "sessionId": session_id})
+        assert response.status_code == 200
+        assert response.json()["response"]
@@ -0,0 +1,52 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import llm
+from app.services.providers.scheduler import ProviderError
+
+
+def test_fallbacks_share_the_concurrency_limit(monkeypatch):
+    running = peak = 0
+
+    async def unparseable_pack(segments, ids, target_language):
+        return {}
+
+    async def translate_one(text, target_language):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return text.upper()
+
+    monkeypatch.setattr(llm, "TRANSLATE_BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(llm, "TRANSLATE_PACK_MAX_SEGMENTS", 2)
+    monkeypatch.setattr(llm, "_translate_pack", unparseable_pack)
+    monkeypatch.setattr(llm, "_translate_uncached", translate_one)
+
+    texts = [f"fallback segment {i}" for i in range(10)]
+    translated = asyncio.run(llm.generate_translations_batch(texts, "English"))
+
+    assert translated == [text.upper() for text in texts]
+    assert peak <= 2
+
+
+def test_pack_provider_error_maps_to_503(monkeypatch):
+    calls = []
+
+    async def busy_pack(segments, ids, target_language):
+        raise ProviderError("rate limited", status_code=429, retry_after=2.5)
+
+    async def translate_one(text, target_language):
+        calls.append(text)
+        return text
+
+    monkeypatch.setattr(llm, "_translate_pack", busy_pack)
+    monkeypatch.setattr(llm, "_translate_uncached", translate_one)
+
+    response = TestClient(app).post("/api/translate/batch",
+                                    json={"texts": ["provider busy one", "provider busy two"], "target_language": "English"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert calls == []
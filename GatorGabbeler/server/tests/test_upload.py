@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.testclient import TestClient
+from app.main import app, limit_body
+from app.rag.session_docs import file_kind
+
+client = TestClient(app)
+
+
+def _multipart(content: bytes, filename: str, content_type: str) -> tuple[bytes, str]:
+    boundary = "testboundary"
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def test_file_kind_allows_text_and_pdf_only():
+    assert file_kind("notes.txt", "text/plain") == "text"
+    assert file_kind("notes.md", "application/octet-stream") == "text"
+    assert file_kind("syllabus.pdf", None) == "pdf"
+    assert file_kind("photo.png", "image/png") is None
+    assert file_kind("notes.docx", "") is None
+
+
+def test_upload_rejects_malformed_content_length():
+    body, content_type = _multipart(b"hola", "notes.txt", "text/plain")
+    response = client.post("/api/upload", content=body,
+                           headers={"content-type": content_type, "content-length": "abc"})
+    assert response.status_code == 400
+
+
+def test_upload_rejects_unsupported_type():
+    body, content_type = _multipart(b"\x89PNG\r\n\x1a\n", "photo.png", "image/png")
+    response = client.post("/api/upload", content=body, headers={"content-type": content_type})
+    assert response.status_code == 415
+
+
+def test_upload_cap_applies_while_receiving():
+    body, content_type = _multipart(b"a" * 64 * 1024, "notes.txt", "text/plain")
+    pieces = [body[i:i + 4096] for i in range(0, len(body), 4096)]
+    received = []
+
+    async def receive():
+        received.append(pieces[len(received)])
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(pieces)}
+
+    # No Content-Length: only counting the stream can catch this
+    scope = {"type": "http", "method": "POST", "path": "/api/upload",
+             "headers": [(b"content-type", content_type.encode())]}
+    async def parse():
+        return await limit_body(Request(scope, receive), 8192).form(max_files=1)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(parse())
+
+    assert raised.value.status_code == 413
+    assert len(received) == 3
@@ -0,0 +1,43 @@
+import time
+from langchain_community.vectorstores import Chroma
+from chromadb.api.shared_system_client import SharedSystemClient
+from app.rag import vector_store
+from app.rag.vector_store import VectorStoreManager
+
+
+def _wait_released(path: str, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while path in SharedSystemClient._identifier_to_system:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "RAG_RELEASE_GRACE", 0)
+    return VectorStoreManager("spanish_1130", tmp_path, embeddings=object())
+
+
+def test_unload_closes_the_chroma_system(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch)
+    path = str(tmp_path / "chroma_db")
+    manager.vector_store = Chroma(persist_directory=path)
+    assert path in SharedSystemClient._identifier_to_system
+
+    manager.unload()
+
+    assert _wait_released(path)
+
+
+def test_swap_closes_the_previous_chroma_system(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch)
+    old_path, new_root = str(tmp_path / "chroma_db"), tmp_path / "index_versions" / "v2"
+    manager.vector_store = Chroma(persist_directory=old_path)
+    monkeypatch.setattr(manager, "_set_index_version", lambda: None)
+
+    manager._activate(new_root, Chroma(persist_directory=str(new_root / "chroma_db")))
+
+    assert _wait_released(old_path)
+    assert str(new_root / "chroma_db") in SharedSystemClient._identifier_to_system
+    vector_store.close_chroma(manager.vector_store)
@@ -2,10 +2,10 @@ import { useState, useEffect, useRef } from 'react'
 import { FaCog, FaPlus } from 'react-icons/fa' 
 import MessageBubble from './components/MessageBubble'
 import SettingsPanel from './components/SettingsPanel'
-import { sendMessage } from './services/api'
-import { speakSpanish } from './tts'
+import { streamMessage, uploadFile } from './services/api'
+import { speakSpanish, queueSpanish } from './tts'
 import { startListening, stopListening, isSpeechRecognitionSupported } from './stt'
-import { translateText } from './services/api'
+import { translateText, translateBatch } from './services/api'
 import { syllabifySpanishAdvanced } from './utils/syllabify'
 import gatorGabberLogo from './assets/gatorGabber.png'
 import LettersAnimation from "./assets/LettersAnimation"
@@ -27,12 +27,9 @@ export default function App() {
     // State to hold loading status
     const [isLoading, setIsLoading] = useState(false);
     
-    // State for the attached file metadata (File object)
+    // State for the attached file (File object, uploaded when the message is sent)
     const [attachedFile, setAttachedFile] = useState(null); 
     
-    // State for the file's Base64 content (for API transfer)
-    const [fileContent, setFileContent] = useState(null); 
-    
     // State to hold the current class context
     const [currentClass, setCurrentClass] = useState('default');
     // State to track if speech recognition is active
@@ -53,6 +50,8 @@ export default function App() {
     // Ref for the hidden file input
     const fileInputRef = useRef(null); 
     const lastSpokenIdRef = useRef(null);
+    // Server-side conversation session per class, so Alberto remembers the chat
+    const sessionIdsRef = useRef({});
 
     // Check if STT is supported on component mount
     useEffect(() => {
@@ -107,6 +106,29 @@ export default function App() {
         }
     };
 
+    // Translate every assistant message that has no translation yet, in one request
+    const handleTranslateAll = async () => {
+        const pending = messages.filter(m => m.role === 'assistant' && m.text && !m.translation);
+        if (pending.length === 0) return;
+        try {
+            const translations = await translateBatch(pending.map(m => m.text));
+            const byId = new Map(pending.map((m, i) => [m.id, translations[i]]));
+            setMessages(prevMessages => 
+                prevMessages.map(m => 
+                    byId.has(m.id) && !m.translation ? { ...m, translation: byId.get(m.id) || "[Translation failed]" } : m
+                )
+            );
+        } catch (err) {
+            console.error("Batch translation failed:", err);
+            const failed = new Set(pending.map(m => m.id));
+            setMessages(prevMessages => 
+                prevMessages.map(m => 
+                    failed.has(m.id) && !m.translation ? { ...m, translation: "[Translation failed]" } : m
+                )
+            );
+        }
+    };
+
     const handleSyllable = (textToSyllabify, messageId) => {
         try {
             const message = messages.find(m => m.id === messageId);
@@ -158,7 +180,7 @@ export default function App() {
         }
     };
 
-    // Handler to process the selected file (Reads content as Base64)
+    // Handler to attach the selected file (uploaded as multipart on send)
     const handleFileChange = (event) => {
         const selectedFile = event.target.files ? event.target.files[0] : null;
 
@@ -170,23 +192,9 @@ export default function App() {
                 return;
             }
 
-            const reader = new FileReader();
-
-            reader.onload = (e) => {
-                // Save the content (Base64 string) and the file object
-                setFileContent(e.target.result); 
-                setAttachedFile(selectedFile); 
-                console.log("File attached:", selectedFile.name);
-                setInput(`[Archivo adjunto: ${selectedFile.name}]`);
-            };
-
-            reader.onerror = () => {
-                 console.error("FileReader failed to read the file.");
-                 alert('Error al leer el archivo. Intenta de nuevo.');
-            };
-            
-            // Read the file as a Data URL (Base64 string)
-            reader.readAsDataURL(selectedFile); 
+            setAttachedFile(selectedFile); 
+            console.log("File attached:", selectedFile.name);
+            setInput(`[Archivo adjunto: ${selectedFile.name}]`);
         }
         
         // Clear the file input's value for re-selection
@@ -223,36 +231,52 @@ export default function App() {
         setMessages(prev => [...prev, userMsg, aiMsgPlaceholder]);
         setInput('');
         
-        // 2. Capture content and metadata before clearing state
-        // Extract just the base64 content (remove the data URL prefix)
-        let contentToSend = fileContent;
-        if (contentToSend && contentToSend.includes(',')) {
-            contentToSend = contentToSend.split(',')[1]; // Get only the base64 part
-        }
-        const fileMetadata = attachedFile 
-            ? { name: attachedFile.name, type: attachedFile.type } 
-            : null;
-        
-        // Debug logging
-        
-        console.log('Sending file:', fileMetadata);
-        console.log('Base64 length:', contentToSend?.length);
+        // 2. Capture the attached file before clearing state; it is uploaded
+        //    separately (multipart) and indexed for this conversation session
+        const fileToUpload = attachedFile;
         
         setAttachedFile(null); 
-        setFileContent(null); // Clear content
         setIsLoading(true);
 
         // 3. Prepare the data for the API as JSON payload
         const payload = {
-            text: trimmed, 
+            text: trimmed || (fileToUpload ? `Acabo de subir el archivo '${fileToUpload.name}'.` : ''), 
             classContext: currentClass, 
-            file: contentToSend,      // Base64 content of the file (without data URL prefix)
-            fileMetadata: fileMetadata // e.g., { name: "test.pdf", type: "application/pdf" }
+            sessionId: sessionIdsRef.current[currentClass] || null
         };
+        const sessionClass = currentClass;
 
         try {
-            // 4. Send the request using the JSON payload
-            const reply = await sendMessage(payload); 
+            if (fileToUpload) {
+                const uploaded = await uploadFile(fileToUpload, {
+                    sessionId: payload.sessionId,
+                    classContext: currentClass
+                });
+                payload.sessionId = uploaded.sessionId;
+                sessionIdsRef.current[sessionClass] = uploaded.sessionId;
+            }
+
+            // 4. Stream the reply: show tokens as they arrive and speak each
+            //    sentence as soon as it is complete (first one interrupts old speech)
+            lastSpokenIdRef.current = aiMsgID;
+            let streamedText = '';
+            let sentenceCount = 0;
+            const reply = await streamMessage(payload, {
+                onToken: (token) => {
+                    streamedText += token;
+                    setMessages(prev => prev.map(m => m.id === aiMsgID ? { ...m, text: streamedText } : m));
+                },
+                onSentence: (sentence) => {
+                    const speak = sentenceCount === 0 ? speakSpanish : queueSpanish;
+                    sentenceCount += 1;
+                    speak(sentence, voiceSettings).catch(err => {
+                        console.error('TTS error:', err);
+                    });
+                },
+                onSession: (id) => {
+                    sessionIdsRef.current[sessionClass] = id;
+                }
+            });
             
             // 5. Update UI with AI reply
             const aiMsg = { 
@@ -318,6 +342,7 @@ export default function App() {
                                 <button type="button" className={`btn btn-sm ${currentClass === 'spanish_1131' ? 'btn-light' : 'btn-outline-light'}`} onClick={() => setCurrentClass('spanish_1131')}>SPN1131</button>
                                 <button type="button" className={`btn btn-sm ${currentClass === 'spanish_2200' ? 'btn-light' : 'btn-outline-light'}`} onClick={() => setCurrentClass('spanish_2200')}>SPN2200</button>
                                 <button type="button" className={`btn btn-sm ${currentClass === 'spanish_2201' ? 'btn-light' : 'btn-outline-light'}`} onClick={() => setCurrentClass('spanish_2201')}>SPN2201</button>
+                                <button type="button" className="btn btn-sm btn-outline-light" onClick={handleTranslateAll} disabled={isLoading} title="Translate all messages">Traducir todo</button>
                             </div>
                         </div>
                     </header>
@@ -371,6 +396,7 @@ export default function App() {
                             {/* Hidden native file input */}
                             <input
                                 type="file"
+                                accept="text/*,.txt,.md,.csv,.pdf,application/pdf"
                                 ref={fileInputRef} 
                                 onChange={handleFileChange} 
                                 style={{ display: 'none' }} 
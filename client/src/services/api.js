@@ -32,4 +32,100 @@ export async function translateText(text, target_language = 'English') {
 
   const data = await res.json();
   return data.translation || '';
-}
\ No newline at end of file
+}
+
+// Streaming chat: reads Server-Sent Events from /api/chat/stream.
+// `onToken(text)` fires for every piece of the reply and `onSentence(text)` fires
+// for each complete sentence, so TTS can start before the whole reply is in.
+// `onSession(id)` reports the server-side conversation session to send next time.
+// Resolves with the full reply text.
+export async function streamMessage(payload, { onToken, onSentence, onSession } = {}) {
+  const res = await fetch(`${API_BASE_URL}/api/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload)
+  });
+
+  if (!res.ok || !res.body) {
+    throw new Error(`API error ${res.status}: ${await res.text()}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let fullReply = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      const parsed = JSON.parse(data);
+
+      if (event === 'token') {
+        fullReply += parsed.text;
+        onToken?.(parsed.text);
+      } else if (event === 'sentence') {
+        onSentence?.(parsed.text);
+      } else if (event === 'done') {
+        fullReply = parsed.response;
+        if (parsed.sessionId) onSession?.(parsed.sessionId);
+      } else if (event === 'error') {
+        throw new Error(parsed.detail);
+      }
+    }
+  }
+
+  return fullReply;
+}
+
+// Translate many texts in one request (e.g. "translate all").
+// Duplicates are collapsed server-side; results come back in input order.
+export async function translateBatch(texts, target_language = 'English') {
+  const res = await fetch(`${API_BASE_URL}/api/translate/batch`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ texts, target_language })
+  });
+
+  if (!res.ok) {
+    throw new Error(`API error ${res.status}: ${await res.text()}`);
+  }
+
+  const data = await res.json();
+  return data.translations || [];
+}
+
+// Upload a file for the current conversation (multipart, no base64).
+// The server indexes it per session and pulls relevant parts into each reply.
+// Resolves with { sessionId, filename, bytes, chunks }.
+export async function uploadFile(file, { sessionId = null, classContext = 'default' } = {}) {
+  const form = new FormData();
+  form.append('file', file);
+  if (sessionId) form.append('sessionId', sessionId);
+  form.append('classContext', classContext);
+
+  const res = await fetch(`${API_BASE_URL}/api/upload`, {
+    method: 'POST',
+    body: form
+  });
+
+  if (!res.ok) {
+    throw new Error(`API error ${res.status}: ${await res.text()}`);
+  }
+
+  return res.json();
+}
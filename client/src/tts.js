@@ -88,4 +88,20 @@ export async function speakSpanish(text, {rate=1, pitch=1, voice=null} = {} ){
     if(selectedVoice) utter.voice = selectedVoice;
     utter.lang = selectedVoice?.lang || 'es-ES';
     window.speechSynthesis.speak(utter);
-}
\ No newline at end of file
+}
+
+// Queue a sentence after whatever is already being spoken.
+// Unlike speakSpanish this does NOT cancel current speech, so a streamed
+// reply can be read sentence by sentence as it arrives.
+export async function queueSpanish(text, {rate=1, pitch=1, voice=null} = {} ){
+    if (!('speechSynthesis' in window)) return;
+
+    const utter = new SpeechSynthesisUtterance(text);
+    utter.rate = rate;
+    utter.pitch = pitch;
+
+    const selectedVoice = voice || await getSpanishVoices();
+    if(selectedVoice) utter.voice = selectedVoice;
+    utter.lang = selectedVoice?.lang || 'es-ES';
+    window.speechSynthesis.speak(utter);
+}